@@ -0,0 +1,72 @@
+#!/usr/bin/env python
+"""
+    CLI cold-start benchmark of the VHT AWS backend: creating all boto3
+    clients up front (as before) vs. creating them on first use.
+
+    Each sample is a fresh interpreter that imports vht and creates the AWS
+    backend, so module import and botocore model loading are included.
+    No AWS API call is made:
+        python benchmark_cli_startup.py --runs 10
+"""
+
+import argparse
+import os
+import statistics
+import subprocess
+import sys
+import time
+
+PYTHON_RESOURCES_DIR = os.path.normpath(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+STARTUP_SCRIPT = '''\
+import sys
+from vht import vht
+client = vht.VHTClient('aws').backend
+for name in sys.argv[1:]:
+    getattr(client, name)
+'''
+
+# Clients touched per mode: 'eager' creates every client like the former constructor,
+# 'ec2' is what e.g. `vht_cli --stop` needs, 'none' is construction only
+MODES = {
+    'eager': ['ec2_client', 'ssm_client', 's3_client', 's3_resource'],
+    'ec2': ['ec2_client'],
+    'none': [],
+}
+
+
+def measure(clients, runs, env):
+    samples = []
+    for _ in range(runs):
+        start = time.perf_counter()
+        subprocess.run([sys.executable, '-c', STARTUP_SCRIPT] + clients, env=env, check=True)
+        samples.append(time.perf_counter() - start)
+    return statistics.median(samples)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='VHT CLI startup benchmark')
+    parser.add_argument('--runs', type=int, default=10, help='Runs per mode (the median is reported). Default: 10')
+    args = parser.parse_args()
+
+    env = dict(os.environ)
+    env.setdefault('AWS_ACCESS_KEY_ID', 'benchmark')
+    env.setdefault('AWS_SECRET_ACCESS_KEY', 'benchmark')
+    env.setdefault('AWS_DEFAULT_REGION', 'eu-west-1')
+    env.update({
+        'gh_workspace': '.',
+        's3_bucket_name': 'vht-benchmark',
+        'instance_id': 'i-benchmark',
+        'PYTHONPATH': PYTHON_RESOURCES_DIR
+    })
+
+    baseline = None
+    print(f"{'mode':<8} {'median ms':>10} {'speedup':>8}")
+    for mode, clients in MODES.items():
+        elapsed = measure(clients, args.runs, env)
+        baseline = baseline or elapsed
+        print(f"{mode:<8} {elapsed * 1000:>10.1f} {baseline / elapsed:>7.2f}x")
+
+
+if __name__ == '__main__':
+    main()
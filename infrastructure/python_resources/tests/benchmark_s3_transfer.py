@@ -0,0 +1,105 @@
+#!/usr/bin/env python
+"""
+    S3 transfer benchmark: boto3 default transfer settings vs. the tuned
+    TransferConfig/connection pool of the VHT AWS backend.
+
+    Runs against any S3-compatible endpoint (e.g. MinIO or moto_server):
+        python benchmark_s3_transfer.py --endpoint_url http://localhost:9000 --size 512
+
+    Without --endpoint_url an in-process moto server is started (pip install "moto[server]").
+"""
+
+import argparse
+import logging
+import os
+import tempfile
+import time
+
+import boto3
+from boto3.s3.transfer import TransferConfig
+from botocore.config import Config
+
+from vht.aws import TransferProgress
+
+
+def start_moto_server():
+    try:
+        from moto.server import ThreadedMotoServer
+    except ImportError:
+        raise SystemExit("Either --endpoint_url or moto (pip install \"moto[server]\") is needed")
+    server = ThreadedMotoServer(port=0)
+    server.start()
+    host, port = server.get_host_and_port()
+    return server, f"http://{host}:{port}"
+
+
+def benchmark(endpoint_url, bucket, filename, transfer_config, max_pool_connections):
+    s3_client = boto3.client('s3', endpoint_url=endpoint_url,
+                             config=Config(max_pool_connections=max_pool_connections))
+    size = os.path.getsize(filename)
+    result = {}
+
+    progress = TransferProgress('Upload', size)
+    s3_client.upload_file(filename, bucket, 'benchmark.tar', Config=transfer_config, Callback=progress)
+    result['upload'] = progress.get_throughput()
+
+    progress = TransferProgress('Download', size)
+    s3_client.download_file(bucket, 'benchmark.tar', filename + '.out', Config=transfer_config, Callback=progress)
+    result['download'] = progress.get_throughput()
+
+    s3_client.delete_object(Bucket=bucket, Key='benchmark.tar')
+    os.remove(filename + '.out')
+    return result
+
+
+def main():
+    parser = argparse.ArgumentParser(description='S3 transfer benchmark')
+    parser.add_argument('--endpoint_url', type=str, help='S3-compatible endpoint. Default: in-process moto server')
+    parser.add_argument('--bucket', type=str, default='vht-benchmark', help='Bucket (created if missing)')
+    parser.add_argument('--size', type=int, default=256, help='Archive size in MB. Default: 256')
+    parser.add_argument('--chunksize', type=int, default=16, help='Tuned multipart chunk size in MB. Default: 16')
+    parser.add_argument('--concurrency', type=int, default=16, help='Tuned max concurrency. Default: 16')
+    args = parser.parse_args()
+
+    os.environ.setdefault('AWS_ACCESS_KEY_ID', 'benchmark')
+    os.environ.setdefault('AWS_SECRET_ACCESS_KEY', 'benchmark')
+    os.environ.setdefault('AWS_DEFAULT_REGION', 'us-east-1')
+    logging.basicConfig(format='[%(levelname)s]\t%(message)s', level='WARNING')
+    logging.getLogger('werkzeug').setLevel(logging.ERROR)
+
+    server = None
+    endpoint_url = args.endpoint_url
+    if endpoint_url is None:
+        server, endpoint_url = start_moto_server()
+
+    s3_client = boto3.client('s3', endpoint_url=endpoint_url)
+    try:
+        s3_client.create_bucket(Bucket=args.bucket)
+    except s3_client.exceptions.BucketAlreadyOwnedByYou:
+        pass
+
+    with tempfile.TemporaryDirectory() as tmp:
+        filename = os.path.join(tmp, 'vht.tar')
+        with open(filename, 'wb') as f:
+            for _ in range(args.size):
+                f.write(os.urandom(1024 * 1024))
+
+        configs = {
+            'default': (TransferConfig(), 10),
+            'tuned': (TransferConfig(multipart_threshold=args.chunksize * 1024 * 1024,
+                                     multipart_chunksize=args.chunksize * 1024 * 1024,
+                                     max_concurrency=args.concurrency), args.concurrency + 4)
+        }
+        print(f"{'config':<10} {'upload MB/s':>12} {'download MB/s':>14}")
+        for name, (transfer_config, max_pool_connections) in configs.items():
+            start = time.monotonic()
+            result = benchmark(endpoint_url, args.bucket, filename, transfer_config, max_pool_connections)
+            print(f"{name:<10} {result['upload'] / 1e6:>12.1f} {result['download'] / 1e6:>14.1f}"
+                  f"   ({time.monotonic() - start:.1f} s)")
+
+    if server is not None:
+        server.stop()
+
+
+if __name__ == '__main__':
+    main()
@@ -1,9 +1,20 @@
 import datetime
+import hashlib
+import io
+import json
 import os
 import logging
+import shutil
+import subprocess
+import sys
+import tempfile
+import threading
+import time
 import unittest
 
 from unittest.mock import patch, Mock
+from botocore.exceptions import ClientError
+from botocore.stub import Stubber
 from dateutil.tz import tzutc, tzlocal
 from vht import vht
 
@@ -358,6 +369,7 @@ class TestVhtAws(unittest.TestCase):
     def test_get_image_id(self):
         aws_client = self.get_vht_aws_instance()
         aws_client.ami_version = self.data['ami_version']
+        aws_client.ami_cache_ttl = 0
 
         # mocking methods
         aws_client.ec2_client.describe_images = Mock()
@@ -572,6 +584,974 @@ class TestVhtAws(unittest.TestCase):
         assert aws_client.ec2_client.describe_instances.called
         assert response == 'running'
 
+    def get_pool_instance(self, instance_id, state, tags):
+        return {
+            'InstanceId': instance_id,
+            'State': {'Name': state},
+            'Tags': [{'Key': 'VHT_CLI', 'Value': 'true'}] + [{'Key': k, 'Value': v} for k, v in tags.items()]
+        }
+
+    def mock_pool(self, aws_client, pool):
+        """
+            Mock the EC2 tag/describe calls of a warm pool: pool maps instance IDs to (state, tags).
+            Listing the pool returns the tags of the mock start (a stale view), describing
+            instance IDs returns the current tags.
+        """
+        initial = {instance_id: (state, dict(tags)) for instance_id, (state, tags) in pool.items()}
+
+        def describe_instances(**kwargs):
+            if 'InstanceIds' in kwargs:
+                instances = [self.get_pool_instance(i, *pool[i]) for i in kwargs['InstanceIds']]
+            else:
+                instances = [self.get_pool_instance(i, *initial[i]) for i in initial]
+            return {'Reservations': [{'Instances': instances}]}
+
+        def create_tags(**kwargs):
+            for instance_id in kwargs['Resources']:
+                pool[instance_id][1].update({tag['Key']: tag['Value'] for tag in kwargs['Tags']})
+
+        aws_client.ec2_client.describe_instances = Mock(side_effect=describe_instances)
+        aws_client.ec2_client.create_tags = Mock(side_effect=create_tags)
+
+    def test_lease_instance(self):
+        aws_client = self.get_vht_aws_instance()
+        aws_client.instance_id = None
+        now = int(time.time())
+
+        pool = {
+            'i-stopped': ('stopped', {'VHT_POOL_RELEASED': str(now)}),
+            'i-locked': ('running', {'VHT_POOL_LOCK': f"abc@{now}"}),
+            'i-running': ('running', {'VHT_POOL_RELEASED': str(now - 100)}),
+            'i-stale': ('running', {'VHT_POOL_LOCK': f"abc@{now - 86400}"})
+        }
+
+        # mocking methods
+        self.mock_pool(aws_client, pool)
+        aws_client.start_instance = Mock()
+        aws_client.wait_ec2_status_ok = Mock()
+
+        # running the actual method
+        with patch('vht.aws.time.sleep'):
+            instance_id = aws_client.lease_instance()
+
+        # asserting values: running instances first, most recently released first
+        assert instance_id == 'i-running', f"Found {instance_id}. Expected i-running"
+        assert aws_client.instance_lease == pool['i-running'][1]['VHT_POOL_LOCK']
+        assert aws_client.wait_ec2_status_ok.called
+        assert not aws_client.start_instance.called
+
+        # i-running is skipped without tagging (locked since the pool was listed),
+        # the other locks are overwritten by another client: a new instance is created
+        aws_client.instance_id = None
+        aws_client.ec2_client.create_tags = Mock(side_effect=lambda **kwargs: [
+            pool[instance_id][1].update({'VHT_POOL_LOCK': f"other@{now}"}) for instance_id in kwargs['Resources']])
+        with patch('vht.aws.time.sleep'):
+            aws_client.create_instance = Mock(return_value='i-new')
+            instance_id = aws_client.lease_instance()
+        assert [call[1]['Resources'] for call in aws_client.ec2_client.create_tags.call_args_list] == \
+            [['i-stale'], ['i-stopped']]
+        assert instance_id == 'i-new'
+        assert {'Key': 'VHT_POOL_LOCK', 'Value': aws_client.instance_lease} in aws_client.get_instance_tags()
+
+    def test_release_instance(self):
+        aws_client = self.get_vht_aws_instance()
+        aws_client.instance_lease = lock = f"abc@{int(time.time())}"
+
+        # mocking methods
+        aws_client.ec2_client.create_tags = Mock()
+        aws_client.ec2_client.delete_tags = Mock()
+        aws_client.ec2_client.terminate_instances = Mock()
+        aws_client.shrink_pool = Mock()
+
+        # running the actual method
+        aws_client.teardown()
+
+        # asserting values: only the own lock is deleted
+        aws_client.ec2_client.delete_tags.assert_called_with(
+            Resources=[self.data['instance_id']], Tags=[{'Key': 'VHT_POOL_LOCK', 'Value': lock}])
+        assert aws_client.shrink_pool.called
+        assert not aws_client.ec2_client.terminate_instances.called
+        assert aws_client.instance_lease is None
+
+    def test_release_instance_busy(self):
+        aws_client = self.get_vht_aws_instance()
+
+        # mocking methods: the wait for the command times out while it is still running
+        aws_client.ssm_client.send_command = Mock(return_value={'Command': {'CommandId': '8f181e5d'}})
+        aws_client.ssm_client.cancel_command = Mock()
+        aws_client.get_s3_file_content = Mock(return_value='')
+        aws_client.ec2_client.create_tags = Mock()
+        aws_client.ec2_client.delete_tags = Mock()
+        aws_client.terminate_instance = Mock()
+        aws_client.shrink_pool = Mock()
+
+        # the cancel completes: the instance goes back to the pool
+        aws_client.instance_lease = f"abc@{int(time.time())}"
+        aws_client.wait_ssm_command_finished = Mock(side_effect=['InProgress', 'Cancelled'])
+        aws_client.send_ssm_shell_command('make', '/home/ubuntu', timeout_seconds=60)
+        aws_client.teardown()
+        aws_client.ssm_client.cancel_command.assert_called_with(
+            CommandId='8f181e5d', InstanceIds=[self.data['instance_id']])
+        assert aws_client.ec2_client.delete_tags.called
+        assert not aws_client.terminate_instance.called
+
+        # the command is still running after the cancel: the instance is terminated, not pooled
+        aws_client.prepare_instance = Mock()
+        aws_client.instance_torn_down = False
+        aws_client.instance_lease = f"abc@{int(time.time())}"
+        aws_client.ec2_client.delete_tags.reset_mock()
+        aws_client.wait_ssm_command_finished = Mock(side_effect=['InProgress', 'InProgress'])
+        aws_client.send_ssm_shell_command('make', '/home/ubuntu', timeout_seconds=60)
+        aws_client.teardown()
+        assert aws_client.terminate_instance.called
+        assert not aws_client.ec2_client.delete_tags.called
+        assert aws_client.pending_command_ids == []
+
+    def test_shrink_pool(self):
+        aws_client = self.get_vht_aws_instance()
+        aws_client.instance_pool_size = 2
+        now = int(time.time())
+
+        pool = {
+            'i-1': ('running', {'VHT_POOL_RELEASED': str(now - 7200)}),
+            'i-2': ('running', {'VHT_POOL_RELEASED': str(now - 10)}),
+            'i-3': ('stopped', {'VHT_POOL_RELEASED': str(now - 9000)}),
+            'i-4': ('running', {'VHT_POOL_LOCK': f"abc@{now}"}),
+            'i-5': ('running', {'VHT_POOL_RELEASED': str(now - 9500)})
+        }
+
+        # mocking methods
+        self.mock_pool(aws_client, pool)
+        aws_client.ec2_client.delete_tags = Mock()
+        aws_client.ec2_client.terminate_instances = Mock()
+        aws_client.ec2_client.stop_instances = Mock()
+        # i-5 is leased after the pool was listed
+        pool['i-5'][1]['VHT_POOL_LOCK'] = f"def@{now}"
+
+        # running the actual method
+        with patch('vht.aws.time.sleep'):
+            response = aws_client.shrink_pool()
+
+        # asserting values
+        assert response == {'Terminated': ['i-3'], 'Stopped': ['i-1']}, f"Found {response}"
+        aws_client.ec2_client.terminate_instances.assert_called_with(InstanceIds=['i-3'])
+        aws_client.ec2_client.stop_instances.assert_called_with(InstanceIds=['i-1'])
+        aws_client.ec2_client.delete_tags.assert_called_with(
+            Resources=['i-1'], Tags=[{'Key': 'VHT_POOL_LOCK', 'Value': pool['i-1'][1]['VHT_POOL_LOCK']}])
+        assert pool['i-5'][1]['VHT_POOL_LOCK'] == f"def@{now}"
+
+    def test_run_job_pool_command_failed(self):
+        aws_client = self.get_vht_aws_instance()
+        aws_client.instance_pool_size = 2
+        aws_client.ssm_single_invocation = False
+
+        def lease_instance():
+            job_client.instance_id = 'i-pool'
+            job_client.instance_lease = f"abc@{int(time.time())}"
+
+        # mocking methods
+        aws_client.ec2_client.create_tags = Mock()
+        aws_client.ec2_client.delete_tags = Mock()
+        aws_client.ec2_client.stop_instances = Mock()
+        aws_client.ec2_client.terminate_instances = Mock()
+        aws_client.shrink_pool = Mock()
+        aws_client.upload_input = Mock()
+        aws_client.send_ssm_shell_command = Mock(return_value={
+            'CommandId': 'abc', 'CommandIdStatus': 'Failed', 'CommandList': 'ls', 'StdOut': '', 'StdErr': ''})
+        job_client = aws_client.get_job_client('a/vht.tar')
+        job_client.lease_instance = Mock(side_effect=lease_instance)
+
+        # running the actual method
+        result = aws_client.run_job(job_client)
+
+        # asserting values: the pool instance is released once and never stopped/terminated
+        assert result['Status'] == 'Failed'
+        assert aws_client.ec2_client.delete_tags.call_count == 1
+        assert aws_client.shrink_pool.call_count == 1
+        assert not aws_client.ec2_client.stop_instances.called
+        assert not aws_client.ec2_client.terminate_instances.called
+
+    def test_create_instance_spot(self):
+        aws_client = self.get_vht_aws_instance()
+        aws_client.instance_market = 'spot'
+        aws_client.spot_max_price = '0.05'
+        no_capacity = ClientError({'Error': {'Code': 'InsufficientInstanceCapacity', 'Message': ''}}, 'RunInstances')
+
+        # mocking methods
+        aws_client.create_ec2_instance = Mock(return_value='i-spot')
+
+        # running the actual method
+        assert aws_client.create_instance() == 'i-spot'
+
+        # asserting values
+        market_options = aws_client.create_ec2_instance.call_args[1]['InstanceMarketOptions']
+        assert market_options['MarketType'] == 'spot'
+        assert market_options['SpotOptions']['MaxPrice'] == '0.05'
+        assert aws_client.instance_spot
+
+        # no spot capacity: on-demand fallback
+        aws_client.create_ec2_instance = Mock(side_effect=[no_capacity, 'i-on-demand'])
+        assert aws_client.create_instance() == 'i-on-demand'
+        assert 'InstanceMarketOptions' not in aws_client.create_ec2_instance.call_args[1]
+        assert not aws_client.instance_spot
+
+        # fallback disabled
+        aws_client.spot_fallback = False
+        aws_client.create_ec2_instance = Mock(side_effect=[no_capacity])
+        with self.assertRaises(ClientError):
+            aws_client.create_instance()
+
+    def test_is_spot_interrupted(self):
+        aws_client = self.get_vht_aws_instance()
+
+        def describe(state, code):
+            return {'Reservations': [{'Instances': [{
+                'InstanceId': 'i-instance342321',
+                'InstanceLifecycle': 'spot',
+                'State': {'Name': state},
+                'StateReason': {'Code': code}
+            }]}]}
+
+        # mocking methods
+        aws_client.ec2_client.describe_instances = Mock(side_effect=[
+            describe('running', ''),
+            describe('terminated', 'Server.SpotInstanceTermination'),
+            describe('shutting-down', ''),
+            describe('shutting-down', 'Client.UserInitiatedShutdown'),
+        ])
+
+        # running the actual method
+        assert not aws_client.is_spot_interrupted()
+        assert aws_client.is_spot_interrupted()
+        assert aws_client.is_spot_interrupted()
+        # terminated by the teardown of VHT
+        aws_client.instance_torn_down = True
+        assert not aws_client.is_spot_interrupted()
+
+    def test_run_job_spot_interrupted(self):
+        aws_client = self.get_vht_aws_instance()
+        aws_client.instance_market = 'spot'
+        aws_client.spot_max_retries = 1
+        markets = []
+
+        def run(job_client):
+            markets.append(job_client.instance_market)
+            job_client.instance_id = f"i-{len(markets)}"
+            job_client.instance_spot = job_client.instance_market == 'spot'
+            if job_client.instance_spot:
+                raise SystemExit(-1)
+
+        # mocking methods
+        with patch.object(vht.aws.AWSClient, 'run', autospec=True, side_effect=run), \
+             patch.object(vht.aws.AWSClient, 'is_spot_interrupted', return_value=True), \
+             patch.object(vht.aws.AWSClient, 'teardown', autospec=True) as teardown:
+            # running the actual method
+            result = aws_client.run_job(aws_client.get_job_client('a/vht.tar'))
+
+        # asserting values: re-queued once on spot, then on-demand
+        assert markets == ['spot', 'spot', 'on-demand'], f"Found {markets}"
+        assert result['Status'] == 'Success'
+        assert result['Interruptions'] == 2
+        assert result['InstanceId'] == 'i-3'
+        assert not teardown.called
+        assert aws_client.instance_market == 'spot'
+
+    def test_start_fleet(self):
+        aws_client = self.get_vht_aws_instance()
+        not_found = ClientError({'Error': {'Code': 'InvalidInstanceID.NotFound', 'Message': 'i-bad'}}, 'StartInstances')
+
+        def status(instance_id, state, ok='ok'):
+            return {'InstanceId': instance_id, 'InstanceState': {'Name': state},
+                    'InstanceStatus': {'Status': ok}, 'SystemStatus': {'Status': ok}}
+
+        # mocking methods
+        aws_client.ec2_client.start_instances = Mock(side_effect=[not_found, None, not_found, None])
+        aws_client.ec2_client.describe_instance_status = Mock(side_effect=[
+            {'InstanceStatuses': [status('i-1', 'pending', 'initializing'), status('i-2', 'running', 'initializing')]},
+            {'InstanceStatuses': [status('i-1', 'running'), status('i-2', 'running')]},
+        ])
+
+        # running the actual method
+        with patch('vht.aws.time.sleep') as sleep:
+            results = aws_client.start_fleet(['i-1', 'i-bad', 'i-2'])
+
+        # asserting values: the failed batch is retried per instance, one poller for all instances
+        assert [call[1]['InstanceIds'] for call in aws_client.ec2_client.start_instances.call_args_list] == \
+            [['i-1', 'i-bad', 'i-2'], ['i-1'], ['i-bad'], ['i-2']]
+        assert list(results) == ['i-1', 'i-bad', 'i-2']
+        assert results['i-1']['Status'] == 'Success' and results['i-2']['Status'] == 'Success'
+        assert results['i-bad']['Status'] == 'Failed'
+        assert results['i-bad']['Error'].startswith('InvalidInstanceID.NotFound')
+        assert aws_client.ec2_client.describe_instance_status.call_count == 2
+        assert aws_client.ec2_client.describe_instance_status.call_args[1]['InstanceIds'] == ['i-1', 'i-2']
+        assert sleep.call_count == 1
+
+    def test_wait_fleet(self):
+        aws_client = self.get_vht_aws_instance()
+
+        # mocking methods
+        aws_client.ec2_client.describe_instance_status = Mock(return_value={'InstanceStatuses': [
+            {'InstanceId': 'i-1', 'InstanceState': {'Name': 'terminated'}},
+            {'InstanceId': 'i-2', 'InstanceState': {'Name': 'stopping'}},
+        ]})
+
+        # running the actual method
+        with patch('vht.aws.time.sleep'):
+            results = aws_client.wait_fleet(['i-1', 'i-2', 'i-3'], 'stopped', timeout=0)
+            terminated = aws_client.wait_fleet(['i-1', 'i-3'], 'terminated')
+
+        # asserting values
+        assert results['i-1']['Status'] == 'Failed'
+        assert results['i-2'] == {'State': 'stopping', 'Status': 'TimedOut', 'Error': 'Instance not stopped after 0 s'}
+        assert results['i-3']['Status'] == 'TimedOut'
+        assert [result['Status'] for result in terminated.values()] == ['Success', 'Success']
+
+    def test_run_task_graph(self):
+        events = []
+        boot_started = threading.Event()
+
+        def boot():
+            boot_started.set()
+            time.sleep(0.1)
+            events.append('boot')
+
+        def upload():
+            # runs while the instance is booting
+            assert boot_started.wait(1)
+            events.append('upload')
+            return 'key'
+
+        results = vht.aws.run_task_graph({
+            'instance': (boot, []),
+            'input': (upload, []),
+            'execute': (lambda: events.append('execute'), ['instance', 'input'])
+        })
+        assert events == ['upload', 'boot', 'execute'], f"Found {events}"
+        assert results['input'] == 'key'
+
+        # failure: running tasks are finished, dependent tasks are not started
+        events.clear()
+        with self.assertRaises(SystemExit):
+            vht.aws.run_task_graph({
+                'instance': (boot, []),
+                'input': (lambda: sys.exit(-1), []),
+                'execute': (lambda: events.append('execute'), ['instance', 'input'])
+            })
+        assert events == ['boot'], f"Found {events}"
+
+        with self.assertRaises(ValueError):
+            vht.aws.run_task_graph({'a': (lambda: None, ['b'])})
+
+    def test_run(self):
+        aws_client = self.get_vht_aws_instance()
+        events = []
+
+        # mocking methods
+        aws_client.prepare_instance = Mock(side_effect=lambda: events.append('instance'))
+        aws_client.upload_input = Mock(side_effect=lambda: events.append('input'))
+        aws_client.send_remote_command_batch = Mock(side_effect=lambda *args, **kwargs: events.append('execute'))
+        aws_client.download_file_from_cloud = Mock()
+        aws_client.delete_file_from_cloud = Mock()
+        aws_client.teardown = Mock()
+
+        # running the actual method
+        with tempfile.TemporaryDirectory() as tmp:
+            aws_client.run_report_file = os.path.join(tmp, 'run_report.json')
+            aws_client.run()
+            with open(aws_client.run_report_file) as f:
+                report = json.load(f)
+
+        # asserting values
+        assert sorted(events[:2]) == ['input', 'instance'] and events[2] == 'execute', f"Found {events}"
+        aws_client.download_file_from_cloud.assert_called_with(filename=aws_client.vht_out, key=aws_client.vht_out_key)
+        assert aws_client.teardown.called
+        assert sorted(phase['Name'] for phase in report['Phases']) == \
+            ['delete', 'download', 'execute', 'input', 'instance', 'teardown']
+        assert all(phase['Status'] == 'Success' for phase in report['Phases'])
+        assert report['InstanceId'] == 'i-instance342321'
+        assert report['InstanceSeconds'] is not None
+
+    def test_run_failed(self):
+        aws_client = self.get_vht_aws_instance()
+
+        # mocking methods
+        aws_client.prepare_instance = Mock()
+        aws_client.upload_input = Mock()
+        aws_client.send_remote_command_batch = Mock(side_effect=RuntimeError('boom'))
+        aws_client.download_file_from_cloud = Mock()
+        aws_client.teardown = Mock()
+
+        # running the actual method: the instance is torn down
+        with self.assertRaises(RuntimeError):
+            aws_client.run()
+        assert aws_client.teardown.call_count == 1
+        assert not aws_client.download_file_from_cloud.called
+
+        # the failed command already tore down the instance
+        def send_remote_command_batch(*args, **kwargs):
+            aws_client.instance_torn_down = True
+            sys.exit(-1)
+        aws_client.teardown = Mock()
+        aws_client.send_remote_command_batch = Mock(side_effect=send_remote_command_batch)
+        with self.assertRaises(SystemExit):
+            aws_client.run()
+        assert not aws_client.teardown.called
+
+    def test_run_result_cache(self):
+        aws_client = self.get_vht_aws_instance()
+        aws_client.ami_id = 'ami-0c5eeabe11f3a2685'
+
+        def download(filename, key):
+            with open(filename, 'w') as f:
+                f.write('output')
+
+        # mocking methods
+        aws_client.prepare_instance = Mock()
+        aws_client.upload_input = Mock()
+        aws_client.send_remote_command_batch = Mock()
+        aws_client.download_file_from_cloud = Mock(side_effect=download)
+        aws_client.delete_file_from_cloud = Mock()
+        aws_client.teardown = Mock()
+
+        aws_client.process_vht_version = '"agent-v1"'
+
+        with tempfile.TemporaryDirectory() as tmp:
+            aws_client.result_cache = 'local'
+            aws_client.result_cache_dir = os.path.join(tmp, 'results')
+            aws_client.vht_in = os.path.join(tmp, 'vht.tar')
+            aws_client.vht_out = os.path.join(tmp, 'out.tar')
+            with open(aws_client.vht_in, 'w') as f:
+                f.write('input')
+
+            # miss: the pipeline runs and the output is cached
+            aws_client.run()
+            assert aws_client.send_remote_command_batch.call_count == 1
+            cache_key = aws_client.get_result_cache_key()
+            assert os.path.isfile(os.path.join(tmp, 'results', cache_key, 'out.tar'))
+
+            # hit: returns without instance, also for a job with other S3 keys
+            os.remove(aws_client.vht_out)
+            job_client = aws_client.get_job_client(aws_client.vht_in)
+            job_client.vht_out = aws_client.vht_out
+            assert job_client.get_result_cache_key() == cache_key
+            job_client.run()
+            assert aws_client.prepare_instance.call_count == 1
+            with open(aws_client.vht_out) as f:
+                assert f.read() == 'output'
+
+            # other AMI or VHT agent: miss
+            aws_client.ami_id = 'ami-other'
+            assert aws_client.get_result_cache_key() != cache_key
+            aws_client.ami_id = 'ami-0c5eeabe11f3a2685'
+            aws_client.process_vht_version = '"agent-v2"'
+            assert aws_client.get_result_cache_key() != cache_key
+            aws_client.process_vht_version = '"agent-v1"'
+
+            # VHT agent version unknown: the cache is skipped
+            with patch('vht.aws.urllib.request.urlopen', side_effect=OSError('offline')):
+                job_client = aws_client.get_job_client(aws_client.vht_in)
+                job_client.process_vht_version = None
+                assert job_client.get_result_cache_key() is None
+                job_client.run()
+            assert aws_client.send_remote_command_batch.call_count == 2
+
+            # force: runs again
+            aws_client.result_cache_force = True
+            aws_client.run()
+            assert aws_client.send_remote_command_batch.call_count == 3
+
+        # unknown result_cache
+        os.environ['result_cache'] = 'S3-bucket'
+        try:
+            with self.assertRaises(SystemExit):
+                self.get_vht_aws_instance()
+        finally:
+            del os.environ['result_cache']
+
+    def test_fetch_cached_result_s3(self):
+        aws_client = self.get_vht_aws_instance()
+        aws_client.result_cache = 's3'
+        not_found = ClientError({'Error': {'Code': '404', 'Message': 'Not Found'}}, 'HeadObject')
+
+        # mocking methods
+        aws_client.s3_client.head_object = Mock(side_effect=[not_found, {'ContentLength': 6}])
+        aws_client.s3_client.copy = Mock()
+        aws_client.download_file_from_cloud = Mock()
+
+        # running the actual method
+        assert not aws_client.fetch_cached_result('abc')
+        assert aws_client.fetch_cached_result('abc')
+        aws_client.store_cached_result('abc')
+
+        # asserting values: server-side copy of the output object
+        aws_client.download_file_from_cloud.assert_called_with(filename=aws_client.vht_out, key='results/abc/out.tar')
+        assert aws_client.s3_client.copy.call_args[0] == \
+            ({'Bucket': 'gh-orta-vht', 'Key': aws_client.vht_out_key}, 'gh-orta-vht', 'results/abc/out.tar')
+
+    def test_compressed_transfer(self):
+        aws_client = self.get_vht_aws_instance()
+        aws_client.s3_compression = 'gzip'
+        objects = {}
+
+        def upload_fileobj(fileobj, bucket, key, Config=None, Callback=None):
+            objects[key] = fileobj.read()
+            Callback(len(objects[key]))
+
+        def download_fileobj(bucket, key, fileobj, Config=None, Callback=None):
+            # multipart download writes in parts
+            for i in range(0, len(objects[key]), 1000):
+                fileobj.write(objects[key][i:i + 1000])
+                Callback(len(objects[key][i:i + 1000]))
+
+        # mocking methods
+        aws_client.s3_client.upload_fileobj = Mock(side_effect=upload_fileobj)
+        aws_client.s3_client.download_fileobj = Mock(side_effect=download_fileobj)
+        aws_client.s3_client.head_object = Mock(side_effect=ClientError({'Error': {'Code': '404'}}, 'HeadObject'))
+
+        with tempfile.TemporaryDirectory() as tmp:
+            content = b'trace line 0123456789\n' * 100000
+            with open(os.path.join(tmp, 'vht.tar'), 'wb') as f:
+                f.write(content)
+
+            # running the actual methods
+            assert aws_client.upload_archive(os.path.join(tmp, 'vht.tar'), 'inputs/abc/vht.tar.gz', if_missing=True)
+            aws_client.download_archive(os.path.join(tmp, 'out.tar'), 'inputs/abc/vht.tar.gz')
+
+            # asserting values
+            assert len(objects['inputs/abc/vht.tar.gz']) < len(content) // 10
+            with open(os.path.join(tmp, 'out.tar'), 'rb') as f:
+                assert f.read() == content
+
+            # corrupted object: the decompression error is raised
+            objects['broken.gz'] = b'not gzip' * 100000
+            with self.assertRaises(OSError):
+                aws_client.download_archive(os.path.join(tmp, 'broken.tar'), 'broken.gz')
+
+            # failed upload: the transfer error is raised
+            aws_client.s3_client.upload_fileobj = Mock(side_effect=ClientError({'Error': {'Code': 'AccessDenied'}}, 'PutObject'))
+            with self.assertRaises(ClientError):
+                aws_client.upload_archive(os.path.join(tmp, 'vht.tar'), 'vht.tar.gz')
+
+    def test_compressed_upload_failed(self):
+        aws_client = self.get_vht_aws_instance()
+        aws_client.s3_compression = 'gzip'
+        objects = {}
+
+        def upload_fileobj(fileobj, bucket, key, Config=None, Callback=None):
+            # the object is stored only when the whole stream was read (multipart upload)
+            data = b''
+            for block in iter(lambda: fileobj.read(1000), b''):
+                data += block
+            objects[key] = data
+
+        class FailingCompressor():
+            def __init__(self, fileobj):
+                self.fileobj = fileobj
+                self.written = 0
+
+            def __enter__(self):
+                return self
+
+            def __exit__(self, *args):
+                return False
+
+            def write(self, block):
+                if self.written > 0:
+                    raise OSError("compression failed")
+                self.fileobj.write(block[:100])
+                self.written += len(block)
+
+        # mocking methods
+        aws_client.s3_client.upload_fileobj = Mock(side_effect=upload_fileobj)
+
+        with tempfile.TemporaryDirectory() as tmp, \
+                patch('vht.compression.open_compressor', side_effect=lambda f, c: FailingCompressor(f)), \
+                patch('vht.compression.CHUNK_SIZE', 1000):
+            with open(os.path.join(tmp, 'vht.tar'), 'wb') as f:
+                f.write(bytes(10000))
+
+            # running the actual methods: the compression error aborts the transfer
+            with self.assertRaisesRegex(OSError, "compression failed"):
+                aws_client.upload_file_to_cloud_compressed(os.path.join(tmp, 'vht.tar'), 'inputs/abc/vht.tar.gz')
+
+            # asserting values: no truncated object is stored
+            assert objects == {}
+
+    def test_compressed_commands(self):
+        aws_client = self.get_vht_aws_instance()
+        aws_client.s3_compression = 'zstd'
+        job_client = aws_client.get_job_client('a/vht.tar')
+
+        commands = job_client.get_process_vht_commands()
+
+        assert job_client.vht_in_key.endswith('/vht.tar.zst') and job_client.vht_out_key.endswith('/out.tar.zst')
+        assert f"aws s3 cp --quiet s3://gh-orta-vht/{job_client.vht_in_key} - | zstd -q -T0 -dc > /home/ubuntu/vhtwork/vht.tar" in commands[-3]
+        assert commands[-1] == "runuser -l ubuntu -c 'set -o pipefail; zstd -q -T0 -c /home/ubuntu/vhtwork/out.tar | " \
+                               f"aws s3 cp --quiet - s3://gh-orta-vht/{job_client.vht_out_key}'"
+        assert any('apt install zstd -y' in command for command in commands)
+
+    def test_run_report(self):
+        aws_client = self.get_vht_aws_instance()
+        report = aws_client.run_report
+
+        # API calls are counted by the client hook in the phase of the calling thread (not outside of phases)
+        with Stubber(aws_client.ec2_client) as stubber:
+            stubber.add_response('describe_instances', {'Reservations': [{'Instances': [{'State': {'Name': 'running'}}]}]})
+            stubber.add_response('describe_instances', {'Reservations': [{'Instances': [{'State': {'Name': 'running'}}]}]})
+            with report.phase('instance'):
+                aws_client.get_instance_state()
+            aws_client.get_instance_state()
+
+        with self.assertRaises(SystemExit):
+            with report.phase('teardown'):
+                sys.exit(-1)
+        report.add_command('cmd-1', 'ls -la', 'Success', 0.5)
+
+        result = report.get_report(InstanceId='i-1')
+        assert result['ApiCalls'] == {'ec2.DescribeInstances': 1}, f"Found {result['ApiCalls']}"
+        assert result['Phases'][0]['ApiCalls'] == {'ec2.DescribeInstances': 1}
+        assert [phase['Status'] for phase in result['Phases']] == ['Success', 'Failed']
+        assert result['Commands'][0]['Command'] == 'ls -la'
+        assert result['InstanceId'] == 'i-1'
+        summary = report.get_summary()
+        assert 'teardown 0.0 s (Failed)' in summary and '1 API calls' in summary, f"Found {summary}"
+
+    def test_run_jobs(self):
+        aws_client = self.get_vht_aws_instance()
+        started = []
+
+        def run(job_client):
+            job_client.instance_id = f"i-{len(started)}"
+            started.append(job_client)
+            if job_client.vht_in == 'b/fail.tar':
+                raise SystemExit(-1)
+
+        # mocking methods
+        with patch.object(vht.aws.AWSClient, 'run', autospec=True, side_effect=run), \
+             patch.object(vht.aws.AWSClient, 'teardown', autospec=True) as teardown:
+            # running the actual method
+            results = aws_client.run_jobs(['a/vht.tar', 'b/fail.tar', 'c/vht.tar'], max_workers=2)
+
+        # asserting values
+        assert [result['Job'] for result in results] == ['a/vht.tar', 'b/fail.tar', 'c/vht.tar']
+        assert [result['Status'] for result in results] == ['Success', 'Failed', 'Success']
+        assert results[0]['Output'] == 'a/vht.out.tar', f"Found {results[0]['Output']}"
+        assert teardown.call_count == 1
+        assert len({job_client.vht_in_key for job_client in started}) == 3
+        assert all(job_client.vht_out_key.startswith('jobs/') for job_client in started)
+        assert aws_client.instance_id == self.data['instance_id']
+
+    def test_run_queue(self):
+        aws_client = self.get_vht_aws_instance()
+        runs = []
+
+        def run_job(job_client):
+            runs.append(os.path.basename(job_client.vht_in))
+            if job_client.vht_in.endswith('broken.tar'):
+                raise RuntimeError('broken')
+            status = 'Failed' if job_client.vht_in.endswith('flaky.tar') and runs.count('flaky.tar') == 1 else 'Success'
+            return {'Job': job_client.vht_in, 'Status': status, 'Error': '', 'Duration': 1.0}
+
+        with tempfile.TemporaryDirectory() as tmp:
+            aws_client.job_queue_file = os.path.join(tmp, 'jobs.sqlite')
+            aws_client.submit_jobs(['a.tar', 'flaky.tar'], max_attempts=2)
+            aws_client.submit_jobs(['urgent.tar'], priority=5)
+            aws_client.submit_jobs(['broken.tar'], priority=-1, max_attempts=1)
+
+            # mocking methods
+            aws_client.run_job = Mock(side_effect=run_job)
+
+            # running the actual method
+            stats = aws_client.run_queue(max_workers=1)
+            jobs = aws_client.list_jobs()
+
+        # asserting values: priority first, the failed attempt is retried, an exception fails the job
+        assert runs == ['urgent.tar', 'a.tar', 'flaky.tar', 'flaky.tar', 'broken.tar'], f"Found {runs}"
+        assert stats == {'queued': 0, 'running': 0, 'success': 3, 'failed': 1}
+        assert [job['attempts'] for job in jobs] == [1, 1, 2, 1]
+        assert jobs[3]['error'] == "RuntimeError('broken')"
+
+    def test_send_remote_command_sequence(self):
+        aws_client = self.get_vht_aws_instance()
+        command_list = ['echo a', 'ls missing', 'echo c']
+
+        script = aws_client.get_command_sequence_script(command_list)
+        assert script.count('( echo a )') == 1
+        assert script.count('[ $rc -eq 0 ] || exit $rc') == 3
+
+        # mocking methods
+        aws_client.send_ssm_shell_command = Mock(return_value={
+            'CommandId': 'da584039-585c-4fd7-b30f-fad58c42c881',
+            'CommandIdStatus': 'Success',
+            'CommandList': script,
+            'StdOut': '##VHT_STEP_BEGIN 0##\na\n##VHT_STEP_END 0 0##\n'
+                      '##VHT_STEP_BEGIN 1##\n##VHT_STEP_END 1 0##\n'
+                      '##VHT_STEP_BEGIN 2##\nc\n##VHT_STEP_END 2 0##\n',
+            'StdErr': '##VHT_STEP_BEGIN 0##\n##VHT_STEP_END 0 0##\n'
+                      '##VHT_STEP_BEGIN 1##\nwarning##VHT_STEP_END 1 0##\n'
+                      '##VHT_STEP_BEGIN 2##\n##VHT_STEP_END 2 0##\n'
+        })
+
+        # running the actual method
+        response = aws_client.send_remote_command_batch(command_list, '/home/ubuntu', single_invocation=True)
+
+        # asserting values
+        assert aws_client.send_ssm_shell_command.call_count == 1
+        assert [r['CommandIdStatus'] for r in response] == ['Success'] * 3
+        assert [r['StdOut'] for r in response] == ['a\n', '', 'c\n']
+        assert response[1]['StdErr'] == 'warning'
+
+        # failed step: remaining steps are skipped, instance is torn down
+        aws_client.send_ssm_shell_command.return_value = {
+            'CommandId': 'da584039-585c-4fd7-b30f-fad58c42c881',
+            'CommandIdStatus': 'Failed',
+            'CommandList': script,
+            'StdOut': '##VHT_STEP_BEGIN 0##\na\n##VHT_STEP_END 0 0##\n##VHT_STEP_BEGIN 1##\n##VHT_STEP_END 1 2##\n',
+            'StdErr': '##VHT_STEP_BEGIN 0##\n##VHT_STEP_END 0 0##\n##VHT_STEP_BEGIN 1##\nNo such file\n##VHT_STEP_END 1 2##\n'
+        }
+        aws_client.teardown = Mock()
+        response = aws_client.send_remote_command_sequence(command_list, '/home/ubuntu', fail_if_unsuccess=False)
+        assert [r['CommandIdStatus'] for r in response] == ['Success', 'Failed', 'Skipped']
+        assert response[1]['ExitCode'] == 2
+        assert response[1]['StdErr'] == 'No such file\n'
+        assert not aws_client.teardown.called
+
+        with self.assertRaises(SystemExit):
+            aws_client.send_remote_command_sequence(command_list, '/home/ubuntu')
+        assert aws_client.teardown.called
+
+    def test_follow_ssm_command_output(self):
+        aws_client = self.get_vht_aws_instance()
+        output = io.StringIO()
+
+        # mocking methods
+        aws_client.wait_ssm_command_finished = Mock(side_effect=['InProgress', 'InProgress', 'Failed'])
+        aws_client.read_remote_file = Mock(side_effect=[
+            b'step 1\n', b'', b'x' * 12000, b'step 2\n', b''
+        ])
+
+        # running the actual method
+        status = aws_client.follow_ssm_command_output('8f181e5d', '/tmp/vht.log', output=output)
+
+        # asserting values
+        assert status == 'Failed'
+        assert output.getvalue() == 'step 1\n' + 'x' * 12000 + 'step 2\n'
+        offsets = [c.args[1] for c in aws_client.read_remote_file.call_args_list]
+        assert offsets == [0, 7, 7, 12007, 12014], f"Found {offsets}"
+        assert aws_client.read_remote_file.call_args_list[-1].kwargs == {'delete': True}
+        # no new output: the next interval is doubled, new output resets it
+        intervals = [c.kwargs['min_delay'] for c in aws_client.wait_ssm_command_finished.call_args_list]
+        assert intervals == [5, 5, 10], f"Found {intervals}"
+
+    @unittest.skipIf(shutil.which('bash') is None or shutil.which('mkfifo') is None, "needs bash and mkfifo")
+    def test_get_stream_output_script(self):
+        aws_client = self.get_vht_aws_instance()
+
+        with tempfile.TemporaryDirectory() as tmp:
+            log_file = os.path.join(tmp, 'vht.log')
+            # a step reading stdin must not consume the following steps
+            script = aws_client.get_stream_output_script("cat\necho out\necho err >&2\nexit 3", log_file)
+
+            # running the actual method (the SSM agent runs the commands with sh)
+            result = subprocess.run(['sh', '-c', script], cwd=tmp, input=b'echo never\n', capture_output=True)
+
+            # asserting values
+            assert result.returncode == 3
+            assert result.stdout == b'out\n' and result.stderr == b'err\n'
+            with open(log_file) as f:
+                assert sorted(f.read().splitlines()) == ['err', 'out']
+            assert os.listdir(tmp) == ['vht.log']
+
+    def test_read_remote_file(self):
+        aws_client = self.get_vht_aws_instance()
+
+        # mocking methods
+        aws_client.ssm_client.send_command = Mock(return_value={'Command': {'CommandId': '8f181e5d'}})
+        aws_client.wait_ssm_command_finished = Mock(return_value='Success')
+        aws_client.ssm_client.get_command_invocation = Mock(return_value={
+            'StandardOutputContent': 'aGVsbG8K\n'
+        })
+
+        # running the actual method
+        data = aws_client.read_remote_file('/tmp/vht.log', 100, 12000)
+
+        # asserting values
+        assert data == b'hello\n'
+        command = aws_client.ssm_client.send_command.call_args.kwargs['Parameters']['commands'][0]
+        assert command == 'tail -c +101 /tmp/vht.log 2>/dev/null | head -c 12000 | base64 -w0', f"Found {command}"
+
+    def test_upload_file_to_cloud(self):
+        os.environ['s3_multipart_chunksize'] = '32'
+        os.environ['s3_max_concurrency'] = '24'
+        aws_client = self.get_vht_aws_instance()
+        del os.environ['s3_multipart_chunksize']
+        del os.environ['s3_max_concurrency']
+
+        # mocking methods
+        aws_client.s3_client.upload_file = Mock(side_effect=lambda *args, **kwargs: kwargs['Callback'](1000))
+
+        # running the actual method
+        with patch('vht.aws.os.path.getsize', return_value=4000):
+            aws_client.upload_file_to_cloud('vht.tar', 'vht.tar')
+
+        # asserting values
+        config = aws_client.s3_client.upload_file.call_args.kwargs['Config']
+        assert config.multipart_chunksize == 32 * 1024 * 1024
+        assert config.max_concurrency == 24
+        assert aws_client.s3_max_pool_connections == 28
+        assert aws_client.s3_client.meta.config.max_pool_connections == 28
+
+    def test_transfer_progress(self):
+        progress = vht.aws.TransferProgress('Upload vht.tar', 4 * 10**6, interval=0)
+        with self.assertLogs(level='INFO') as logs:
+            progress(10**6)
+            progress(10**6)
+        assert progress.transferred == 2 * 10**6
+        assert logs.output[-1].startswith('INFO:root:aws:Upload vht.tar: 50% (2.0 MB of 4.0 MB), ')
+
+    def test_upload_file_to_cloud_if_missing(self):
+        aws_client = self.get_vht_aws_instance()
+        with tempfile.TemporaryDirectory() as tmp:
+            filename = os.path.join(tmp, 'vht.tar')
+            with open(filename, 'wb') as f:
+                f.write(b'vht')
+            key = aws_client.get_content_addressed_key(filename, 'vht.tar')
+            assert key == f"inputs/{hashlib.sha256(b'vht').hexdigest()}/vht.tar", f"Found {key}"
+
+            # mocking methods
+            aws_client.upload_file_to_cloud = Mock()
+            aws_client.s3_client.head_object = Mock(return_value={'ContentLength': 3})
+
+            # running the actual method: object present
+            assert aws_client.upload_file_to_cloud_if_missing(filename, key) is False
+            assert not aws_client.upload_file_to_cloud.called
+
+            # object missing
+            aws_client.s3_client.head_object = Mock(side_effect=ClientError(
+                {'Error': {'Code': '404', 'Message': 'Not Found'}}, 'HeadObject'))
+            assert aws_client.upload_file_to_cloud_if_missing(filename, key) is True
+            aws_client.upload_file_to_cloud.assert_called_with(filename, key)
+
+    def test_sync_workspace(self):
+        aws_client = self.get_vht_aws_instance()
+        with tempfile.TemporaryDirectory() as tmp:
+            for name, content in (('a.c', b'a'), ('b.c', b'b')):
+                with open(os.path.join(tmp, name), 'wb') as f:
+                    f.write(content)
+            aws_client.workspace_sync_dir = tmp
+            aws_client.workspace_sync_name = 'project'
+
+            # mocking methods: b.c is known from the last sync
+            aws_client.get_s3_file_content = Mock(return_value=json.dumps(
+                {'files': {'b.c': {'sha256': hashlib.sha256(b'b').hexdigest(), 'size': 1}}}))
+            aws_client.s3_client.upload_file = Mock()
+            aws_client.s3_client.put_object = Mock()
+
+            # running the actual method
+            response = aws_client.sync_workspace()
+
+        # asserting values
+        assert response == {'Files': 2, 'Uploaded': 1, 'UploadedBytes': 1}, f"Found {response}"
+        aws_client.get_s3_file_content.assert_called_with('workspace/project/manifest.json')
+        assert aws_client.s3_client.upload_file.call_args.args[2] == f"workspace/objects/{hashlib.sha256(b'a').hexdigest()}"
+        keys = [call.kwargs['Key'] for call in aws_client.s3_client.put_object.call_args_list]
+        assert keys[0].startswith('workspace/project/manifests/') and keys[0] == aws_client.workspace_manifest_key
+        assert keys[1] == 'workspace/project/manifest.json'
+
+        # the instance reads the manifest of this run, not the last one
+        commands = aws_client.get_process_vht_commands()
+        assert any(f"s3://{aws_client.s3_bucket_name}/{keys[0]} " in command for command in commands)
+        assert not any('vht.tar /home/ubuntu/vhtwork' in command for command in commands)
+        assert any(command.endswith("python3 vht_sync.py apply'") for command in commands)
+
+    def test_get_process_vht_commands(self):
+        aws_client = self.get_vht_aws_instance()
+
+        commands = aws_client.get_process_vht_commands()
+        assert commands[1].startswith(f"[ -f /var/lib/vht/provision/{vht.aws.PROVISION_VERSION}-")
+        assert 'apt update && apt install awscli -y' in commands[1]
+        assert not any(command == 'rm -rf /home/ubuntu/vhtagent' for command in commands)
+        assert 'find index.pidx -mmin -1440' in commands[4]
+        assert commands.index('rm -rf /home/ubuntu/vhtwork') < len(commands) - 3
+
+        aws_client.provision_cache = False
+        commands = aws_client.get_process_vht_commands()
+        assert 'apt update' in commands and 'rm -rf /home/ubuntu/vhtagent' in commands
+
+    @unittest.skipIf(shutil.which('sh') is None, 'needs a POSIX shell')
+    def test_get_provision_step(self):
+        aws_client = self.get_vht_aws_instance()
+        with tempfile.TemporaryDirectory() as tmp:
+            aws_client.provision_marker_dir = f"{tmp}/provision"
+            log = os.path.join(tmp, 'log')
+            step = aws_client.get_provision_step(f"echo run >> {log}")
+
+            # the step runs once, a changed command runs again
+            for command in (step, step, aws_client.get_provision_step(f"echo run2 >> {log}")):
+                subprocess.run(['sh', '-c', command], check=True)
+            with open(log) as f:
+                assert f.read() == 'run\nrun2\n'
+
+            # a failed step leaves no marker
+            failed = aws_client.get_provision_step('false')
+            assert subprocess.run(['sh', '-c', failed]).returncode != 0
+            assert subprocess.run(['sh', '-c', failed]).returncode != 0
+
+    def test_lazy_clients(self):
+        with patch('boto3.session.Session.client') as client, patch('boto3.session.Session.resource') as resource:
+            aws_client = self.get_vht_aws_instance()
+
+            # no client is created by the constructor
+            assert not client.called
+            assert not resource.called
+
+            # clients are created once on first use
+            assert aws_client.ssm_client is aws_client.ssm_client
+            client.assert_called_once_with('ssm', config=None)
+            aws_client.s3_resource
+            assert resource.call_args[0] == ('s3',)
+            assert resource.call_args[1]['config'].max_pool_connections == aws_client.s3_max_pool_connections
+
+            # job clients share the created clients
+            assert aws_client.get_job_client('vht.tar').ssm_client is aws_client.ssm_client
+            assert client.call_count == 1
+
+        with self.assertRaises(AttributeError):
+            aws_client.unknown_client
+
+    def test_get_image_id_cache(self):
+        aws_client = self.get_vht_aws_instance()
+        aws_client.ami_version = self.data['ami_version']
+        with tempfile.TemporaryDirectory() as tmp:
+            aws_client.ami_cache_file = os.path.join(tmp, 'vht', 'ami_ids.json')
+
+            # mocking methods
+            aws_client.ec2_client.describe_images = Mock(return_value={'Images': [{'ImageId': 'ami-0c5eeabe11f3a2685'}]})
+
+            # running the actual method: the second call is served from the cache
+            assert aws_client.get_image_id() == 'ami-0c5eeabe11f3a2685'
+            assert aws_client.get_image_id() == 'ami-0c5eeabe11f3a2685'
+            assert aws_client.ec2_client.describe_images.call_count == 1
+            with open(aws_client.ami_cache_file) as f:
+                assert list(json.load(f)) == ['eu-west-1/1.1.0']
+
+            # expired entry
+            with patch('vht.aws.time.time', return_value=time.time() + aws_client.ami_cache_ttl + 1):
+                aws_client.get_image_id()
+            assert aws_client.ec2_client.describe_images.call_count == 2
+
+            # explicit invalidation: an AMI ID served from the cache is resolved again
+            aws_client.get_image_id()
+            assert aws_client.ec2_client.describe_images.call_count == 2
+            aws_client.ec2_client.describe_images.return_value = {'Images': [{'ImageId': 'ami-0new'}]}
+            aws_client.invalidate_image_id_cache()
+            assert aws_client.ec2_client.describe_images.call_count == 3
+            assert aws_client.ami_id == 'ami-0new'
+
+            # resolved by describe_images: not resolved again
+            aws_client.invalidate_image_id_cache()
+            assert aws_client.ec2_client.describe_images.call_count == 3
+
     @unittest.skip('Find out how to mock s3_resource.Object.get')
     def test_get_s3_file_content(self):
         aws_client = self.get_vht_aws_instance()
@@ -853,21 +1833,75 @@ class TestVhtAws(unittest.TestCase):
     def test_wait_ec2_running(self):
         pass
 
-    @unittest.skip('TODO')
     def test_wait_ec2_stopped(self):
-        pass
+        aws_client = self.get_vht_aws_instance()
+
+        # mocking methods
+        aws_client.ec2_client.get_waiter = Mock()
+
+        # running the actual method
+        aws_client.wait_ec2_stopped()
+
+        # asserting calls: the waiter comes from the shared EC2 client
+        aws_client.ec2_client.get_waiter.assert_called_once_with('instance_stopped')
+        aws_client.ec2_client.get_waiter.return_value.wait.assert_called_once_with(InstanceIds=['i-instance342321'])
 
-    @unittest.skip('TODO')
     def test_wait_ec2_terminated(self):
-        pass
+        aws_client = self.get_vht_aws_instance()
+
+        # mocking methods
+        aws_client.ec2_client.get_waiter = Mock()
+
+        # running the actual method
+        aws_client.wait_ec2_terminated()
+
+        # asserting calls
+        aws_client.ec2_client.get_waiter.assert_called_once_with('instance_terminated')
+        aws_client.ec2_client.get_waiter.return_value.wait.assert_called_once_with(InstanceIds=['i-instance342321'])
 
     @unittest.skip('TODO')
     def test_wait_s3_object_exists(self):
         pass
 
-    @unittest.skip('TODO')
     def test_wait_ssm_command_finished(self):
-        pass
+        aws_client = self.get_vht_aws_instance()
+        not_visible = aws_client.ssm_client.exceptions.InvocationDoesNotExist(
+            {'Error': {'Code': 'InvocationDoesNotExist', 'Message': ''}}, 'GetCommandInvocation')
+
+        # mocking methods
+        aws_client.ssm_client.get_command_invocation = Mock(side_effect=[
+            not_visible,
+            {'Status': 'Pending'},
+            {'Status': 'InProgress'},
+            {'Status': 'InProgress'},
+            {'Status': 'InProgress'},
+            {'Status': 'Success'}
+        ])
+
+        # running the actual method
+        with patch('vht.aws.time.sleep') as sleep:
+            status = aws_client.wait_ssm_command_finished('8f181e5d', min_delay=0.25, max_delay=1)
+
+        # asserting values: exponential backoff capped at max_delay
+        assert status == 'Success'
+        assert [c.args[0] for c in sleep.call_args_list] == [0.25, 0.5, 1, 1, 1, 1]
+
+        # terminal failure ends the wait immediately
+        aws_client.ssm_client.get_command_invocation = Mock(side_effect=[
+            {'Status': 'InProgress'},
+            {'Status': 'Failed'},
+            {'Status': 'InProgress'}
+        ])
+        with patch('vht.aws.time.sleep'):
+            status = aws_client.wait_ssm_command_finished('8f181e5d')
+        assert status == 'Failed'
+        assert aws_client.ssm_client.get_command_invocation.call_count == 2
+
+        # timeout returns the last status
+        aws_client.ssm_client.get_command_invocation = Mock(return_value={'Status': 'InProgress'})
+        with patch('vht.aws.time.sleep'), patch('vht.aws.time.monotonic', side_effect=range(0, 1000, 5)):
+            status = aws_client.wait_ssm_command_finished('8f181e5d', max_delay=1, timeout=20)
+        assert status == 'InProgress'
 
     @unittest.skip('TODO')
     def test_terminate_ec2_instance(self):
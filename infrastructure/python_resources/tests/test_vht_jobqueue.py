@@ -0,0 +1,89 @@
+import os
+import shutil
+import tempfile
+import threading
+import unittest
+
+from unittest.mock import patch
+from vht import jobqueue
+
+
+class TestVhtJobQueue(unittest.TestCase):
+    """
+        Job Queue Test Cases
+    """
+    def setUp(self):
+        self.tmp = tempfile.mkdtemp()
+        self.queue = jobqueue.JobQueue(os.path.join(self.tmp, 'queue', 'jobs.sqlite'))
+
+    def tearDown(self):
+        shutil.rmtree(self.tmp)
+
+    def test_priority(self):
+        low = self.queue.submit('low.tar')
+        high = self.queue.submit('high.tar', priority=10)
+        low2 = self.queue.submit('low2.tar')
+
+        assert [job['id'] for job in self.queue.list('queued')] == [high, low, low2]
+        job = self.queue.claim('worker-1')
+        assert job['id'] == high
+        assert job['status'] == 'running' and job['attempts'] == 1 and job['worker'] == 'worker-1'
+        assert self.queue.claim('worker-1')['id'] == low
+        assert self.queue.get_stats() == {'queued': 1, 'running': 2, 'success': 0, 'failed': 0}
+
+        assert self.queue.cancel(low2)
+        assert not self.queue.cancel(low)
+        assert self.queue.claim('worker-1') is None
+
+    def test_retries(self):
+        job_id = self.queue.submit('vht.tar', max_attempts=2)
+
+        self.queue.claim('worker-1')
+        assert self.queue.finish(job_id, {'Status': 'Failed', 'Error': 'SystemExit(-1)'}) == 'queued'
+        self.queue.claim('worker-1')
+        assert self.queue.finish(job_id, {'Status': 'Failed', 'Error': 'SystemExit(-1)'}) == 'failed'
+        job = self.queue.get(job_id)
+        assert job['attempts'] == 2 and job['error'] == 'SystemExit(-1)'
+        assert job['result'] == {'Status': 'Failed', 'Error': 'SystemExit(-1)'}
+
+        job_id = self.queue.submit('vht.tar')
+        self.queue.claim('worker-1')
+        assert self.queue.finish(job_id, {'Status': 'Success', 'Error': ''}) == 'success'
+        assert self.queue.get(job_id)['error'] is None
+
+    def test_requeue_stale(self):
+        job_id = self.queue.submit('vht.tar')
+        alive_id = self.queue.submit('alive.tar')
+        with patch('vht.jobqueue.time.time', return_value=1000):
+            self.queue.claim('crashed')
+            self.queue.claim('alive')
+        # a long running job of a live scheduler keeps its heartbeat up to date
+        self.queue.heartbeat([alive_id])
+        assert self.queue.requeue_stale(3600) == 1
+        job = self.queue.get(job_id)
+        assert job['status'] == 'queued' and job['attempts'] == 0
+        assert self.queue.get(alive_id)['status'] == 'running'
+
+    def test_concurrent_claims(self):
+        job_ids = [self.queue.submit(f"{n}.tar") for n in range(40)]
+        claimed = []
+
+        def worker(name):
+            while True:
+                job = self.queue.claim(name)
+                if job is None:
+                    return
+                claimed.append(job['id'])
+
+        threads = [threading.Thread(target=worker, args=(f"worker-{n}",)) for n in range(4)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        # every job is claimed exactly once
+        assert sorted(claimed) == job_ids
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,155 @@
+import os
+import shutil
+import tempfile
+import unittest
+
+from vht import vht
+
+
+class TestVhtLocal(unittest.TestCase):
+    """
+        Local Backend Test Cases (offline, commands run through subprocess)
+    """
+    ENVS = ('gh_workspace', 'local_storage_dir', 'local_work_dir', 'local_process_vht', 'local_keep_work_dir',
+            'local_instance_id')
+
+    def setUp(self):
+        self.tmp = tempfile.mkdtemp()
+        self.workspace = os.path.join(self.tmp, 'workspace')
+        os.makedirs(self.workspace)
+        os.environ['gh_workspace'] = self.workspace
+        os.environ['local_storage_dir'] = os.path.join(self.tmp, 'storage')
+        os.environ['local_work_dir'] = os.path.join(self.tmp, 'runs')
+        os.environ['local_process_vht'] = 'tar -xf vht.tar && echo processed >> result.txt && tar -cf out.tar result.txt'
+
+    def tearDown(self):
+        for env_ in self.ENVS:
+            os.environ.pop(env_, None)
+        shutil.rmtree(self.tmp)
+
+    def get_vht_local_instance(self):
+        return vht.VHTClient("local").backend
+
+    def test_storage(self):
+        local_client = self.get_vht_local_instance()
+        filename = os.path.join(self.workspace, 'vht.tar')
+        with open(filename, 'w') as f:
+            f.write('input')
+
+        local_client.upload_file_to_cloud(filename, 'inputs/abc/vht.tar')
+        assert os.path.isfile(os.path.join(self.tmp, 'storage', 'inputs', 'abc', 'vht.tar'))
+
+        local_client.download_file_from_cloud(os.path.join(self.tmp, 'copy.tar'), 'inputs/abc/vht.tar')
+        with open(os.path.join(self.tmp, 'copy.tar')) as f:
+            assert f.read() == 'input'
+
+        local_client.delete_file_from_cloud('inputs/abc/vht.tar')
+        assert not os.path.exists(os.path.join(self.tmp, 'storage', 'inputs', 'abc', 'vht.tar'))
+
+        with self.assertRaises(ValueError):
+            local_client.get_storage_path('../outside')
+
+    def test_send_remote_command(self):
+        local_client = self.get_vht_local_instance()
+        local_client.create_instance()
+        work_dir = local_client.get_work_dir()
+        assert local_client.get_instance_state() == 'running'
+
+        response = local_client.send_remote_command_batch(['echo a > a.txt', 'cat a.txt'], work_dir)
+        assert [r['CommandIdStatus'] for r in response] == ['Success', 'Success']
+        assert response[1]['StdOut'] == 'a\n'
+
+        response = local_client.send_remote_command('ls missing', work_dir, fail_if_unsuccess=False)
+        assert response['CommandIdStatus'] == 'Failed'
+        assert response['StdErr'] != ''
+
+        # failed command: the work directory is torn down
+        with self.assertRaises(SystemExit):
+            local_client.send_remote_command('exit 3', work_dir)
+        assert local_client.get_instance_state() == 'terminated'
+
+    def test_run(self):
+        source = os.path.join(self.tmp, 'source')
+        os.makedirs(source)
+        with open(os.path.join(source, 'image.axf'), 'w') as f:
+            f.write('firmware')
+        shutil.make_archive(os.path.join(self.workspace, 'vht'), 'tar', source)
+
+        local_client = self.get_vht_local_instance()
+        local_client.run()
+
+        # the output archive is copied back and the work directory is removed
+        shutil.unpack_archive(os.path.join(self.workspace, 'out.tar'), os.path.join(self.tmp, 'out'))
+        with open(os.path.join(self.tmp, 'out', 'result.txt')) as f:
+            assert f.read() == 'processed\n'
+        assert os.listdir(os.path.join(self.tmp, 'runs')) == []
+
+        # work directory kept on request
+        os.environ['local_keep_work_dir'] = 'true'
+        local_client = self.get_vht_local_instance()
+        local_client.run()
+        assert os.listdir(os.path.join(self.tmp, 'runs')) == [local_client.instance_id]
+
+    def test_run_failed(self):
+        with open(os.path.join(self.workspace, 'vht.tar'), 'w') as f:
+            f.write('input')
+
+        # no out.tar written: the work directory is removed anyway
+        os.environ['local_process_vht'] = 'true'
+        local_client = self.get_vht_local_instance()
+        with self.assertRaises(FileNotFoundError):
+            local_client.run()
+        assert os.listdir(os.path.join(self.tmp, 'runs')) == []
+
+        # failed command: torn down once, a work directory the backend did not create is kept
+        os.environ['local_process_vht'] = 'exit 3'
+        os.environ['local_instance_id'] = 'mine'
+        os.makedirs(os.path.join(self.tmp, 'runs', 'mine'))
+        local_client = self.get_vht_local_instance()
+        with self.assertRaises(SystemExit):
+            local_client.run()
+        assert os.listdir(os.path.join(self.tmp, 'runs')) == ['mine']
+
+    def test_run_jobs(self):
+        for name in ('a', 'b'):
+            with open(os.path.join(self.workspace, f"{name}.txt"), 'w') as f:
+                f.write(name)
+            shutil.make_archive(os.path.join(self.workspace, name), 'tar', self.workspace, f"{name}.txt")
+        with open(os.path.join(self.workspace, 'broken.tar'), 'w') as f:
+            f.write('not a tar')
+
+        vht_client = vht.VHTClient("local")
+        vht_in_list = [os.path.join(self.workspace, f"{name}.tar") for name in ('a', 'broken', 'b')]
+        results = vht_client.run_jobs(vht_in_list)
+
+        # the jobs run one after the other in their own work directories, a failed job does not stop the others
+        assert [result['Status'] for result in results] == ['Success', 'Failed', 'Success']
+        assert len({result['InstanceId'] for result in results}) == 3
+        assert results[0]['Output'] == os.path.join(self.workspace, 'a.out.tar')
+        assert os.path.isfile(os.path.join(self.workspace, 'b.out.tar'))
+        assert not os.path.exists(os.path.join(self.workspace, 'out.tar'))
+        assert os.listdir(os.path.join(self.tmp, 'runs')) == []
+
+    def test_unsupported(self):
+        vht_client = vht.VHTClient("local")
+        vht_client.invalidate_image_id_cache()
+
+        # no warm pool, fleet or job queue: a clear error instead of an AttributeError
+        for call in (lambda: vht_client.run_queue(),
+                     lambda: vht_client.submit_jobs(['vht.tar']),
+                     lambda: vht_client.list_jobs(),
+                     lambda: vht_client.shrink_pool(),
+                     lambda: vht_client.start_fleet(['local-1'])):
+            with self.assertLogs(level='ERROR') as logs, self.assertRaises(SystemExit):
+                call()
+            assert 'not supported by the local backend' in logs.output[0]
+
+    def test_instance_id(self):
+        for instance_id in ('..', '.', 'a/b', '../runs2'):
+            os.environ['local_instance_id'] = instance_id
+            with self.assertRaises(ValueError):
+                self.get_vht_local_instance().get_work_dir()
+
+
+if __name__ == '__main__':
+    unittest.main()
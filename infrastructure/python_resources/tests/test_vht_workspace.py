@@ -0,0 +1,84 @@
+import json
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+import unittest
+
+from vht import workspace
+
+
+class TestVhtWorkspace(unittest.TestCase):
+    """
+        Workspace Sync Test Cases
+    """
+    def setUp(self):
+        self.tmp = tempfile.mkdtemp()
+        self.local = os.path.join(self.tmp, 'local')
+        self.cache = os.path.join(self.tmp, 'cache')
+        os.makedirs(os.path.join(self.local, 'src'))
+        os.makedirs(os.path.join(self.local, '.git'))
+        os.makedirs(os.path.join(self.cache, 'objects'))
+        os.makedirs(os.path.join(self.cache, 'tree'))
+        with open(os.path.join(self.cache, 'vht_sync.py'), 'w') as f:
+            f.write(workspace.REMOTE_SYNC_SCRIPT)
+
+    def tearDown(self):
+        shutil.rmtree(self.tmp)
+
+    def write(self, relpath, content):
+        with open(os.path.join(self.local, relpath), 'w') as f:
+            f.write(content)
+
+    def sync(self, remote_manifest):
+        """
+            Local side (sync_workspace) and instance side (get_input_commands) without S3
+        """
+        manifest = workspace.get_manifest(self.local)
+        missing = workspace.get_missing_objects(manifest, remote_manifest)
+        with open(os.path.join(self.cache, 'manifest.new.json'), 'w') as f:
+            json.dump(manifest, f)
+
+        plan = subprocess.run([sys.executable, 'vht_sync.py', 'plan'], cwd=self.cache,
+                              capture_output=True, text=True, check=True).stdout.split()
+        for sha256 in plan:
+            relpath = next(p for p, f in manifest['files'].items() if f['sha256'] == sha256)
+            shutil.copyfile(os.path.join(self.local, relpath), os.path.join(self.cache, 'objects', sha256))
+        subprocess.run([sys.executable, 'vht_sync.py', 'apply'], cwd=self.cache, check=True, capture_output=True)
+        return manifest, missing, plan
+
+    def read_tree(self):
+        files = {}
+        tree = os.path.join(self.cache, 'tree')
+        for root, _, filenames in os.walk(tree):
+            for filename in filenames:
+                with open(os.path.join(root, filename)) as f:
+                    files[os.path.relpath(os.path.join(root, filename), tree).replace(os.sep, '/')] = f.read()
+        return files
+
+    def test_sync(self):
+        self.write('main.c', 'int main(void) {}')
+        self.write('src/a.c', 'a')
+        self.write('src/copy_of_a.c', 'a')
+        self.write('.git/HEAD', 'ref')
+
+        # first sync: everything is new, identical content is one object
+        manifest, missing, plan = self.sync({})
+        assert sorted(manifest['files']) == ['main.c', 'src/a.c', 'src/copy_of_a.c']
+        assert len(missing) == 2 and len(plan) == 2
+        assert self.read_tree() == {'main.c': 'int main(void) {}', 'src/a.c': 'a', 'src/copy_of_a.c': 'a'}
+
+        # second sync: one changed, one deleted, one added with known content
+        self.write('main.c', 'int main(void) { return 0; }')
+        os.remove(os.path.join(self.local, 'src', 'copy_of_a.c'))
+        self.write('src/b.c', 'a')
+        manifest, missing, plan = self.sync(manifest)
+        assert list(missing.values()) == ['main.c'], f"Found {missing}"
+        assert len(plan) == 2, f"Found {plan}"
+        assert self.read_tree() == {'main.c': 'int main(void) { return 0; }', 'src/a.c': 'a', 'src/b.c': 'a'}
+        assert os.listdir(os.path.join(self.cache, 'objects')) == []
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -1,10 +1,250 @@
+import base64
+import contextlib
+import copy
+import hashlib
+import json
 import logging
 import os
+import re
+import shutil
+import socket
 import sys
 import time
+import urllib.request
+import uuid
+import threading
 import boto3
+from vht import compression
+from vht import jobqueue
+from vht import workspace
+from boto3.s3.transfer import TransferConfig
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, as_completed, wait
+from botocore.config import Config
 from botocore.exceptions import ClientError
-from botocore.exceptions import WaiterError
+
+# Provisioning version, increment to run the cached provisioning steps again on all instances
+PROVISION_VERSION = 1
+
+PROCESS_VHT_URL = 'https://raw.githubusercontent.com/ARM-software/VHT-AMI/master/agent/process_vht.py'
+PACK_INDEX_URL = 'https://www.keil.com/pack/index.pidx'
+
+# Max number of instance IDs per EC2 fleet API call
+FLEET_BATCH_SIZE = 100
+
+# run_instances errors of a spot request that are retried on-demand
+SPOT_CAPACITY_ERRORS = (
+    'InsufficientInstanceCapacity',
+    'InsufficientCapacity',
+    'SpotMaxPriceTooLow',
+    'MaxSpotInstanceCountExceeded',
+    'UnfulfillableCapacity'
+)
+
+
+class TransferProgress():
+    """
+    Progress and throughput report of an S3 transfer (boto3 transfer Callback).
+
+    The callback is called from the transfer threads, so the byte count is locked.
+    A progress line is logged at most every `interval` seconds and a summary line
+    with the average throughput when the transfer is finished (see `done`).
+    """
+    def __init__(self, description, total_size=None, interval=5):
+        self.description = description
+        self.total_size = total_size
+        self.interval = interval
+        self.transferred = 0
+        self.start = time.monotonic()
+        self.last_report = self.start
+        self.lock = threading.Lock()
+
+    def __call__(self, bytes_amount):
+        with self.lock:
+            self.transferred += bytes_amount
+            now = time.monotonic()
+            if now - self.last_report < self.interval:
+                return
+            self.last_report = now
+            logging.info(f"aws:{self.description}: {self.get_report(now)}")
+
+    def get_throughput(self, now=None):
+        elapsed = (now or time.monotonic()) - self.start
+        return self.transferred / elapsed if elapsed > 0 else 0.0
+
+    def get_report(self, now=None):
+        report = f"{self.transferred / 1e6:.1f} MB"
+        if self.total_size:
+            report = f"{100 * self.transferred / self.total_size:.0f}% ({report} of {self.total_size / 1e6:.1f} MB)"
+        return f"{report}, {self.get_throughput(now) / 1e6:.1f} MB/s"
+
+    def done(self):
+        logging.info(f"aws:{self.description} done: {self.get_report()} in {time.monotonic() - self.start:.1f} s")
+
+
+# Run report and phase of the current thread (see RunReport.phase)
+_report_context = threading.local()
+
+
+def count_api_call(event_name, **kwargs):
+    """
+        botocore `before-call` handler: count the call in the run report phase of this thread.
+    """
+    report = getattr(_report_context, 'report', None)
+    if report is not None:
+        report.add_api_call(event_name.split('.', 1)[1], getattr(_report_context, 'phase', None))
+
+
+class RunReport():
+    """
+    Timings and API-call counts of a run: phases, remote commands and AWS API calls.
+
+    Phases can run concurrently (see run_task_graph), each one in its own thread.
+    API calls are counted in the phase of the thread that makes them; calls of the
+    S3 transfer threads are not counted (see the phase duration of the transfer).
+    """
+    def __init__(self):
+        self.start = time.monotonic()
+        self.lock = threading.Lock()
+        self.phases = []
+        self.commands = []
+        self.api_calls = {}
+
+    @contextlib.contextmanager
+    def phase(self, name):
+        entry = {'Name': name, 'Start': round(time.monotonic() - self.start, 3), 'Duration': None,
+                 'Status': 'Running', 'ApiCalls': {}}
+        with self.lock:
+            self.phases.append(entry)
+        previous = (getattr(_report_context, 'report', None), getattr(_report_context, 'phase', None))
+        _report_context.report, _report_context.phase = self, entry
+        start = time.monotonic()
+        try:
+            yield entry
+            entry['Status'] = 'Success'
+        except BaseException:
+            entry['Status'] = 'Failed'
+            raise
+        finally:
+            entry['Duration'] = round(time.monotonic() - start, 3)
+            _report_context.report, _report_context.phase = previous
+
+    def timed(self, name, fn):
+        """
+            Get a callable that runs fn as phase `name` (for run_task_graph).
+        """
+        def run_phase():
+            with self.phase(name):
+                return fn()
+        return run_phase
+
+    def add_api_call(self, operation, phase=None):
+        with self.lock:
+            self.api_calls[operation] = self.api_calls.get(operation, 0) + 1
+            if phase is not None:
+                phase['ApiCalls'][operation] = phase['ApiCalls'].get(operation, 0) + 1
+
+    def add_command(self, command_id, command_list, status, duration):
+        with self.lock:
+            self.commands.append({
+                'CommandId': command_id,
+                'Command': command_list if len(command_list) <= 200 else command_list[:197] + '...',
+                'Status': status,
+                'Start': round(time.monotonic() - duration - self.start, 3),
+                'Duration': round(duration, 3)
+            })
+
+    def get_report(self, **info):
+        """
+        Get the JSON report.
+
+        Parameters
+        ----------
+        **info: Additional report fields (e.g. InstanceId)
+
+        Return
+        ----------
+        Dict
+            'Duration' (wall clock, seconds), 'InstanceSeconds' (from the start of the
+            instance phase to the end of the teardown phase), 'Phases', 'Commands',
+            'ApiCalls' ({<service>.<operation>: count}), 'ApiCallCount'
+        """
+        with self.lock:
+            phases = {phase['Name']: phase for phase in self.phases}
+            instance_seconds = None
+            if 'instance' in phases and phases.get('teardown', {}).get('Duration') is not None:
+                teardown = phases['teardown']
+                instance_seconds = round(teardown['Start'] + teardown['Duration'] - phases['instance']['Start'], 3)
+            return dict(info, **{
+                'Duration': round(time.monotonic() - self.start, 3),
+                'InstanceSeconds': instance_seconds,
+                'Phases': [dict(phase, ApiCalls=dict(phase['ApiCalls'])) for phase in self.phases],
+                'Commands': list(self.commands),
+                'ApiCalls': dict(sorted(self.api_calls.items())),
+                'ApiCallCount': sum(self.api_calls.values())
+            })
+
+    def get_summary(self):
+        """
+            One line summary: total time, time per phase, API calls and commands.
+        """
+        report = self.get_report()
+        phases = ', '.join(f"{phase['Name']} {phase['Duration'] or 0:.1f} s"
+                           f"{'' if phase['Status'] == 'Success' else ' (' + phase['Status'] + ')'}"
+                           for phase in report['Phases'])
+        return (f"{report['Duration']:.1f} s total | {phases} | {report['ApiCallCount']} API calls | "
+                f"{len(report['Commands'])} remote commands")
+
+
+def run_task_graph(tasks):
+    """
+    Run tasks concurrently, each one as soon as its dependencies are done.
+
+    Parameters
+    ----------
+    Dict
+        tasks ({<name>: (<callable without arguments>, [<names of the tasks it depends on>])})
+
+    Return
+    ----------
+    Dict
+        {<name>: <return value of the task>}
+
+    The first failure is raised after the running tasks are finished (so e.g. a booting
+    instance is known for teardown). Tasks depending on a failed task are not started.
+    """
+    for name, (_, dependencies) in tasks.items():
+        unknown = set(dependencies) - set(tasks)
+        if unknown:
+            raise ValueError(f"Task {name} depends on unknown tasks {sorted(unknown)}")
+
+    results = {}
+    pending = dict(tasks)
+    running = {}
+    error = None
+    with ThreadPoolExecutor(max_workers=len(tasks) or 1) as executor:
+        while pending or running:
+            if error is None:
+                for name in [n for n, (_, deps) in pending.items() if all(d in results for d in deps)]:
+                    logging.debug(f"aws:Task {name} started")
+                    running[executor.submit(pending.pop(name)[0])] = (name, time.monotonic())
+            if not running:
+                break
+            done, _ = wait(running, return_when=FIRST_COMPLETED)
+            for future in done:
+                name, start = running.pop(future)
+                try:
+                    results[name] = future.result()
+                    logging.info(f"aws:Task {name} done in {time.monotonic() - start:.1f} s")
+                except BaseException as e:
+                    logging.error(f"aws:Task {name} failed: {e!r}")
+                    error = error or e
+
+    if error is not None:
+        raise error
+    if pending:
+        raise ValueError(f"Dependency cycle between tasks {sorted(pending)}")
+    return results
+
 
 class AWSClient():
     """
@@ -19,22 +259,43 @@ class AWSClient():
     The AWS credentials key is expected as envs. See _is_aws_credentials_present method.
     Some AWS-related info is expected as envs. See _setup.
     """
-    def __init__(self):
-        logging.info('aws:Creating EC2 client...')
-        self.ec2_client = boto3.client('ec2')
+    # boto3 clients/resources created on first use: attribute name -> (kind, service)
+    LAZY_CLIENTS = {
+        'ec2_client': ('client', 'ec2'),
+        'ssm_client': ('client', 'ssm'),
+        's3_client': ('client', 's3'),
+        's3_resource': ('resource', 's3'),
+    }
 
-        logging.info('aws:Creating SSM client...')
-        self.ssm_client = boto3.client('ssm')
-
-        logging.info('aws:Creating S3 client...')
-        self.s3_client = boto3.client('s3')
-
-        logging.info('aws:Creating S3 resource...')
-        self.s3_resource = boto3.resource('s3')
+    def __init__(self):
+        # one session for all clients; clients are created on first use (see __getattr__)
+        self.session = boto3.session.Session()
+        self._client_lock = threading.Lock()
 
         self._is_aws_credentials_present()
         self._setup()
 
+    def __getattr__(self, name):
+        """
+            Create a boto3 client/resource (LAZY_CLIENTS) on first use.
+            Session objects are not thread-safe, so clients are created under a lock.
+        """
+        if name not in AWSClient.LAZY_CLIENTS:
+            raise AttributeError(name)
+        with self.__dict__['_client_lock']:
+            if name not in self.__dict__:
+                kind, service = AWSClient.LAZY_CLIENTS[name]
+                logging.info(f"aws:Creating {service.upper()} {kind}...")
+                config = None
+                if service == 's3':
+                    # S3 connection pool sized for the transfer concurrency
+                    config = Config(max_pool_connections=self.s3_max_pool_connections)
+                client = getattr(self.session, kind)(service, config=config)
+                (client.meta.client if kind == 'resource' else client).meta.events.register_first(
+                    'before-call.*.*', count_api_call)
+                self.__dict__[name] = client
+        return self.__dict__[name]
+
     def __repr__(self):
         return (
             f"ami_id={self.ami_id},"
@@ -49,7 +310,8 @@ class AWSClient():
             f"subnet_id={self.subnet_id},"
             f"vht_in_filename={self.vht_in_filename},"
             f"vht_out_filename={self.vht_out_filename},"
-            f"terminate_ec2_instance={self.terminate_ec2_instance}"
+            f"terminate_ec2_instance={self.terminate_ec2_instance},"
+            f"instance_pool_size={self.instance_pool_size}"
         )
 
     def _is_aws_credentials_present(self):
@@ -84,6 +346,8 @@ class AWSClient():
         logging.info("aws:setting up aws backend")
         self.ami_id = None
         self.ami_version = None
+        # set if ami_id was served from the AMI cache: invalidate_image_id_cache resolves it again
+        self.ami_id_cached = False
         self.gh_workspace = None
         self.iam_profile = None
         self.instance_id = None
@@ -95,6 +359,13 @@ class AWSClient():
         self.terminate_ec2_instance = None
         self.vht_in_filename = 'vht.tar'
         self.vht_out_filename = 'out.tar'
+        self.vht_in_key = self.vht_in_filename
+        self.vht_out_key = self.vht_out_filename
+
+        # Optional: on-disk cache of AMI IDs resolved from ami_version (TTL in seconds, 0 = disabled)
+        self.ami_cache_file = os.environ.get('ami_cache_file') or \
+            os.path.join(os.path.expanduser('~'), '.cache', 'vht', 'ami_ids.json')
+        self.ami_cache_ttl = int(os.environ.get('ami_cache_ttl') or 86400)
 
         # instance_id
         self.instance_id = None if os.environ.get('instance_id') in (None, '') else os.environ.get('instance_id')
@@ -140,6 +411,95 @@ class AWSClient():
         # s3_keyprefix
         self.s3_keyprefix = 'ssm' if os.environ.get('s3_keyprefix') in (None, '') else os.environ.get('s3_keyprefix')
 
+        # Optional: warm instance pool (0 = disabled, one instance per run)
+        self.instance_pool_size = int(os.environ.get('instance_pool_size') or 0)
+        self.instance_pool_idle_timeout = int(os.environ.get('instance_pool_idle_timeout') or 3600)
+        self.instance_pool_lock_timeout = int(os.environ.get('instance_pool_lock_timeout') or 14400)
+        self.instance_lease = None
+        # set by teardown: a second teardown must not stop/terminate a released pool instance
+        self.instance_torn_down = False
+        # SSM commands still running after their wait timed out: cancelled before a pool release
+        self.pending_command_ids = []
+
+        # Optional: spot capacity (instance_market=spot) with on-demand fallback and interruption re-queue
+        self.instance_market = (os.environ.get('instance_market') or 'on-demand').lower()
+        self.spot_max_price = os.environ.get('spot_max_price') or None
+        self.spot_fallback = os.environ.get('spot_fallback', 'true').lower() != 'false'
+        self.spot_max_retries = int(os.environ.get('spot_max_retries') or 2)
+        self.instance_spot = False
+
+        # Optional: persistent job queue (see run_queue)
+        self.job_queue_file = os.environ.get('job_queue_file') or \
+            os.path.join(os.path.expanduser('~'), '.cache', 'vht', 'jobs.sqlite')
+        self.job_max_attempts = int(os.environ.get('job_max_attempts') or 3)
+        # seconds without heartbeat after which a running job is queued again
+        self.job_heartbeat_timeout = int(os.environ.get('job_heartbeat_timeout') or 600)
+
+        # Optional: result cache of run() ('off', 's3' or 'local'), force = run and refresh the cached result
+        self.result_cache = (os.environ.get('result_cache') or 'off').lower()
+        if self.result_cache not in ('off', 's3', 'local'):
+            logging.error(f"aws:Unknown result_cache `{self.result_cache}` (off, s3 or local)")
+            sys.exit(-1)
+        self.result_cache_dir = os.environ.get('result_cache_dir') or \
+            os.path.join(os.path.expanduser('~'), '.cache', 'vht', 'results')
+        self.result_cache_force = os.environ.get('result_cache_force', 'false').lower() == 'true'
+        self.s3_results_prefix = 'results'
+        self.file_hashes = {}
+        self.process_vht_version = None
+
+        # Optional: write the JSON run report of run() to this file (Default: only the summary is logged)
+        self.run_report_file = os.environ.get('run_report_file') or None
+        self.run_report = RunReport()
+
+        # Optional: S3 transfer tuning (multipart chunk size in MB, concurrent threads, HTTP connections)
+        self.s3_multipart_chunksize = int(os.environ.get('s3_multipart_chunksize') or 16)
+        self.s3_max_concurrency = int(os.environ.get('s3_max_concurrency') or 16)
+        self.s3_max_pool_connections = int(os.environ.get('s3_max_pool_connections') or self.s3_max_concurrency + 4)
+        self.s3_transfer_config = TransferConfig(
+            multipart_threshold=self.s3_multipart_chunksize * 1024 * 1024,
+            multipart_chunksize=self.s3_multipart_chunksize * 1024 * 1024,
+            max_concurrency=self.s3_max_concurrency
+        )
+
+        # Optional: streaming compression of vht.tar/out.tar in S3 ('none', 'gzip', 'xz' or 'zstd')
+        self.s3_compression = (os.environ.get('s3_compression') or 'none').lower()
+        if self.s3_compression != 'none' and self.s3_compression not in compression.COMPRESSIONS:
+            logging.error(f"aws:Unknown s3_compression `{self.s3_compression}` (none, gzip, xz or zstd)")
+            sys.exit(-1)
+        if self.s3_compression != 'none' and not compression.is_available(self.s3_compression):
+            logging.warning(f"aws:{self.s3_compression} is not available (pip install zstandard), using gzip")
+            self.s3_compression = 'gzip'
+        self.vht_in_key = f"{self.vht_in_filename}{self.get_compression_suffix()}"
+        self.vht_out_key = f"{self.vht_out_filename}{self.get_compression_suffix()}"
+
+        # Optional: store vht.tar under a content hash key and skip the upload if it exists (Default: true)
+        self.s3_content_addressed_input = os.environ.get('s3_content_addressed_input', 'true').lower() != 'false'
+
+        # Optional: incremental workspace sync instead of uploading vht.tar (directory to sync)
+        self.workspace_sync_dir = os.environ.get('workspace_sync_dir') or None
+        self.workspace_sync_name = os.environ.get('workspace_sync_name') or \
+            (os.path.basename(os.path.abspath(self.workspace_sync_dir)) if self.workspace_sync_dir else None)
+        self.s3_workspace_prefix = 'workspace'
+        # set by sync_workspace: content-addressed manifest key of this run (see get_workspace_manifest_key)
+        self.workspace_manifest_key = None
+
+        # Optional: skip provisioning steps already done on the instance (Default: true)
+        self.provision_cache = os.environ.get('provision_cache', 'true').lower() != 'false'
+        self.provision_marker_dir = '/var/lib/vht/provision'
+        self.pack_index_max_age = int(os.environ.get('pack_index_max_age') or 1440)
+
+        # Optional: SSM command polling interval, exponential backoff from min to max (in seconds)
+        self.ssm_poll_min_delay = float(os.environ.get('ssm_poll_min_delay') or 0.25)
+        self.ssm_poll_max_delay = float(os.environ.get('ssm_poll_max_delay') or 10)
+
+        # Optional: print remote command output while the command runs (Default: false)
+        self.ssm_stream_output = os.environ.get('ssm_stream_output', 'false').lower() == 'true'
+        self.ssm_stream_interval = float(os.environ.get('ssm_stream_interval') or 5)
+        self.ssm_stream_max_interval = float(os.environ.get('ssm_stream_max_interval') or 30)
+
+        # Optional: run() sends the VHT command sequence as one SSM invocation (Default: true)
+        self.ssm_single_invocation = os.environ.get('ssm_single_invocation', 'true').lower() != 'false'
+
         # check mandatory env vars
         envs = [
             'gh_workspace',
@@ -161,33 +521,47 @@ class AWSClient():
         """
             Create an EC2 Instance. It is a wrapper for create_ec2_instance.
             If key_name is present, it creates a instance with the selected private key.
+            The instance is tagged VHT_CLI (and with the pool lock if it is leased).
+
+            With instance_market=spot a one-time spot instance is requested (max price
+            spot_max_price, default: on-demand price). If no spot capacity is available
+            the instance is created on-demand unless spot_fallback is false.
+            Pool instances are always on-demand (spot instances cannot be stopped).
 
             This is a mandatory VHT backend method.
         """
-        if self.key_name is None or self.key_name == '':
-            self.instance_id = self.create_ec2_instance(
-                ImageId=self.ami_id,
-                InstanceType=self.instance_type,
-                MaxCount=1,
-                MinCount=1,
-                SecurityGroupIds=[self.security_group_id],
-                SubnetId=self.subnet_id,
-                TagSpecifications=[{'ResourceType': 'instance','Tags': [{'Key': 'VHT_CLI','Value': 'true',}]}],
-                IamInstanceProfile={'Name': self.iam_profile}
-            )
-        else:
-            self.instance_id = self.create_ec2_instance(
-                ImageId=self.ami_id,
-                InstanceType=self.instance_type,
-                MaxCount=1,
-                MinCount=1,
-                KeyName=self.key_name,
-                SecurityGroupIds=[self.security_group_id],
-                SubnetId=self.subnet_id,
-                TagSpecifications=[{'ResourceType': 'instance','Tags': [{'Key': 'VHT_CLI','Value': 'true',}]}],
-                IamInstanceProfile={'Name': self.iam_profile}
-            )
-
+        kwargs = {
+            'ImageId': self.ami_id,
+            'InstanceType': self.instance_type,
+            'MaxCount': 1,
+            'MinCount': 1,
+            'SecurityGroupIds': [self.security_group_id],
+            'SubnetId': self.subnet_id,
+            'TagSpecifications': [{'ResourceType': 'instance', 'Tags': self.get_instance_tags()}],
+            'IamInstanceProfile': {'Name': self.iam_profile}
+        }
+        if self.key_name not in (None, ''):
+            kwargs['KeyName'] = self.key_name
+
+        self.instance_spot = False
+        if self.instance_market == 'spot' and self.instance_lease is None:
+            spot_options = {'SpotInstanceType': 'one-time', 'InstanceInterruptionBehavior': 'terminate'}
+            if self.spot_max_price:
+                spot_options['MaxPrice'] = self.spot_max_price
+            try:
+                logging.info(f"aws:Requesting spot instance (max price: {self.spot_max_price or 'on-demand price'})...")
+                self.instance_id = self.create_ec2_instance(
+                    **kwargs,
+                    InstanceMarketOptions={'MarketType': 'spot', 'SpotOptions': spot_options}
+                )
+                self.instance_spot = True
+                return self.instance_id
+            except ClientError as e:
+                if e.response['Error']['Code'] not in SPOT_CAPACITY_ERRORS or not self.spot_fallback:
+                    raise
+                logging.warning(f"aws:No spot capacity ({e.response['Error']['Code']}), creating on-demand instance")
+
+        self.instance_id = self.create_ec2_instance(**kwargs)
         return self.instance_id
 
     def create_ec2_instance(self, **kwargs):
@@ -282,7 +656,10 @@ class AWSClient():
         logging.info("aws:Download S3 File")
         try:
             logging.info(f"Downloading S3 file from bucket `{self.s3_bucket_name}`, key `{key}`, filename `{filename}`")
-            self.s3_client.download_file(self.s3_bucket_name, key, filename)
+            progress = TransferProgress(f"Download {key}")
+            self.s3_client.download_file(self.s3_bucket_name, key, filename,
+                                         Config=self.s3_transfer_config, Callback=progress)
+            progress.done()
         except ClientError as e:
             if 'HeadObject operation: Not Found' in str(e):
                 print(f"Key '{key}' not found on S3 Bucket Name = '{self.s3_bucket_name}'")
@@ -290,11 +667,48 @@ class AWSClient():
                 print(f"The error {e} happens for Key={key} and S3_bucket_name={self.s3_bucket_name}")
             exit(-1)
 
+    def get_file_hash(self, filename):
+        """
+        Get the SHA-256 hash of a local file.
+        The hash is kept per (path, size, modification time), so a file is hashed once.
+
+        Return
+        ----------
+        String
+            Hex digest
+        """
+        stat = os.stat(filename)
+        cache_key = (os.path.abspath(filename), stat.st_size, stat.st_mtime_ns)
+        if cache_key not in self.file_hashes:
+            self.file_hashes[cache_key] = workspace.get_file_hash(filename)
+        return self.file_hashes[cache_key]
+
+    def get_content_addressed_key(self, filename, name):
+        """
+        Get the S3 key of a local file derived from its content: `inputs/<sha256>/<name>`.
+        Identical files (e.g. reruns or matrix jobs) share one S3 object.
+
+        Parameters
+        ----------
+        String
+            filename (Local Filename Path)
+            name (File name used in the key)
+
+        Return
+        ----------
+        String
+            S3 key
+        """
+        return f"inputs/{self.get_file_hash(filename)}/{name}"
+
     def get_image_id(self):
         """
         Get the VHT AMI ID for the region
         The VHT AMI ID changes for each AWS region
 
+        The result is cached on disk (ami_cache_file) per (region, ami_version)
+        for ami_cache_ttl seconds, see invalidate_image_id_cache.
+
         Return
         ----------
         String
@@ -309,6 +723,16 @@ class AWSClient():
         """
         assert self.ami_version is not None, \
             "The variable `ami_version` is not present"
+
+        cache_key = f"{self.session.region_name}/{self.ami_version}"
+        if self.ami_cache_ttl > 0:
+            entry = self._load_ami_cache().get(cache_key)
+            if entry is not None and time.time() - entry['time'] < self.ami_cache_ttl:
+                logging.info(f"aws:AMI ID {entry['ami_id']} for {cache_key} found in cache")
+                self.ami_id = entry['ami_id']
+                self.ami_id_cached = True
+                return self.ami_id
+
         response = self.ec2_client.describe_images(
             Filters=[
                 {
@@ -317,13 +741,69 @@ class AWSClient():
                         f"ArmVirtualHardware-{self.ami_version}*"
                     ]
                 },
+                {
+                    'Name': 'owner-alias',
+                    'Values': [
+                        'aws-marketplace'
+                    ]
+                },
             ]
         )
 
         logging.debug(f"aws:get_vht_ami_id_by_version:{response}")
         self.ami_id = response['Images'][0]['ImageId']
+        self.ami_id_cached = False
+
+        if self.ami_cache_ttl > 0:
+            cache = self._load_ami_cache()
+            cache[cache_key] = {'ami_id': self.ami_id, 'time': time.time()}
+            self._save_ami_cache(cache)
         return self.ami_id
 
+    def _load_ami_cache(self):
+        try:
+            with open(self.ami_cache_file, 'r') as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return {}
+
+    def _save_ami_cache(self, cache):
+        """
+            Write the AMI cache atomically (concurrent CLI invocations share the file).
+        """
+        try:
+            os.makedirs(os.path.dirname(self.ami_cache_file), exist_ok=True)
+            tmp_file = f"{self.ami_cache_file}.{uuid.uuid4().hex}.tmp"
+            with open(tmp_file, 'w') as f:
+                json.dump(cache, f, indent=2)
+            os.replace(tmp_file, self.ami_cache_file)
+        except OSError as e:
+            logging.warning(f"aws:Cannot write AMI cache {self.ami_cache_file}: {e}")
+
+    def invalidate_image_id_cache(self, ami_version=None):
+        """
+        Remove cached AMI IDs of the region.
+        If the AMI ID of this client was served from a removed entry, it is resolved again
+        (the client resolves ami_version when it is created, before the invalidation).
+
+        Parameters
+        ----------
+        String
+            ami_version (AMI version to remove - Default: None = all versions of the region)
+        """
+        region = self.session.region_name
+        cache = self._load_ami_cache()
+        keys = [key for key in cache
+                if key == f"{region}/{ami_version}" or (ami_version is None and key.startswith(f"{region}/"))]
+        for key in keys:
+            del cache[key]
+        logging.info(f"aws:Removed {keys} from AMI cache")
+        self._save_ami_cache(cache)
+
+        if self.ami_id_cached and f"{region}/{self.ami_version}" in keys:
+            logging.info(f"aws:Resolving the AMI ID of {self.ami_version} again")
+            self.get_image_id()
+
     def get_instance_id(self):
         """
         Return EC2 Instance ID.
@@ -331,6 +811,20 @@ class AWSClient():
         """
         return self.instance_id
 
+    def get_instance_tags(self):
+        """
+        Get the tags of instances created by this client.
+
+        Return
+        ----------
+        List
+            EC2 Tags (VHT_CLI and, for a leased pool instance, VHT_POOL_LOCK)
+        """
+        tags = [{'Key': 'VHT_CLI', 'Value': 'true'}]
+        if self.instance_lease is not None:
+            tags.append({'Key': 'VHT_POOL_LOCK', 'Value': self.instance_lease})
+        return tags
+
     def get_instance_state(self):
         """
         Get EC2 Instance State
@@ -517,188 +1011,1398 @@ class AWSClient():
         """
         return [
             "runuser -l ubuntu -c 'cat ~/.bashrc | grep export > vars'",
-            "rm -rf /home/ubuntu/vhtagent",
+            *self.get_provision_commands(),
             "rm -rf /home/ubuntu/vhtwork",
-            "runuser -l ubuntu -c 'mkdir vhtagent'",
             "runuser -l ubuntu -c 'mkdir vhtwork'",
-            "runuser -l ubuntu -c 'mkdir -p /home/ubuntu/packs/.Web'",
-            "runuser -l ubuntu -c 'cd /home/ubuntu/vhtagent && wget https://raw.githubusercontent.com/ARM-software/VHT-AMI/master/agent/process_vht.py'",
-            "runuser -l ubuntu -c 'wget -N https://www.keil.com/pack/index.pidx -O /home/ubuntu/packs/.Web/index.pidx'",
-            "apt update",
-            "apt install awscli -y",
-            f"runuser -l ubuntu -c 'aws s3 cp s3://{self.s3_bucket_name}/{self.vht_in_filename} /home/ubuntu/vhtwork/{self.vht_in_filename}'",
+            *self.get_input_commands(),
             "runuser -l ubuntu -c 'source vars && python3 /home/ubuntu/vhtagent/process_vht.py'",
-            f"runuser -l ubuntu -c 'aws s3 cp /home/ubuntu/vhtwork/{self.vht_out_filename} s3://{self.s3_bucket_name}/{self.vht_out_filename}'"
+            self.get_output_command()
         ]
 
-    def run(self, delete_output_file_from_cloud=True):
-        if self.instance_id in ('', None):
-            self.create_instance()
-        else:
-            logging.info(f"aws:EC2 Instance {self.instance_id} provided!")
-            self.start_instance()
-
-        self.upload_file_to_cloud(self.vht_in, self.vht_in_filename)
-        self.send_remote_command_batch(self.get_process_vht_commands(), working_dir='/home/ubuntu')
+    def get_output_command(self):
+        """
+            Command that uploads out.tar from the instance to vht_out_key (compressed on the fly with s3_compression).
+        """
+        path = f"/home/ubuntu/vhtwork/{self.vht_out_filename}"
+        url = f"s3://{self.s3_bucket_name}/{self.vht_out_key}"
+        if self.s3_compression == 'none':
+            return f"runuser -l ubuntu -c 'aws s3 cp {path} {url}'"
+        return (f"runuser -l ubuntu -c 'set -o pipefail; "
+                f"{compression.get_shell_command(self.s3_compression)} {path} | aws s3 cp --quiet - {url}'")
+
+    def get_provision_step(self, command):
+        """
+        Wrap a provisioning command so that it runs only once per instance.
 
-        logging.info("aws:Download S3 File to the GitHub Runner...")
-        self.download_file_from_cloud(
-            filename=self.vht_out,
-            key=self.vht_out_filename
-        )
+        A marker file named after PROVISION_VERSION and the hash of the command is
+        created in provision_marker_dir when the command succeeded; changing the
+        command or the version runs it again.
 
-        if delete_output_file_from_cloud:
-            logging.info("aws:Delete S3 Out.tar object from the S3 Bucket...")
-            self.delete_file_from_cloud(key=self.vht_out_filename)
+        Parameters
+        ----------
+        String
+            command (Provisioning command)
 
-        self.teardown()
+        Return
+        ----------
+        String
+            Guarded command
+        """
+        marker = f"{self.provision_marker_dir}/{PROVISION_VERSION}-{hashlib.sha256(command.encode()).hexdigest()[:16]}"
+        return f"[ -f {marker} ] || {{ {command} && mkdir -p {self.provision_marker_dir} && touch {marker}; }}"
 
-    def upload_file_to_cloud(self, filename, key):
+    def get_provision_commands(self):
         """
-        Upload a file to a S3 Bucket
+        Commands that prepare the instance: awscli, VHT agent and Keil pack index.
 
-        Parameters
-        ----------
-        String
-            filename (Local Filename Path)
-            Key (Filepath to be stored on S3 Bucket)
+        With provision_cache, apt runs once per instance (see get_provision_step), the
+        agent is fetched only if it changed (wget -N) and the pack index only if it is
+        older than pack_index_max_age minutes, so warm instances skip the setup.
 
-        More
+        Return
         ----------
-        API Definition
-            https://boto3.amazonaws.com/v1/documentation/api/latest/reference/services/s3.html#S3.Client.upload_file
+        List
+            Commands
         """
+        if not self.provision_cache:
+            return [
+                "rm -rf /home/ubuntu/vhtagent",
+                "runuser -l ubuntu -c 'mkdir vhtagent'",
+                "runuser -l ubuntu -c 'mkdir -p /home/ubuntu/packs/.Web'",
+                f"runuser -l ubuntu -c 'cd /home/ubuntu/vhtagent && wget {PROCESS_VHT_URL}'",
+                f"runuser -l ubuntu -c 'wget -N {PACK_INDEX_URL} -O /home/ubuntu/packs/.Web/index.pidx'",
+                "apt update",
+                "apt install awscli -y",
+                *(["apt install zstd -y"] if self.s3_compression == 'zstd' else [])
+            ]
 
-        logging.info(f"aws:Upload File {filename} to S3 Bucket {self.s3_bucket_name}, Key {key}")
-        self.s3_resource.meta.client.upload_file(filename, self.s3_bucket_name, key)
+        return [
+            self.get_provision_step("apt update && apt install awscli -y"),
+            *([self.get_provision_step("apt install zstd -y")] if self.s3_compression == 'zstd' else []),
+            "runuser -l ubuntu -c 'mkdir -p /home/ubuntu/vhtagent /home/ubuntu/packs/.Web'",
+            f"runuser -l ubuntu -c 'cd /home/ubuntu/vhtagent && wget -q -N {PROCESS_VHT_URL}'",
+            "runuser -l ubuntu -c 'cd /home/ubuntu/packs/.Web && "
+            f"{{ [ -n \"$(find index.pidx -mmin -{self.pack_index_max_age} 2>/dev/null)\" ] || wget -q -N {PACK_INDEX_URL}; }}'"
+        ]
 
-    def send_remote_command(self, command_list, working_dir, fail_if_unsuccess = True):
+    def get_input_commands(self):
         """
-        Send a remote command to an EC2 Instance.
+        Commands that place the input archive into /home/ubuntu/vhtwork on the instance.
 
-        Parameters
+        Without workspace sync the archive is copied from S3. With workspace sync the
+        cached working copy /home/ubuntu/vhtcache/tree is updated with the delta of the
+        last sync_workspace (changed objects are downloaded in parallel) and archived.
+
+        Return
         ----------
         List
-            command_list (List of commands)
-        String
-            working_dir (Directory where the remote command will be executed)
-        Boolean
-            fail_if_unsuccess (Fail the method in case the command failed)
+            Commands
+        """
+        if not self.workspace_sync_dir and self.s3_compression != 'none':
+            return [
+                f"runuser -l ubuntu -c 'set -o pipefail; aws s3 cp --quiet s3://{self.s3_bucket_name}/{self.vht_in_key} - | "
+                f"{compression.get_shell_command(self.s3_compression, decompress=True)} > /home/ubuntu/vhtwork/{self.vht_in_filename}'"
+            ]
+        if not self.workspace_sync_dir:
+            return [
+                f"runuser -l ubuntu -c 'aws s3 cp s3://{self.s3_bucket_name}/{self.vht_in_key} /home/ubuntu/vhtwork/{self.vht_in_filename}'"
+            ]
 
-        Return
-        ------
-            JSON data from send_ssm_shell_command method.
+        cache = '/home/ubuntu/vhtcache'
+        objects = f"s3://{self.s3_bucket_name}/{self.s3_workspace_prefix}/objects"
+        manifest_key = self.workspace_manifest_key or \
+            self.get_workspace_manifest_key(workspace.get_manifest(self.workspace_sync_dir))
+        manifest = f"s3://{self.s3_bucket_name}/{manifest_key}"
+        script = base64.b64encode(workspace.REMOTE_SYNC_SCRIPT.encode()).decode()
+        return [
+            f"runuser -l ubuntu -c 'mkdir -p {cache}/objects {cache}/tree'",
+            f"echo {script} | base64 -d > {cache}/vht_sync.py",
+            f"runuser -l ubuntu -c 'aws s3 cp --quiet {manifest} {cache}/manifest.new.json'",
+            f"runuser -l ubuntu -c 'cd {cache} && python3 vht_sync.py plan | xargs -r -P {self.s3_max_concurrency} -I{{}} aws s3 cp --quiet {objects}/{{}} objects/{{}}'",
+            f"runuser -l ubuntu -c 'cd {cache} && python3 vht_sync.py apply'",
+            f"runuser -l ubuntu -c 'tar -cf /home/ubuntu/vhtwork/{self.vht_in_filename} -C {cache}/tree .'"
+        ]
 
-        This is a mandatory VHT backend method.
+    def get_workspace_manifest_key(self, manifest=None):
         """
-        logging.info(f"vht: command_list = {command_list}")
-        response = self.send_ssm_shell_command(
-            command_list=command_list,
-            working_dir=working_dir
-        )
+        Get the S3 key of a workspace manifest.
 
-        for i in response.keys():
-            logging.info(f"vht:{i} = {response[i].strip()}")
-        if response['CommandIdStatus'] != 'Success' and fail_if_unsuccess:
-            logging.error(f"Command {command_list} failed")
-            logging.error("Tearing down the EC2 instance!")
-            self.teardown()
-            sys.exit(-1)
+        Parameters
+        ----------
+        Dict
+            manifest (Manifest, see workspace.get_manifest - Default: None)
 
-        return response
+        Return
+        ----------
+        String
+            `workspace/<workspace_sync_name>/manifest.json` (manifest of the last sync, the
+            base of the next delta) or `workspace/<workspace_sync_name>/manifests/<sha256>.json`
+            (content-addressed key of the given manifest, read by the instance: concurrent
+            runs of the same workspace never overwrite it)
+        """
+        if manifest is None:
+            return f"{self.s3_workspace_prefix}/{self.workspace_sync_name}/manifest.json"
+        manifest_hash = hashlib.sha256(json.dumps(manifest, sort_keys=True).encode()).hexdigest()
+        return f"{self.s3_workspace_prefix}/{self.workspace_sync_name}/manifests/{manifest_hash}.json"
 
-    def send_remote_command_batch(self, command_list, working_dir, fail_if_unsuccess = True):
+    def sync_workspace(self, local_dir=None):
         """
-        Send batch of remote commands to an EC2 Instance.
+        Upload the changes of a local workspace since the last sync.
+
+        The files are stored by content hash under `workspace/objects/<sha256>`.
+        Objects that are not referenced by the manifest of the last sync are
+        uploaded in parallel, then the new manifest is stored under its content hash
+        (workspace_manifest_key, used by the instance commands) and replaces the old one.
+        The instance applies the same delta to its cached working copy
+        (see get_input_commands), so the transfer scales with the change.
 
         Parameters
         ----------
-        List
-            command_list (List of List of commands)
         String
-            working_dir (Directory where the remote command will be executed)
-        Boolean
-            fail_if_unsuccess (Fail the method in case the command failed - Default: True)
+            local_dir (Workspace directory - Default: workspace_sync_dir)
 
         Return
-        ------
-            JSON data from send_ssm_shell_command method.
-
-        This is a mandatory VHT backend method.
+        ----------
+        Dict
+            'Files', 'Uploaded' (number of objects), 'UploadedBytes'
         """
-        logging.info(f"vht: command_list = {command_list}")
-        all_responses = []
+        local_dir = local_dir or self.workspace_sync_dir
+        manifest = workspace.get_manifest(local_dir)
+        manifest_key = self.get_workspace_manifest_key()
+
+        remote_manifest = self.get_s3_file_content(manifest_key)
+        remote_manifest = json.loads(remote_manifest) if remote_manifest else {}
+        missing = workspace.get_missing_objects(manifest, remote_manifest)
+        logging.info(f"aws:Workspace {local_dir}: {len(manifest['files'])} files, {len(missing)} objects to upload")
+
+        def upload(sha256, relpath):
+            self.s3_client.upload_file(
+                os.path.join(local_dir, relpath),
+                self.s3_bucket_name,
+                f"{self.s3_workspace_prefix}/objects/{sha256}",
+                Config=self.s3_transfer_config
+            )
 
-        for command in command_list:
-            all_responses.append(
-                self.send_remote_command(
-                    command_list=command,
-                    working_dir=working_dir,
-                    fail_if_unsuccess=fail_if_unsuccess
-                )
+        progress = TransferProgress(f"Sync {self.workspace_sync_name}",
+                                    sum(manifest['files'][relpath]['size'] for relpath in missing.values()))
+        with ThreadPoolExecutor(max_workers=self.s3_max_concurrency) as executor:
+            futures = {executor.submit(upload, sha256, relpath): relpath for sha256, relpath in missing.items()}
+            for future in as_completed(futures):
+                future.result()
+                progress(manifest['files'][futures[future]]['size'])
+        progress.done()
+
+        self.workspace_manifest_key = self.get_workspace_manifest_key(manifest)
+        for key in (self.workspace_manifest_key, manifest_key):
+            self.s3_client.put_object(
+                Bucket=self.s3_bucket_name,
+                Key=key,
+                Body=json.dumps(manifest).encode()
             )
-        logging.debug(f"vht: all_responses = {all_responses}")
-        return all_responses
+        return {'Files': len(manifest['files']), 'Uploaded': len(missing), 'UploadedBytes': progress.transferred}
 
-    def send_ssm_shell_command(self,
-                               command_list,
-                               working_dir='/',
-                               return_type='all',
-                               timeout_seconds=600):
+    def get_pool_instances(self):
         """
-        Send SSM Shell Commands to a EC2 Instance
+        Get the instances of the warm pool.
+        Pool instances are tagged VHT_CLI and use the same AMI ID and instance type.
 
-        Parameters
+        Return
         ----------
-        String
-            command_list (List of commands to be executed on the instance_id)
-            working_dir (Working directory - Default: '/')
-            return_type (
-                Method return types:
-                    `all`: Return as a dict: 'CommandId', 'CommandIdStatus', 'CommandList', 'StdOut', 'StdErr' - Default
-                    `command_id`: Return only the `command_id` as a String
-            )
-            timeout_seconds (Command Timeout in Seconds - Default: 600)
+        List
+            EC2 Instances (describe_instances format), not terminated
+
+        More
+        ----------
+        API Definition
+            https://boto3.amazonaws.com/v1/documentation/api/latest/reference/services/ec2.html#EC2.Client.describe_instances
+        """
+        kwargs = {
+            'Filters': [
+                {'Name': 'tag:VHT_CLI', 'Values': ['true']},
+                {'Name': 'instance-state-name', 'Values': ['pending', 'running', 'stopping', 'stopped']},
+                {'Name': 'image-id', 'Values': [self.ami_id]},
+                {'Name': 'instance-type', 'Values': [self.instance_type]}
+            ]
+        }
+        instances = []
+        while True:
+            response = self.ec2_client.describe_instances(**kwargs)
+            logging.debug(f"aws:get_pool_instances:{response}")
+            for reservation in response['Reservations']:
+                instances.extend(reservation['Instances'])
+            if not response.get('NextToken'):
+                break
+            kwargs['NextToken'] = response['NextToken']
+        return instances
+
+    def _get_tag(self, instance, key):
+        for tag in instance.get('Tags', []):
+            if tag['Key'] == key:
+                return tag['Value']
+        return None
+
+    def _is_pool_instance_locked(self, instance, now):
+        """
+            A pool instance is locked while it carries a VHT_POOL_LOCK tag (`<token>@<epoch>`)
+            younger than instance_pool_lock_timeout. Older locks are left by crashed jobs.
+        """
+        lock = self._get_tag(instance, 'VHT_POOL_LOCK')
+        if lock is None:
+            return False
+        try:
+            locked_at = int(lock.rsplit('@', 1)[1])
+        except (IndexError, ValueError):
+            return True
+        return now - locked_at < self.instance_pool_lock_timeout
+
+    def _lock_pool_instances(self, instance_ids, lock):
+        """
+            Lock free pool instances with a VHT_POOL_LOCK tag: the instances are described
+            again right before tagging (instances locked meanwhile are skipped) and the
+            lock is read back after a short delay, as tags are last-writer-wins.
+            Return the IDs of the instances that carry the lock.
+        """
+        def describe(ids):
+            response = self.ec2_client.describe_instances(InstanceIds=ids)
+            return [instance for reservation in response['Reservations'] for instance in reservation['Instances']]
+
+        now = int(time.time())
+        free = [
+            instance['InstanceId'] for instance in describe(instance_ids)
+            if instance['State']['Name'] in ('running', 'stopped')
+            and not self._is_pool_instance_locked(instance, now)
+        ]
+        if not free:
+            return []
+        self.ec2_client.create_tags(
+            Resources=free,
+            Tags=[{'Key': 'VHT_POOL_LOCK', 'Value': lock}]
+        )
+        time.sleep(2)
+        return [instance['InstanceId'] for instance in describe(free)
+                if self._get_tag(instance, 'VHT_POOL_LOCK') == lock]
+
+    def lease_instance(self):
+        """
+        Lease an instance of the warm pool and make it the instance of this client.
+        Running (already booted) instances are preferred over stopped ones.
+        A new instance is created if no pool instance is free.
+
+        The lease is a VHT_POOL_LOCK tag (see _lock_pool_instances). The next
+        candidate is tried if another client locked the instance first.
 
         Return
         ----------
-        Dict
-            if return_type == `all` (Default):
-                'CommandId', 'CommandIdStatus', 'CommandList', 'StdOut', 'StdErr'
         String
-            if return_type == `command_id`:
-                command_id
+            Instance ID
 
         More
         ----------
-        TODO: Use **kwargs
-
         API Definition
-            https://boto3.amazonaws.com/v1/documentation/api/latest/reference/services/ssm.html#SSM.Client.send_command
-            https://docs.aws.amazon.com/systems-manager/latest/userguide/ssm-plugins.html#aws-runShellScript
+            https://boto3.amazonaws.com/v1/documentation/api/latest/reference/services/ec2.html#EC2.Client.create_tags
         """
+        now = int(time.time())
+        lock = f"{uuid.uuid4().hex}@{now}"
 
-        command_id = ''
-        command_id_status = ''
-        stdout_key = ''
-        stdout_str = ''
-        stderr_key = ''
-        stderr_str = ''
+        candidates = [
+            instance for instance in self.get_pool_instances()
+            if instance['State']['Name'] in ('running', 'stopped')
+            and not self._is_pool_instance_locked(instance, now)
+        ]
+        candidates.sort(key=lambda instance: (
+            instance['State']['Name'] != 'running',
+            -int(self._get_tag(instance, 'VHT_POOL_RELEASED') or 0)
+        ))
+
+        for instance in candidates:
+            instance_id = instance['InstanceId']
+            logging.info(f"aws:Leasing pool instance {instance_id} ({instance['State']['Name']})")
+            if not self._lock_pool_instances([instance_id], lock):
+                logging.info(f"aws:Pool instance {instance_id} was leased by another client")
+                continue
+
+            self.instance_id = instance_id
+            self.instance_lease = lock
+            if instance['State']['Name'] == 'stopped':
+                self.start_instance()
+            else:
+                self.wait_ec2_status_ok()
+            return self.instance_id
 
-        try:
+        logging.info("aws:No free pool instance, creating a new one")
+        self.instance_lease = lock
+        return self.create_instance()
+
+    def is_spot_interrupted(self):
+        """
+        Check if the spot instance was reclaimed by EC2 (interruption notice or
+        terminated/stopped by EC2 instead of by VHT). After a teardown only the
+        interruption notice counts: the instance was terminated by VHT.
+
+        Return
+        ----------
+        Boolean
+            True if the instance was interrupted
+
+        More
+        ----------
+        API Definition
+            https://boto3.amazonaws.com/v1/documentation/api/latest/reference/services/ec2.html#EC2.Client.describe_instances
+            https://docs.aws.amazon.com/AWSEC2/latest/UserGuide/spot-instance-termination-notices.html
+        """
+        try:
+            response = self.ec2_client.describe_instances(InstanceIds=[self.instance_id])
+            instance = response['Reservations'][0]['Instances'][0]
+        except (ClientError, IndexError, KeyError) as e:
+            logging.warning(f"aws:Cannot get state of {self.instance_id}: {e!r}")
+            return False
+
+        state_reason = instance.get('StateReason', {}).get('Code', '')
+        interrupted = instance.get('InstanceLifecycle') == 'spot' and (
+            state_reason == 'Server.SpotInstanceTermination' or
+            (not self.instance_torn_down and
+             instance['State']['Name'] in ('shutting-down', 'terminated', 'stopping', 'stopped'))
+        )
+        logging.info(f"aws:Spot instance {self.instance_id}: {instance['State']['Name']} {state_reason}"
+                     f"{' (interrupted)' if interrupted else ''}")
+        return interrupted
+
+    def release_instance(self):
+        """
+        Return the leased instance to the warm pool (the instance keeps running).
+        Only the own lock is removed: a lock of another client is kept.
+        """
+        assert self.instance_id not in ('', None), "instance_id should be provided!"
+
+        logging.info(f"aws:Releasing pool instance {self.instance_id}")
+        self.ec2_client.create_tags(
+            Resources=[self.instance_id],
+            Tags=[{'Key': 'VHT_POOL_RELEASED', 'Value': str(int(time.time()))}]
+        )
+        self.ec2_client.delete_tags(
+            Resources=[self.instance_id],
+            Tags=[{'Key': 'VHT_POOL_LOCK', 'Value': self.instance_lease}]
+        )
+        self.instance_lease = None
+        return self.instance_id
+
+    def cancel_pending_commands(self):
+        """
+        Cancel the SSM commands still running after their wait timed out
+        (see send_ssm_shell_command) and wait them to reach a terminal status.
+
+        Return
+        ----------
+        Boolean
+            True if no command is running anymore on the instance
+
+        More
+        ----------
+        API Definition
+            https://boto3.amazonaws.com/v1/documentation/api/latest/reference/services/ssm.html#SSM.Client.cancel_command
+        """
+        idle = True
+        for command_id in self.pending_command_ids:
+            logging.info(f"aws:Cancelling command id {command_id}")
+            try:
+                self.ssm_client.cancel_command(CommandId=command_id, InstanceIds=[self.instance_id])
+            except ClientError as e:
+                # e.g. the command finished meanwhile: the status below tells
+                logging.info(f"aws:Cancel of command id {command_id} failed: {e}")
+            status = self.wait_ssm_command_finished(command_id, max_delay=5, timeout=120)
+            if status not in ('Success', 'Cancelled', 'TimedOut', 'Failed'):
+                idle = False
+        self.pending_command_ids = []
+        return idle
+
+    def shrink_pool(self):
+        """
+        Shrink the warm pool:
+         * free instances beyond instance_pool_size are terminated (least recently released first)
+         * free running instances idle longer than instance_pool_idle_timeout are stopped
+
+        Leased instances are never touched: the instances are locked (see
+        _lock_pool_instances) before they are stopped or terminated, instances leased
+        meanwhile are skipped. The method does not wait for the state changes.
+
+        Return
+        ----------
+        Dict
+            'Terminated', 'Stopped': lists of Instance IDs
+        """
+        now = int(time.time())
+        free = [
+            instance for instance in self.get_pool_instances()
+            if instance['State']['Name'] in ('running', 'stopped')
+            and not self._is_pool_instance_locked(instance, now)
+        ]
+        free.sort(key=lambda instance: -int(self._get_tag(instance, 'VHT_POOL_RELEASED') or 0))
+
+        terminated = [instance['InstanceId'] for instance in free[self.instance_pool_size:]]
+        stopped = [
+            instance['InstanceId'] for instance in free[:self.instance_pool_size]
+            if instance['State']['Name'] == 'running'
+            and now - int(self._get_tag(instance, 'VHT_POOL_RELEASED') or 0) > self.instance_pool_idle_timeout
+        ]
+
+        lock = f"{uuid.uuid4().hex}@{now}"
+        if terminated:
+            terminated = self._lock_pool_instances(terminated, lock)
+        if terminated:
+            logging.info(f"aws:Terminating surplus pool instances {terminated}")
+            self.terminate_fleet(terminated, wait=False)
+        if stopped:
+            stopped = self._lock_pool_instances(stopped, lock)
+        if stopped:
+            logging.info(f"aws:Stopping idle pool instances {stopped}")
+            self.stop_fleet(stopped, wait=False)
+            self.ec2_client.delete_tags(
+                Resources=stopped,
+                Tags=[{'Key': 'VHT_POOL_LOCK', 'Value': lock}]
+            )
+
+        return {'Terminated': terminated, 'Stopped': stopped}
+
+    def run(self, delete_output_file_from_cloud=True):
+        """
+        Run the VHT command sequence on an instance and download the output archive.
+
+        The instance boot (create/start/lease and wait for status OK) and the input
+        upload are independent, so they run concurrently: the critical path is
+        max(boot, upload) instead of the sum. The commands are sent when both are done.
+
+        Each phase is timed (see RunReport); the report summary is logged and the
+        JSON report is written to run_report_file, also if the run fails. A failed or
+        interrupted run tears the instance down.
+
+        With result_cache, a previous output of the same input, AMI ID and command
+        sequence is returned without starting an instance (see get_result_cache_key).
+        """
+        self.run_report = report = RunReport()
+        try:
+            cache_key = None
+            if self.result_cache != 'off':
+                with report.phase('cache'):
+                    cache_key = self.get_result_cache_key()
+                    if cache_key is not None and not self.result_cache_force and self.fetch_cached_result(cache_key):
+                        return
+
+            run_task_graph({
+                'instance': (report.timed('instance', self.prepare_instance), []),
+                'input': (report.timed('input', self.upload_input), []),
+                'execute': (report.timed('execute', lambda: self.send_remote_command_batch(
+                                self.get_process_vht_commands(),
+                                working_dir='/home/ubuntu',
+                                single_invocation=self.ssm_single_invocation)),
+                            ['instance', 'input'])
+            })
+
+            with report.phase('download'):
+                logging.info("aws:Download S3 File to the GitHub Runner...")
+                self.download_archive(
+                    filename=self.vht_out,
+                    key=self.vht_out_key
+                )
+
+            if cache_key is not None:
+                with report.phase('cache'):
+                    self.store_cached_result(cache_key)
+
+            if delete_output_file_from_cloud:
+                with report.phase('delete'):
+                    logging.info("aws:Delete S3 Out.tar object from the S3 Bucket...")
+                    self.delete_file_from_cloud(key=self.vht_out_key)
+
+            with report.phase('teardown'):
+                self.teardown()
+        except BaseException:
+            # also on KeyboardInterrupt: the instance must not keep running
+            if self.instance_id not in ('', None) and not self.instance_torn_down:
+                logging.error("aws:Run failed, tearing down the EC2 instance!")
+                try:
+                    self.teardown()
+                except (Exception, SystemExit) as e:
+                    logging.error(f"aws:Teardown of {self.instance_id} failed: {e!r}")
+            raise
+        finally:
+            self.write_run_report()
+
+    def get_instance_image_id(self):
+        """
+        Get the AMI ID of the instance (instance_id).
+
+        More
+        ----
+        API Definition
+            https://boto3.amazonaws.com/v1/documentation/api/latest/reference/services/ec2.html#EC2.Client.describe_instances
+        """
+        response = self.ec2_client.describe_instances(InstanceIds=[self.instance_id])
+        return response['Reservations'][0]['Instances'][0]['ImageId']
+
+    def get_process_vht_version(self):
+        """
+        Get the version of the VHT agent script: the ETag (or Last-Modified) of
+        PROCESS_VHT_URL, hash of the content if the server sends neither.
+        The commands download the script at run time, so it is part of the result cache key.
+
+        Return
+        ----------
+        String
+            Version or None if the script cannot be reached
+        """
+        if self.process_vht_version is None:
+            try:
+                with urllib.request.urlopen(urllib.request.Request(PROCESS_VHT_URL, method='HEAD'),
+                                            timeout=10) as response:
+                    version = response.headers.get('ETag') or response.headers.get('Last-Modified')
+                if version is None:
+                    with urllib.request.urlopen(PROCESS_VHT_URL, timeout=10) as response:
+                        version = hashlib.sha256(response.read()).hexdigest()
+                self.process_vht_version = version
+            except OSError as e:
+                logging.warning(f"aws:Cannot get the version of {PROCESS_VHT_URL}: {e!r}")
+        return self.process_vht_version
+
+    def get_result_cache_key(self):
+        """
+        Get the result cache key of run(): SHA-256 of the input content hash (vht.tar
+        or workspace manifest), the AMI ID, the VHT agent version and the command
+        sequence. The S3 keys of the input/output archives are left out of the command
+        sequence hash, so jobs and content-addressed inputs share results.
+
+        Return
+        ----------
+        String
+            Hex digest or None if the VHT agent version is unknown (the cache is skipped)
+        """
+        process_vht_version = self.get_process_vht_version()
+        if process_vht_version is None:
+            logging.warning("aws:VHT agent version unknown, skipping the result cache")
+            return None
+        if self.workspace_sync_dir:
+            manifest = workspace.get_manifest(self.workspace_sync_dir)
+            input_hash = hashlib.sha256(json.dumps(manifest, sort_keys=True).encode()).hexdigest()
+        else:
+            input_hash = self.get_file_hash(self.vht_in)
+        ami_id = self.ami_id or self.get_instance_image_id()
+        placeholder_client = copy.copy(self)
+        placeholder_client.vht_in_key = '<vht_in>'
+        placeholder_client.vht_out_key = '<vht_out>'
+        placeholder_client.workspace_manifest_key = '<manifest>'
+        commands = '\n'.join(placeholder_client.get_process_vht_commands())
+        commands_hash = hashlib.sha256(commands.encode()).hexdigest()
+        cache_key = hashlib.sha256(
+            f"{input_hash}\n{ami_id}\n{process_vht_version}\n{commands_hash}".encode()).hexdigest()
+        logging.info(f"aws:Result cache key {cache_key} (input {input_hash[:12]}, {ami_id}, "
+                     f"agent {process_vht_version}, commands {commands_hash[:12]})")
+        return cache_key
+
+    def get_cached_result_location(self, cache_key):
+        """
+            Get the cached out.tar: S3 key `results/<cache key>/out.tar` or local path.
+        """
+        if self.result_cache == 'local':
+            return os.path.join(self.result_cache_dir, cache_key, self.vht_out_filename)
+        return f"{self.s3_results_prefix}/{cache_key}/{self.vht_out_filename}{self.get_compression_suffix()}"
+
+    def fetch_cached_result(self, cache_key):
+        """
+        Copy the cached out.tar of cache_key to vht_out.
+
+        Return
+        ----------
+        Boolean
+            True on cache hit
+        """
+        location = self.get_cached_result_location(cache_key)
+        if self.result_cache == 'local':
+            if not os.path.isfile(location):
+                logging.info("aws:Result cache miss")
+                return False
+            shutil.copyfile(location, self.vht_out)
+        else:
+            try:
+                self.s3_client.head_object(Bucket=self.s3_bucket_name, Key=location)
+            except ClientError as e:
+                if e.response['Error']['Code'] not in ('404', 'NoSuchKey', 'NotFound'):
+                    raise
+                logging.info("aws:Result cache miss")
+                return False
+            self.download_archive(filename=self.vht_out, key=location)
+        logging.info(f"aws:Result cache hit, {self.vht_out} copied from {location}")
+        return True
+
+    def store_cached_result(self, cache_key):
+        """
+        Store the output of run() in the result cache: S3 server-side copy of
+        vht_out_key (nothing is uploaded again) or local copy of vht_out.
+
+        More
+        ----
+        API Definition
+            https://boto3.amazonaws.com/v1/documentation/api/latest/reference/services/s3.html#S3.Client.copy
+        """
+        location = self.get_cached_result_location(cache_key)
+        logging.info(f"aws:Storing result in cache {location}")
+        if self.result_cache == 'local':
+            os.makedirs(os.path.dirname(location), exist_ok=True)
+            shutil.copyfile(self.vht_out, f"{location}.tmp")
+            os.replace(f"{location}.tmp", location)
+        else:
+            self.s3_client.copy({'Bucket': self.s3_bucket_name, 'Key': self.vht_out_key},
+                                self.s3_bucket_name, location, Config=self.s3_transfer_config)
+
+    def write_run_report(self):
+        """
+        Log the one line summary of the run report and write the JSON report to
+        run_report_file (if set).
+
+        Return
+        ----------
+        Dict
+            Run report (see RunReport.get_report)
+        """
+        report = self.run_report.get_report(InstanceId=self.instance_id, InstanceType=self.instance_type)
+        logging.info(f"aws:Run report: {self.run_report.get_summary()}")
+        if self.run_report_file:
+            with open(self.run_report_file, 'w') as f:
+                json.dump(report, f, indent=2)
+            logging.info(f"aws:Run report written to {self.run_report_file}")
+        return report
+
+    def prepare_instance(self):
+        """
+        Get a running instance with status OK for run(): lease one from the warm pool,
+        create one or start the provided instance_id.
+        """
+        self.instance_torn_down = False
+        self.pending_command_ids = []
+        if self.instance_id in ('', None) and self.instance_pool_size > 0:
+            self.lease_instance()
+        elif self.instance_id in ('', None):
+            self.create_instance()
+        else:
+            logging.info(f"aws:EC2 Instance {self.instance_id} provided!")
+            self.start_instance()
+
+    def upload_input(self):
+        """
+        Upload the input of run(): sync the workspace or upload vht.tar (content-addressed
+        or to vht_in_key).
+        """
+        if self.workspace_sync_dir:
+            self.sync_workspace()
+        elif self.s3_content_addressed_input:
+            self.vht_in_key = self.get_content_addressed_key(
+                self.vht_in, f"{self.vht_in_filename}{self.get_compression_suffix()}")
+            self.upload_archive(self.vht_in, self.vht_in_key, if_missing=True)
+        else:
+            self.upload_archive(self.vht_in, self.vht_in_key)
+
+    def get_job_client(self, vht_in):
+        """
+        Get a copy of this client that runs one job of run_jobs.
+        The copy shares the boto3 clients, but uses its own instance (leased from
+        the pool or created) and its own S3 keys `jobs/<job id>/vht.tar|out.tar`.
+
+        Parameters
+        ----------
+        String
+            vht_in (Local path of the input archive)
+
+        Return
+        ----------
+        AWSClient
+            Job client. The output archive is written next to the input as `<name>.out.tar`.
+        """
+        job_id = uuid.uuid4().hex
+        job_client = copy.copy(self)
+        job_client.instance_id = None
+        job_client.instance_lease = None
+        job_client.instance_spot = False
+        job_client.instance_torn_down = False
+        job_client.pending_command_ids = []
+        job_client.workspace_manifest_key = None
+        job_client.run_report = RunReport()
+        if self.run_report_file:
+            job_client.run_report_file = f"{os.path.splitext(vht_in)[0]}.run_report.json"
+        job_client.vht_in = vht_in
+        job_client.vht_out = f"{os.path.splitext(vht_in)[0]}.{self.vht_out_filename}"
+        job_client.vht_in_key = f"jobs/{job_id}/{self.vht_in_filename}{self.get_compression_suffix()}"
+        job_client.vht_out_key = f"jobs/{job_id}/{self.vht_out_filename}{self.get_compression_suffix()}"
+        return job_client
+
+    def run_job(self, job_client):
+        """
+        Run one job of run_jobs and catch its failure.
+        A job interrupted by a spot reclaim is re-queued on a new instance, up to
+        spot_max_retries times; then it runs on-demand (if spot_fallback) or fails.
+
+        Return
+        ----------
+        Dict
+            'Job', 'Output', 'InstanceId', 'Status' ('Success' or 'Failed'), 'Error', 'Duration' (seconds),
+            'Interruptions' (number of spot interruptions)
+        """
+        start = time.monotonic()
+        status = 'Success'
+        error = ''
+        interruptions = 0
+        while True:
+            try:
+                job_client.run()
+                break
+            except (Exception, SystemExit) as e:
+                if job_client.instance_spot and job_client.is_spot_interrupted():
+                    interruptions += 1
+                    logging.warning(f"aws:Job {job_client.vht_in}: spot instance {job_client.instance_id} "
+                                    f"interrupted ({interruptions}), re-queueing job")
+                    if interruptions <= self.spot_max_retries or self.spot_fallback:
+                        if interruptions > self.spot_max_retries:
+                            logging.warning(f"aws:Job {job_client.vht_in}: running on-demand")
+                            job_client.instance_market = 'on-demand'
+                        job_client.instance_id = None
+                        job_client.instance_spot = False
+                        continue
+                status = 'Failed'
+                error = repr(e)
+                logging.error(f"aws:Job {job_client.vht_in} failed: {error}")
+                if job_client.instance_id not in ('', None) and not job_client.instance_torn_down:
+                    try:
+                        job_client.teardown()
+                    except (Exception, SystemExit) as teardown_error:
+                        logging.error(f"aws:Teardown of {job_client.instance_id} failed: {teardown_error!r}")
+                break
+
+        return {
+            'Job': job_client.vht_in,
+            'Output': job_client.vht_out,
+            'InstanceId': job_client.instance_id,
+            'Status': status,
+            'Error': error,
+            'Duration': round(time.monotonic() - start, 1),
+            'Interruptions': interruptions
+        }
+
+    def run_jobs(self, vht_in_list, max_workers=None):
+        """
+        Run several input archives concurrently, one instance per job.
+
+        Parameters
+        ----------
+        List
+            vht_in_list (Local paths of the input archives)
+        Integer
+            max_workers (Max number of concurrent jobs/instances - Default: all jobs at once)
+
+        Return
+        ----------
+        List
+            Per-job status (see run_job), in the order of vht_in_list
+
+        Each job leases a pool instance if instance_pool_size is set, otherwise it
+        creates (and tears down) its own instance. A failed job does not stop the others.
+        """
+        if not vht_in_list:
+            return []
+        max_workers = max_workers or len(vht_in_list)
+        logging.info(f"aws:Running {len(vht_in_list)} jobs on up to {max_workers} instances")
+
+        job_clients = [self.get_job_client(vht_in) for vht_in in vht_in_list]
+        results = {}
+        with ThreadPoolExecutor(max_workers=max_workers) as executor:
+            futures = {executor.submit(self.run_job, job_client): job_client for job_client in job_clients}
+            for future in as_completed(futures):
+                result = future.result()
+                results[futures[future].vht_in] = result
+                logging.info(f"aws:Job {result['Job']}: {result['Status']} ({result['Duration']} s)")
+
+        return [results[vht_in] for vht_in in vht_in_list]
+
+    def get_job_queue(self):
+        """
+            Get the persistent job queue (job_queue_file).
+        """
+        return jobqueue.JobQueue(self.job_queue_file)
+
+    def submit_jobs(self, vht_in_list, priority=0, max_attempts=None):
+        """
+        Add input archives to the job queue.
+
+        Parameters
+        ----------
+        List
+            vht_in_list (Local paths of the input archives)
+        Integer
+            priority (Higher runs first - Default: 0)
+            max_attempts (Runs before a job fails - Default: job_max_attempts env or 3)
+
+        Return
+        ----------
+        List
+            Job IDs
+        """
+        queue = self.get_job_queue()
+        job_ids = [queue.submit(os.path.abspath(vht_in), priority, max_attempts or self.job_max_attempts)
+                   for vht_in in vht_in_list]
+        logging.info(f"aws:Submitted jobs {job_ids} (priority {priority})")
+        return job_ids
+
+    def list_jobs(self, status=None):
+        return self.get_job_queue().list(status)
+
+    def run_queue(self, max_workers=None, wait=False, poll_interval=30):
+        """
+        Run the jobs of the job queue with up to max_workers concurrent jobs.
+
+        Each worker claims the next job (highest priority first), runs it like
+        run_jobs (see run_job: pool instance if instance_pool_size is set) and stores
+        the result; failed jobs are queued again until max_attempts. The heartbeat of
+        the running jobs is updated every job_heartbeat_timeout / 4 seconds; running
+        jobs without heartbeat for job_heartbeat_timeout seconds (left by a crashed
+        scheduler) are queued again.
+
+        Parameters
+        ----------
+        Integer
+            max_workers (Max number of concurrent jobs - Default: instance_pool_size or 1)
+        Boolean
+            wait (Keep polling for new jobs until interrupted - Default: False = stop when the queue is empty)
+        Integer
+            poll_interval (Seconds between polls of an empty queue with wait - Default: 30)
+
+        Return
+        ----------
+        Dict
+            Number of jobs per status after the run
+        """
+        queue = self.get_job_queue()
+        max_workers = max_workers or self.instance_pool_size or 1
+        stop = threading.Event()
+        done = threading.Event()
+        # IDs of the jobs run by the workers, guarded by running_lock (read by the heartbeat thread)
+        running = set()
+        running_lock = threading.Lock()
+        logging.info(f"aws:Running job queue {self.job_queue_file} with up to {max_workers} concurrent jobs")
+
+        def requeue_stale():
+            requeued = queue.requeue_stale(self.job_heartbeat_timeout)
+            if requeued:
+                logging.warning(f"aws:Re-queued {requeued} jobs left running by a crashed scheduler")
+
+        def heartbeat():
+            while not done.wait(self.job_heartbeat_timeout / 4):
+                with running_lock:
+                    job_ids = list(running)
+                try:
+                    queue.heartbeat(job_ids)
+                    requeue_stale()
+                except Exception as e:
+                    logging.warning(f"aws:Job queue heartbeat failed: {e!r}")
+
+        def worker(index):
+            name = f"{socket.gethostname()}:{os.getpid()}:{index}"
+            while not stop.is_set():
+                job = queue.claim(name)
+                if job is None:
+                    if not wait:
+                        return
+                    stop.wait(poll_interval)
+                    continue
+                logging.info(f"aws:Job {job['id']} {job['vht_in']}: attempt {job['attempts']} of {job['max_attempts']}")
+                with running_lock:
+                    running.add(job['id'])
+                start = time.monotonic()
+                try:
+                    result = self.run_job(self.get_job_client(job['vht_in']))
+                except (Exception, SystemExit) as e:
+                    logging.error(f"aws:Job {job['id']} {job['vht_in']} failed: {e!r}")
+                    result = {'Job': job['vht_in'], 'Status': 'Failed', 'Error': repr(e),
+                              'Duration': round(time.monotonic() - start, 1)}
+                try:
+                    status = queue.finish(job['id'], result)
+                    logging.info(f"aws:Job {job['id']} {job['vht_in']}: {status} ({result['Duration']} s)")
+                except Exception as e:
+                    # the job is queued again once its heartbeat is stale
+                    logging.error(f"aws:Cannot store the result of job {job['id']}: {e!r}")
+                finally:
+                    with running_lock:
+                        running.discard(job['id'])
+
+        requeue_stale()
+        heartbeat_thread = threading.Thread(target=heartbeat, daemon=True)
+        heartbeat_thread.start()
+        try:
+            with ThreadPoolExecutor(max_workers=max_workers) as executor:
+                futures = [executor.submit(worker, index) for index in range(max_workers)]
+                try:
+                    for future in futures:
+                        future.result()
+                except KeyboardInterrupt:
+                    logging.warning("aws:Interrupted, waiting for the running jobs to finish...")
+                    stop.set()
+        finally:
+            done.set()
+            heartbeat_thread.join()
+
+        stats = queue.get_stats()
+        logging.info(f"aws:Job queue: {stats}")
+        return stats
+
+    def get_compression_suffix(self):
+        """
+            Get the S3 key suffix of s3_compression ('.gz', '.xz', '.zst' or '').
+        """
+        return compression.get_suffix(self.s3_compression)
+
+    def upload_archive(self, filename, key, if_missing=False):
+        """
+        Upload vht.tar: compressed on the fly if s3_compression is set.
+
+        Parameters
+        ----------
+        String
+            filename (Local Filename Path)
+            key (Filepath to be stored on S3 Bucket)
+        Boolean
+            if_missing (Skip the upload if the key exists, for content-addressed keys - Default: False)
+        """
+        if self.s3_compression == 'none':
+            if if_missing:
+                return self.upload_file_to_cloud_if_missing(filename, key)
+            return self.upload_file_to_cloud(filename, key)
+
+        if if_missing:
+            try:
+                # the compressed size is unknown, the key is derived from the uncompressed content
+                self.s3_client.head_object(Bucket=self.s3_bucket_name, Key=key)
+                logging.info(f"aws:Key {key} already present on S3 Bucket {self.s3_bucket_name}, skipping upload")
+                return False
+            except ClientError as e:
+                if e.response['Error']['Code'] not in ('404', 'NoSuchKey', 'NotFound'):
+                    raise
+        self.upload_file_to_cloud_compressed(filename, key)
+        return True
+
+    def download_archive(self, filename, key):
+        """
+            Download out.tar: decompressed on the fly if s3_compression is set.
+        """
+        if self.s3_compression == 'none':
+            return self.download_file_from_cloud(filename=filename, key=key)
+        return self.download_file_from_cloud_decompressed(filename, key)
+
+    def upload_file_to_cloud_compressed(self, filename, key):
+        """
+        Upload a file to a S3 Bucket, compressed with s3_compression.
+
+        The file is compressed by a thread into a pipe that is read by the S3
+        transfer, so compression and upload overlap and no compressed copy is
+        written to disk.
+
+        More
+        ----------
+        API Definition
+            https://boto3.amazonaws.com/v1/documentation/api/latest/reference/services/s3.html#S3.Client.upload_fileobj
+        """
+        def compress(fileobj):
+            with open(filename, 'rb') as src, compression.open_compressor(fileobj, self.s3_compression) as dst:
+                for block in iter(lambda: src.read(compression.CHUNK_SIZE), b''):
+                    dst.write(block)
+
+        size = os.path.getsize(filename)
+        logging.info(f"aws:Upload File {filename} ({self.s3_compression}) to S3 Bucket {self.s3_bucket_name}, Key {key}")
+        progress = TransferProgress(f"Upload {key}")
+        pipe = compression.Pipe(compress, reader=True)
+        try:
+            self.s3_client.upload_fileobj(pipe.fileobj, self.s3_bucket_name, key,
+                                          Config=self.s3_transfer_config, Callback=progress)
+        except BaseException:
+            pipe.join(raise_error=False)
+            raise
+        pipe.join()
+        progress.done()
+        logging.info(f"aws:Compressed {size / 1e6:.1f} MB to {progress.transferred / 1e6:.1f} MB")
+
+    def download_file_from_cloud_decompressed(self, filename, key):
+        """
+        Download a S3 file compressed with s3_compression and decompress it.
+
+        The S3 transfer writes into a pipe that is decompressed by a thread into
+        filename, so download and decompression overlap.
+
+        More
+        ----------
+        API Definition
+            https://boto3.amazonaws.com/v1/documentation/api/latest/reference/services/s3.html#S3.Client.download_fileobj
+        """
+        def decompress(fileobj):
+            with compression.open_decompressor(fileobj, self.s3_compression) as src, open(filename, 'wb') as dst:
+                for block in iter(lambda: src.read(compression.CHUNK_SIZE), b''):
+                    dst.write(block)
+
+        logging.info(f"aws:Downloading S3 file from bucket `{self.s3_bucket_name}`, key `{key}`, "
+                     f"filename `{filename}` ({self.s3_compression})")
+        progress = TransferProgress(f"Download {key}")
+        pipe = compression.Pipe(decompress, reader=False)
+        try:
+            self.s3_client.download_fileobj(self.s3_bucket_name, key, pipe.fileobj,
+                                            Config=self.s3_transfer_config, Callback=progress)
+        except BrokenPipeError:
+            # the decompression stopped reading: its error is raised by join
+            pass
+        except BaseException:
+            pipe.join(raise_error=False)
+            raise
+        pipe.join()
+        progress.done()
+        logging.info(f"aws:Decompressed {progress.transferred / 1e6:.1f} MB to {os.path.getsize(filename) / 1e6:.1f} MB")
+
+    def upload_file_to_cloud(self, filename, key):
+        """
+        Upload a file to a S3 Bucket
+
+        Parameters
+        ----------
+        String
+            filename (Local Filename Path)
+            Key (Filepath to be stored on S3 Bucket)
+
+        The transfer uses s3_transfer_config (multipart chunk size and concurrency).
+
+        More
+        ----------
+        API Definition
+            https://boto3.amazonaws.com/v1/documentation/api/latest/reference/services/s3.html#S3.Client.upload_file
+        """
+
+        logging.info(f"aws:Upload File {filename} to S3 Bucket {self.s3_bucket_name}, Key {key}")
+        progress = TransferProgress(f"Upload {key}", os.path.getsize(filename))
+        self.s3_client.upload_file(filename, self.s3_bucket_name, key,
+                                   Config=self.s3_transfer_config, Callback=progress)
+        progress.done()
+
+    def upload_file_to_cloud_if_missing(self, filename, key):
+        """
+        Upload a file to a S3 Bucket unless an object of the same size exists under the key.
+        Intended for content-addressed keys (see get_content_addressed_key).
+
+        Parameters
+        ----------
+        String
+            filename (Local Filename Path)
+            Key (Filepath to be stored on S3 Bucket)
+
+        Return
+        ----------
+        Boolean
+            True if the file was uploaded, False if the upload was skipped
+
+        More
+        ----------
+        API Definition
+            https://boto3.amazonaws.com/v1/documentation/api/latest/reference/services/s3.html#S3.Client.head_object
+        """
+        try:
+            response = self.s3_client.head_object(Bucket=self.s3_bucket_name, Key=key)
+            if response['ContentLength'] == os.path.getsize(filename):
+                logging.info(f"aws:Key {key} already present on S3 Bucket {self.s3_bucket_name}, skipping upload")
+                return False
+        except ClientError as e:
+            if e.response['Error']['Code'] not in ('404', 'NoSuchKey', 'NotFound'):
+                raise
+
+        self.upload_file_to_cloud(filename, key)
+        return True
+
+    def send_remote_command(self, command_list, working_dir, fail_if_unsuccess = True):
+        """
+        Send a remote command to an EC2 Instance.
+
+        Parameters
+        ----------
+        List
+            command_list (List of commands)
+        String
+            working_dir (Directory where the remote command will be executed)
+        Boolean
+            fail_if_unsuccess (Fail the method in case the command failed)
+
+        Return
+        ------
+            JSON data from send_ssm_shell_command method.
+
+        This is a mandatory VHT backend method.
+        """
+        logging.info(f"vht: command_list = {command_list}")
+        response = self.send_ssm_shell_command(
+            command_list=command_list,
+            working_dir=working_dir
+        )
+
+        for i in response.keys():
+            logging.info(f"vht:{i} = {response[i].strip()}")
+        if response['CommandIdStatus'] != 'Success' and fail_if_unsuccess:
+            logging.error(f"Command {command_list} failed")
+            logging.error("Tearing down the EC2 instance!")
+            self.teardown()
+            sys.exit(-1)
+
+        return response
+
+    def send_remote_command_batch(self, command_list, working_dir, fail_if_unsuccess = True,
+                                  single_invocation = False):
+        """
+        Send batch of remote commands to an EC2 Instance.
+
+        Parameters
+        ----------
+        List
+            command_list (List of List of commands)
+        String
+            working_dir (Directory where the remote command will be executed)
+        Boolean
+            fail_if_unsuccess (Fail the method in case the command failed - Default: True)
+            single_invocation (Send all commands as one SSM invocation - Default: False)
+                See send_remote_command_sequence.
+
+        Return
+        ------
+            JSON data from send_ssm_shell_command method.
+
+        This is a mandatory VHT backend method.
+        """
+        if single_invocation:
+            return self.send_remote_command_sequence(
+                command_list=command_list,
+                working_dir=working_dir,
+                fail_if_unsuccess=fail_if_unsuccess
+            )
+
+        logging.info(f"vht: command_list = {command_list}")
+        all_responses = []
+
+        for command in command_list:
+            all_responses.append(
+                self.send_remote_command(
+                    command_list=command,
+                    working_dir=working_dir,
+                    fail_if_unsuccess=fail_if_unsuccess
+                )
+            )
+        logging.debug(f"vht: all_responses = {all_responses}")
+        return all_responses
+
+    def get_command_sequence_script(self, command_list, stop_on_failure=True):
+        """
+        Get a shell script that runs a list of commands with per-step output markers.
+
+        Each command runs in its own subshell (like a separate SSM invocation) and is
+        framed by `##VHT_STEP_BEGIN <n>##` and `##VHT_STEP_END <n> <exit code>##`
+        lines on stdout and stderr.
+
+        Parameters
+        ----------
+        List
+            command_list (List of commands)
+        Boolean
+            stop_on_failure (Skip the remaining commands after a failed one - Default: True)
+
+        Return
+        ----------
+        String
+            Shell script
+        """
+        lines = []
+        for step, command in enumerate(command_list):
+            lines += [
+                f"echo '##VHT_STEP_BEGIN {step}##'; echo '##VHT_STEP_BEGIN {step}##' >&2",
+                f"( {command} )",
+                "rc=$?",
+                f"echo \"##VHT_STEP_END {step} $rc##\"; echo \"##VHT_STEP_END {step} $rc##\" >&2"
+            ]
+            if stop_on_failure:
+                lines.append("[ $rc -eq 0 ] || exit $rc")
+        lines.append("exit 0")
+        return '\n'.join(lines)
+
+    def parse_command_sequence_output(self, output, num_steps):
+        """
+        Split the output of a get_command_sequence_script script into steps.
+
+        Parameters
+        ----------
+        String
+            output (stdout or stderr of the script)
+        Integer
+            num_steps (Number of commands of the script)
+
+        Return
+        ----------
+        List
+            (output, exit code) per step, exit code is None for steps that did not finish
+        """
+        steps = [['', None] for _ in range(num_steps)]
+        pattern = re.compile(r'##VHT_STEP_BEGIN (\d+)##\n(.*?)##VHT_STEP_END \1 (\d+)##', re.S)
+        for match in pattern.finditer(output):
+            step = int(match.group(1))
+            if step < num_steps:
+                steps[step] = [match.group(2), int(match.group(3))]
+
+        # output of an unfinished step (e.g. timed out) up to the end
+        begin = output.rfind('##VHT_STEP_BEGIN ')
+        if begin >= 0:
+            match = re.match(r'##VHT_STEP_BEGIN (\d+)##\n?', output[begin:])
+            if match and int(match.group(1)) < num_steps and steps[int(match.group(1))][1] is None:
+                steps[int(match.group(1))][0] = output[begin + match.end():]
+
+        return [tuple(step) for step in steps]
+
+    def send_remote_command_sequence(self, command_list, working_dir, fail_if_unsuccess = True):
+        """
+        Send a list of remote commands to an EC2 Instance as one SSM invocation.
+
+        This saves the per-invocation overhead (send, wait, status and output reads)
+        of send_remote_command_batch. The per-step results are parsed back from the
+        output markers of get_command_sequence_script.
+
+        Parameters
+        ----------
+        List
+            command_list (List of commands)
+        String
+            working_dir (Directory where the remote commands will be executed)
+        Boolean
+            fail_if_unsuccess (Fail the method in case a command failed - Default: True)
+
+        Return
+        ------
+        List
+            Per-step dict: 'CommandId', 'CommandIdStatus' ('Success', 'Failed' or 'Skipped'),
+            'CommandList', 'ExitCode', 'StdOut', 'StdErr'
+        """
+        logging.info(f"vht: command_list = {command_list}")
+        response = self.send_ssm_shell_command(
+            command_list=self.get_command_sequence_script(command_list),
+            working_dir=working_dir,
+            execution_timeout=3600 * len(command_list),
+            fetch_stderr=True
+        )
+
+        stdout_steps = self.parse_command_sequence_output(response['StdOut'], len(command_list))
+        stderr_steps = self.parse_command_sequence_output(response['StdErr'], len(command_list))
+
+        all_responses = []
+        for command, (stdout_str, exit_code), (stderr_str, _) in zip(command_list, stdout_steps, stderr_steps):
+            if exit_code is None:
+                status = 'Skipped' if stdout_str == '' and stderr_str == '' else 'Failed'
+            else:
+                status = 'Success' if exit_code == 0 else 'Failed'
+            all_responses.append({
+                'CommandId' : response['CommandId'],
+                'CommandIdStatus' : status,
+                'CommandList' : command,
+                'ExitCode' : exit_code,
+                'StdOut' : stdout_str,
+                'StdErr': stderr_str
+            })
+            logging.info(f"vht:{command} = {status} (exit code {exit_code})")
+            if status == 'Failed':
+                logging.info(f"vht:StdOut = {stdout_str.strip()}")
+                logging.info(f"vht:StdErr = {stderr_str.strip()}")
+
+        failed = response['CommandIdStatus'] != 'Success' or \
+            any(step['CommandIdStatus'] == 'Failed' for step in all_responses)
+        if failed and fail_if_unsuccess:
+            logging.error(f"Command sequence failed with status {response['CommandIdStatus']}")
+            logging.error("Tearing down the EC2 instance!")
+            self.teardown()
+            sys.exit(-1)
+
+        logging.debug(f"vht: all_responses = {all_responses}")
+        return all_responses
+
+    def send_ssm_shell_command(self,
+                               command_list,
+                               working_dir='/',
+                               return_type='all',
+                               timeout_seconds=600,
+                               execution_timeout=None,
+                               fetch_stderr=False,
+                               stream_output=None):
+        """
+        Send SSM Shell Commands to a EC2 Instance
+
+        Parameters
+        ----------
+        String
+            command_list (List of commands to be executed on the instance_id)
+            working_dir (Working directory - Default: '/')
+            return_type (
+                Method return types:
+                    `all`: Return as a dict: 'CommandId', 'CommandIdStatus', 'CommandList', 'StdOut', 'StdErr' - Default
+                    `command_id`: Return only the `command_id` as a String
+            )
+            timeout_seconds (Command Timeout in Seconds - Default: 600)
+        Integer
+            execution_timeout (Execution Timeout in Seconds - Default: None = SSM default 3600)
+        Boolean
+            fetch_stderr (Read StdErr also if the command succeeded - Default: False)
+            stream_output (Print the output while the command runs - Default: ssm_stream_output env)
+                See follow_ssm_command_output.
+
+        Return
+        ----------
+        Dict
+            if return_type == `all` (Default):
+                'CommandId', 'CommandIdStatus', 'CommandList', 'StdOut', 'StdErr'
+        String
+            if return_type == `command_id`:
+                command_id
+
+        More
+        ----------
+        TODO: Use **kwargs
+
+        API Definition
+            https://boto3.amazonaws.com/v1/documentation/api/latest/reference/services/ssm.html#SSM.Client.send_command
+            https://docs.aws.amazon.com/systems-manager/latest/userguide/ssm-plugins.html#aws-runShellScript
+        """
+
+        command_id = ''
+        command_id_status = ''
+        stdout_key = ''
+        stdout_str = ''
+        stderr_key = ''
+        stderr_str = ''
+
+        if stream_output is None:
+            stream_output = self.ssm_stream_output
+        if stream_output:
+            log_file = f"/tmp/vht-{uuid.uuid4().hex}.log"
+            commands = self.get_stream_output_script(command_list, log_file)
+        else:
+            commands = command_list
+
+        parameters = {
+            'workingDirectory': [
+                working_dir,
+            ],
+            'commands': [
+                commands,
+            ]
+        }
+        if execution_timeout is not None:
+            parameters['executionTimeout'] = [str(execution_timeout)]
+
+        start = time.monotonic()
+        try:
             response = self.ssm_client.send_command(
                 InstanceIds=[
                     self.instance_id
                 ],
                 DocumentName='AWS-RunShellScript',
-                Parameters={
-                    'workingDirectory': [
-                        working_dir,
-                    ],
-                    'commands': [
-                        command_list,
-                    ]
-                },
+                Parameters=parameters,
                 OutputS3BucketName=self.s3_bucket_name,
                 OutputS3KeyPrefix=self.s3_keyprefix,
                 TimeoutSeconds=timeout_seconds,
@@ -711,20 +2415,23 @@ class AWSClient():
         command_id = response['Command']['CommandId']
         logging.info(f"aws:command_id = {command_id}")
 
-        # We need a little bit of time to wait for a command
-        time.sleep(2)
+        # SSM gives up after the delivery and execution timeouts, wait a bit longer
+        timeout = timeout_seconds + (execution_timeout or 3600) + 60
 
         logging.info(f"aws:Waiting command id {command_id} to finish")
-        self.wait_ssm_command_finished(command_id)
-
-        logging.info(f"aws:Get command id {command_id} status")
-        command_id_status = self.get_ssm_command_id_status(command_id)
+        if stream_output:
+            command_id_status = self.follow_ssm_command_output(command_id, log_file, timeout=timeout)
+        else:
+            command_id_status = self.wait_ssm_command_finished(command_id, timeout=timeout)
         logging.info(f"aws:Command id status = {command_id_status}")
+        if command_id_status not in ('Success', 'Cancelled', 'TimedOut', 'Failed'):
+            self.pending_command_ids.append(command_id)
+        self.run_report.add_command(command_id, command_list, command_id_status, time.monotonic() - start)
 
         stdout_key = self.get_s3_ssm_command_id_key(command_id, 'stdout')
         stdout_str = self.get_s3_file_content(stdout_key)
 
-        if command_id_status != 'Success':
+        if command_id_status != 'Success' or fetch_stderr:
             stderr_key = self.get_s3_ssm_command_id_key(command_id, 'stderr')
             stderr_str = self.get_s3_file_content(stderr_key)
 
@@ -741,6 +2448,146 @@ class AWSClient():
         else:
             raise AttributeError(f"Output type '{return_type}' invalid. See docs.")
 
+    def get_stream_output_script(self, command_list, log_file):
+        """
+        Wrap a shell command so that its stdout and stderr are also appended to a log file.
+        The command is written to a script file next to the log file and runs in bash with
+        stdin from /dev/null (a step reading stdin must not consume the script). Its output
+        goes through two tee processes that are waited for, so the log file is complete when
+        the command finishes. The exit code of the command is kept.
+
+        Parameters
+        ----------
+        String
+            command_list (Shell command or script)
+            log_file (Log file path on the instance)
+
+        Return
+        ----------
+        String
+            Shell script
+        """
+        script_file = f"{log_file}.sh"
+        return (
+            f"cat > {script_file} <<'VHT_STREAM_EOF'\n"
+            f"{command_list}\n"
+            "VHT_STREAM_EOF\n"
+            f"mkfifo {log_file}.out {log_file}.err\n"
+            f"tee -a {log_file} < {log_file}.out &\n"
+            "out_pid=$!\n"
+            f"tee -a {log_file} < {log_file}.err >&2 &\n"
+            "err_pid=$!\n"
+            f"bash {script_file} < /dev/null > {log_file}.out 2> {log_file}.err\n"
+            "status=$?\n"
+            "wait $out_pid $err_pid\n"
+            f"rm -f {script_file} {log_file}.out {log_file}.err\n"
+            "exit $status"
+        )
+
+    def read_remote_file(self, path, offset, size, delete=False):
+        """
+        Read a byte range of a file on the instance (by a short SSM command).
+
+        Parameters
+        ----------
+        String
+            path (File path on the instance)
+        Integer
+            offset (Start of the range in bytes)
+            size (Max size of the range in bytes, the base64 encoded range must fit
+                  into the 24000 characters of StandardOutputContent)
+        Boolean
+            delete (Delete the file after reading - Default: False)
+
+        Return
+        ----------
+        Bytes
+            File content in the range (empty if the file does not exist)
+
+        More
+        ----------
+        API Definition
+            https://boto3.amazonaws.com/v1/documentation/api/latest/reference/services/ssm.html#SSM.Client.get_command_invocation
+        """
+        command = f"tail -c +{offset + 1} {path} 2>/dev/null | head -c {size} | base64 -w0"
+        if delete:
+            command += f"; rm -f {path}"
+        response = self.ssm_client.send_command(
+            InstanceIds=[self.instance_id],
+            DocumentName='AWS-RunShellScript',
+            Parameters={'commands': [command]}
+        )
+        command_id = response['Command']['CommandId']
+        if self.wait_ssm_command_finished(command_id, max_delay=1, timeout=60) != 'Success':
+            return b''
+        response = self.ssm_client.get_command_invocation(CommandId=command_id, InstanceId=self.instance_id)
+        return base64.b64decode(response['StandardOutputContent'].strip())
+
+    def follow_ssm_command_output(self, command_id, log_file, timeout=None, output=None):
+        """
+        Wait the SSM command to finish and print its output while it runs.
+
+        The output is appended to log_file on the instance (see get_stream_output_script).
+        Every ssm_stream_interval seconds the new bytes of the log file are read by
+        ranged reads (read_remote_file) and written to output. Each read is an SSM
+        command (send_command and get_command_invocation calls), so while the command
+        prints nothing the interval doubles up to ssm_stream_max_interval, and it is
+        reset when new output arrives. On KeyboardInterrupt the remote command is cancelled.
+
+        Parameters
+        ----------
+        String
+            command_id (Command ID)
+            log_file (Log file path on the instance)
+        Float
+            timeout (Max wait in seconds - Default: None = no limit)
+        File
+            output (Output stream - Default: sys.stdout)
+
+        Return
+        ----------
+        String
+            Command Status (see wait_ssm_command_finished)
+
+        More
+        ----------
+        API Definition
+            https://boto3.amazonaws.com/v1/documentation/api/latest/reference/services/ssm.html#SSM.Client.cancel_command
+        """
+        output = output or sys.stdout
+        chunk_size = 12000
+        offset = 0
+        deadline = None if timeout is None else time.monotonic() + timeout
+        interval = self.ssm_stream_interval
+
+        try:
+            while True:
+                status = self.wait_ssm_command_finished(command_id, min_delay=interval, timeout=interval)
+                finished = status in ('Success', 'Cancelled', 'TimedOut', 'Failed')
+
+                # drain the log file; remove it after the last read
+                interval = min(interval * 2, max(self.ssm_stream_interval, self.ssm_stream_max_interval))
+                while True:
+                    data = self.read_remote_file(log_file, offset, chunk_size)
+                    if data:
+                        interval = self.ssm_stream_interval
+                        offset += len(data)
+                        output.write(data.decode('utf-8', errors='replace'))
+                        output.flush()
+                    if len(data) < chunk_size:
+                        break
+
+                if finished:
+                    self.read_remote_file(log_file, offset, 0, delete=True)
+                    return status
+                if deadline is not None and time.monotonic() > deadline:
+                    logging.error(f"aws:Timeout while following command id {command_id} (status {status})")
+                    return status
+        except KeyboardInterrupt:
+            logging.error(f"aws:Cancelling command id {command_id}")
+            self.ssm_client.cancel_command(CommandId=command_id, InstanceIds=[self.instance_id])
+            raise
+
     def start_instance(self):
         """
         Start an Instance and wait it to become running and status OK
@@ -766,6 +2613,179 @@ class AWSClient():
 
         return self.instance_id
 
+    def _call_fleet(self, operation, instance_ids, results):
+        """
+        Call an EC2 operation (e.g. start_instances) with many instance IDs per call.
+        If a batch fails (one bad instance fails the whole call), its instances are
+        retried one by one, so only the faulty instances are reported in results.
+
+        Return
+        ----------
+        List
+            Instance IDs the operation succeeded for
+        """
+        done = []
+        for i in range(0, len(instance_ids), FLEET_BATCH_SIZE):
+            batch = instance_ids[i:i + FLEET_BATCH_SIZE]
+            try:
+                response = getattr(self.ec2_client, operation)(InstanceIds=batch)
+                logging.debug(f"aws:{operation}:{response}")
+                done += batch
+            except ClientError as e:
+                if len(batch) == 1:
+                    error = f"{e.response['Error']['Code']}: {e.response['Error'].get('Message', '')}"
+                    logging.error(f"aws:{operation} {batch[0]} failed: {error}")
+                    results[batch[0]] = {'State': None, 'Status': 'Failed', 'Error': error}
+                    continue
+                logging.warning(f"aws:{operation} of {len(batch)} instances failed, retrying one by one")
+                for instance_id in batch:
+                    done += self._call_fleet(operation, [instance_id], results)
+        return done
+
+    def _run_fleet_operation(self, operation, instance_ids, state, status_ok=False, wait=True, timeout=900):
+        """
+            Run a fleet operation (see _call_fleet) and wait for the state (see wait_fleet).
+        """
+        instance_ids = list(dict.fromkeys(instance_ids))
+        logging.info(f"aws:{operation} {len(instance_ids)} EC2 instances")
+        results = {}
+        done = self._call_fleet(operation, instance_ids, results)
+        if wait:
+            results.update(self.wait_fleet(done, state, status_ok=status_ok, timeout=timeout))
+        else:
+            results.update({instance_id: {'State': None, 'Status': 'Success', 'Error': ''} for instance_id in done})
+        return {instance_id: results[instance_id] for instance_id in instance_ids}
+
+    def start_fleet(self, instance_ids, wait=True, timeout=900):
+        """
+        Start many instances with one start_instances call per FLEET_BATCH_SIZE instances
+        and wait for them together (running and status OK, see wait_fleet).
+
+        Parameters
+        ----------
+        List
+            instance_ids (Instance IDs)
+        Boolean
+            wait (Wait for the instances - Default: True)
+        Integer
+            timeout (Max wait in seconds - Default: 900)
+
+        Return
+        ----------
+        Dict
+            {<instance id>: {'State', 'Status' ('Success', 'Failed' or 'TimedOut'), 'Error'}}
+
+        More
+        ----------
+        API Definition
+            https://boto3.amazonaws.com/v1/documentation/api/latest/reference/services/ec2.html#EC2.Client.start_instances
+        """
+        return self._run_fleet_operation('start_instances', instance_ids, 'running',
+                                         status_ok=True, wait=wait, timeout=timeout)
+
+    def stop_fleet(self, instance_ids, wait=True, timeout=900):
+        """
+        Stop many instances and wait for them together. See start_fleet.
+
+        More
+        ----------
+        API Definition
+            https://boto3.amazonaws.com/v1/documentation/api/latest/reference/services/ec2.html#EC2.Client.stop_instances
+        """
+        return self._run_fleet_operation('stop_instances', instance_ids, 'stopped', wait=wait, timeout=timeout)
+
+    def terminate_fleet(self, instance_ids, wait=True, timeout=900):
+        """
+        Terminate many instances and wait for them together. See start_fleet.
+
+        More
+        ----------
+        API Definition
+            https://boto3.amazonaws.com/v1/documentation/api/latest/reference/services/ec2.html#EC2.Client.terminate_instances
+        """
+        return self._run_fleet_operation('terminate_instances', instance_ids, 'terminated', wait=wait, timeout=timeout)
+
+    def wait_fleet(self, instance_ids, state, status_ok=False, timeout=900, min_delay=2, max_delay=15):
+        """
+        Wait many instances to reach a state with a single poller: one
+        describe_instance_status call per FLEET_BATCH_SIZE instances and poll,
+        with exponential backoff from min_delay to max_delay.
+
+        Parameters
+        ----------
+        List
+            instance_ids (Instance IDs)
+        String
+            state ('running', 'stopped' or 'terminated')
+        Boolean
+            status_ok (Also wait for instance and system status OK - Default: False)
+        Integer
+            timeout (Max wait in seconds - Default: 900)
+
+        Return
+        ----------
+        Dict
+            {<instance id>: {'State', 'Status' ('Success', 'Failed' or 'TimedOut'), 'Error'}}
+            An instance fails if it reaches a state it cannot leave to the expected one
+            (e.g. terminated while waiting for running).
+
+        More
+        ----------
+        API Definition
+            https://boto3.amazonaws.com/v1/documentation/api/latest/reference/services/ec2.html#EC2.Client.describe_instance_status
+        """
+        failed_states = {
+            'running': ('shutting-down', 'terminated', 'stopping', 'stopped'),
+            'stopped': ('shutting-down', 'terminated'),
+            'terminated': ()
+        }[state]
+        results = {}
+        states = {}
+        pending = set(instance_ids)
+        deadline = time.monotonic() + timeout
+        delay = min_delay
+        logging.info(f"aws:Waiting until {len(pending)} EC2 instances are {state}"
+                     f"{' with status OK' if status_ok else ''}...")
+        while pending:
+            batch_ids = sorted(pending)
+            for i in range(0, len(batch_ids), FLEET_BATCH_SIZE):
+                batch = batch_ids[i:i + FLEET_BATCH_SIZE]
+                try:
+                    response = self.ec2_client.describe_instance_status(InstanceIds=batch, IncludeAllInstances=True)
+                except ClientError as e:
+                    # new instances can be invisible for a few seconds
+                    logging.debug(f"aws:describe_instance_status: {e}")
+                    continue
+                found = set()
+                for status in response['InstanceStatuses']:
+                    instance_id = status['InstanceId']
+                    found.add(instance_id)
+                    states[instance_id] = status['InstanceState']['Name']
+                    ok = status.get('InstanceStatus', {}).get('Status') == 'ok' and \
+                        status.get('SystemStatus', {}).get('Status') == 'ok'
+                    if states[instance_id] == state and (ok or not status_ok):
+                        results[instance_id] = {'State': state, 'Status': 'Success', 'Error': ''}
+                    elif states[instance_id] in failed_states:
+                        results[instance_id] = {'State': states[instance_id], 'Status': 'Failed',
+                                                'Error': f"Instance is {states[instance_id]}, expected {state}"}
+                # terminated instances eventually disappear from describe_instance_status
+                if state == 'terminated':
+                    for instance_id in set(batch) - found:
+                        results[instance_id] = {'State': state, 'Status': 'Success', 'Error': ''}
+            pending -= set(results)
+            if not pending:
+                break
+            if time.monotonic() + delay > deadline:
+                for instance_id in pending:
+                    results[instance_id] = {'State': states.get(instance_id), 'Status': 'TimedOut',
+                                            'Error': f"Instance not {state} after {timeout} s"}
+                break
+            logging.debug(f"aws:{len(pending)} instances not {state} yet, polling again in {delay} s")
+            time.sleep(delay)
+            delay = min(delay * 2, max_delay)
+
+        return results
+
     def stop_instance(self):
         """
         Stop an Instance and wait it becomes stopped.
@@ -829,11 +2849,15 @@ class AWSClient():
         More
         ----------
         API Definition
-            https://boto3.amazonaws.com/v1/documentation/api/latest/reference/services/ec2.html#EC2.Instance.wait_until_stopped
+            https://boto3.amazonaws.com/v1/documentation/api/latest/reference/services/ec2.html#EC2.Waiter.InstanceStopped
         """
         logging.info(f"aws:Waiting until EC2 instance id {self.instance_id} is stopped...")
-        instance = boto3.resource('ec2').Instance(self.instance_id)
-        instance.wait_until_stopped()
+        waiter = self.ec2_client.get_waiter('instance_stopped')
+        waiter.wait(
+            InstanceIds=[
+                self.instance_id
+            ]
+        )
 
     def wait_ec2_terminated(self):
         """
@@ -842,11 +2866,15 @@ class AWSClient():
         More
         ----------
         API Definition
-            https://boto3.amazonaws.com/v1/documentation/api/latest/reference/services/ec2.html#EC2.Instance.wait_until_terminated
+            https://boto3.amazonaws.com/v1/documentation/api/latest/reference/services/ec2.html#EC2.Waiter.InstanceTerminated
         """
         logging.info(f"aws:Waiting until EC2 instance id {self.instance_id} is terminated...")
-        instance = boto3.resource('ec2').Instance(self.instance_id)
-        instance.wait_until_terminated()
+        waiter = self.ec2_client.get_waiter('instance_terminated')
+        waiter.wait(
+            InstanceIds=[
+                self.instance_id
+            ]
+        )
 
     def wait_s3_object_exists(self, key, delay=5, max_attempts=120):
         """
@@ -876,42 +2904,80 @@ class AWSClient():
 
     def teardown(self):
         """
-            Teardown
+            Teardown (once per instance: send_remote_command and run_job both tear down on failure)
         """
-        # if terminate_instance is True Terminate Otherwise Stop instance
-        if self.terminate_ec2_instance:
+        if self.instance_torn_down:
+            logging.info(f"aws:Instance {self.instance_id} already torn down")
+            return
+        self.instance_torn_down = True
+
+        # a leased pool instance goes back to the pool, unless a command is still running on it
+        if self.instance_lease is not None and self.cancel_pending_commands():
+            self.release_instance()
+            self.shrink_pool()
+        elif self.instance_lease is not None:
+            logging.error(f"aws:Pool instance {self.instance_id} is still busy, terminating it")
+            self.terminate_instance()
+        # if terminate_instance is True Terminate Otherwise Stop instance (spot instances cannot be stopped)
+        elif self.terminate_ec2_instance or self.instance_spot:
             self.terminate_instance()
         else:
             self.stop_instance()
 
-    def wait_ssm_command_finished(self, command_id, delay=5, max_attempts=120):
+    def wait_ssm_command_finished(self, command_id, min_delay=None, max_delay=None, timeout=None):
         """
         Wait the SSM command to reach a terminal status.
+        The status is polled with exponential backoff: short commands finish after
+        sub-second polls, long ones are polled at most every max_delay seconds.
+        The wait ends immediately on any terminal status, including failures.
+
         Parameters
         ----------
         String
             command_id (Command ID)
-            delay (Retry delay in seconds - Default: 5)
-            max_attemps (Max retry - Default: 120)
+        Float
+            min_delay (First poll delay in seconds - Default: ssm_poll_min_delay env or 0.25)
+            max_delay (Max poll delay in seconds - Default: ssm_poll_max_delay env or 10)
+            timeout (Max wait in seconds - Default: None = no limit)
+
+        Return
+        ----------
+        String
+            Command Status ('Success'|'Cancelled'|'TimedOut'|'Failed', or the last
+            non-terminal status if the timeout expired)
 
         More
         ----------
         API Definition
-            https://boto3.amazonaws.com/v1/documentation/api/latest/reference/services/ssm.html#SSM.Waiter.CommandExecuted
+            https://boto3.amazonaws.com/v1/documentation/api/latest/reference/services/ssm.html#SSM.Client.get_command_invocation
         """
-        waiter = self.ssm_client.get_waiter('command_executed')
-        try:
-            waiter.wait(
-                CommandId=command_id,
-                InstanceId=self.instance_id,
-                WaiterConfig={
-                    'Delay': delay,
-                    'MaxAttempts': max_attempts
-                }
-            )
-        except WaiterError:
-            if "Failed" in str(WaiterError):
-                logging.info("aws:Failed status found while wainting for command id")
+        delay = self.ssm_poll_min_delay if min_delay is None else min_delay
+        max_delay = self.ssm_poll_max_delay if max_delay is None else max_delay
+        deadline = None if timeout is None else time.monotonic() + timeout
+        status = 'Pending'
+
+        while True:
+            time.sleep(delay)
+            try:
+                response = self.ssm_client.get_command_invocation(
+                    CommandId=command_id,
+                    InstanceId=self.instance_id
+                )
+                status = response['Status']
+                logging.debug(f"aws:wait_ssm_command_finished:{command_id}:{status}")
+            except self.ssm_client.exceptions.InvocationDoesNotExist:
+                # the invocation is not visible right after send_command
+                logging.debug(f"aws:wait_ssm_command_finished:{command_id}:not yet visible")
+
+            if status in ('Success', 'Cancelled', 'TimedOut', 'Failed'):
+                if status != 'Success':
+                    logging.info(f"aws:Command id {command_id} finished with status {status}")
+                return status
+
+            if deadline is not None and time.monotonic() + delay > deadline:
+                logging.error(f"aws:Timeout while waiting for command id {command_id} (status {status})")
+                return status
+            delay = min(delay * 2, max_delay)
 
     def terminate_instance(self):
         """
@@ -0,0 +1,142 @@
+import gzip
+import lzma
+import os
+import threading
+
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+# Compression: (key suffix, instance shell command)
+COMPRESSIONS = {
+    'gzip': ('.gz', 'gzip'),
+    'xz': ('.xz', 'xz -T0'),
+    'zstd': ('.zst', 'zstd -q -T0'),
+}
+
+# Compression level: fast levels, the transfer is the bottleneck
+LEVELS = {'gzip': 6, 'xz': 3, 'zstd': 3}
+
+CHUNK_SIZE = 1024 * 1024
+
+
+def is_available(compression):
+    """
+        Check if a compression can be used on this machine (zstd needs the zstandard module).
+    """
+    if compression == 'zstd':
+        return zstandard is not None
+    return compression in COMPRESSIONS
+
+
+def get_suffix(compression):
+    """
+        Get the file name suffix of a compression ('' without compression).
+    """
+    return COMPRESSIONS[compression][0] if compression in COMPRESSIONS else ''
+
+
+def get_shell_command(compression, decompress=False):
+    """
+        Get the instance shell command that (de)compresses stdin to stdout.
+    """
+    return f"{COMPRESSIONS[compression][1]} {'-dc' if decompress else '-c'}"
+
+
+def open_compressor(fileobj, compression):
+    """
+        Get a writable file object that writes the compressed data to fileobj.
+    """
+    if compression == 'gzip':
+        return gzip.GzipFile(fileobj=fileobj, mode='wb', compresslevel=LEVELS['gzip'])
+    if compression == 'xz':
+        return lzma.LZMAFile(fileobj, mode='wb', preset=LEVELS['xz'])
+    if compression == 'zstd':
+        return zstandard.ZstdCompressor(level=LEVELS['zstd'], threads=-1).stream_writer(fileobj, closefd=False)
+    raise ValueError(f"Unknown compression {compression}")
+
+
+def open_decompressor(fileobj, compression):
+    """
+        Get a readable file object that decompresses the data read from fileobj.
+    """
+    if compression == 'gzip':
+        return gzip.GzipFile(fileobj=fileobj, mode='rb')
+    if compression == 'xz':
+        return lzma.LZMAFile(fileobj, mode='rb')
+    if compression == 'zstd':
+        return zstandard.ZstdDecompressor().stream_reader(fileobj, closefd=False)
+    raise ValueError(f"Unknown compression {compression}")
+
+
+class Pipe():
+    """
+    OS pipe with a worker thread on one end, so a (de)compression runs while the
+    other end is transferred: no temporary copy of the stream is written to disk.
+
+    `target(fileobj)` runs in the worker thread with the write end (reader=True:
+    the caller reads the pipe) or the read end (reader=False: the caller writes
+    the pipe). An exception of the worker is raised by `join` and, when the
+    caller reads the pipe, by the read that reaches the end of the stream: a
+    failed compression must not look like a complete (truncated) stream.
+    """
+    def __init__(self, target, reader=True):
+        read_fd, write_fd = os.pipe()
+        if reader:
+            self.fileobj = PipeReader(self, os.fdopen(read_fd, 'rb'))
+        else:
+            self.fileobj = os.fdopen(write_fd, 'wb')
+        self.worker_fileobj = os.fdopen(write_fd if reader else read_fd, 'wb' if reader else 'rb')
+        self.target = target
+        self.error = None
+        self.thread = threading.Thread(target=self._run, daemon=True)
+        self.thread.start()
+
+    def _run(self):
+        # the error is set before the pipe is closed, so the reader sees it at the end of the stream
+        try:
+            self.target(self.worker_fileobj)
+        except BaseException as e:
+            self.error = e
+        finally:
+            try:
+                self.worker_fileobj.close()
+            except BaseException as e:
+                if self.error is None:
+                    self.error = e
+
+    def join(self, raise_error=True):
+        try:
+            self.fileobj.close()
+        except BrokenPipeError:
+            pass
+        self.thread.join()
+        if raise_error and self.error is not None:
+            raise self.error
+
+
+class PipeReader():
+    """
+    Read end of a Pipe: the end of the stream raises the exception of the worker.
+    """
+    def __init__(self, pipe, fileobj):
+        self.pipe = pipe
+        self.fileobj = fileobj
+
+    def read(self, size=-1):
+        data = self.fileobj.read(size)
+        if not data and size != 0:
+            self.pipe.thread.join()
+            if self.pipe.error is not None:
+                raise self.pipe.error
+        return data
+
+    def readable(self):
+        return True
+
+    def seekable(self):
+        return False
+
+    def close(self):
+        self.fileobj.close()
@@ -0,0 +1,208 @@
+import contextlib
+import json
+import os
+import sqlite3
+import time
+
+# Job states: queued -> running -> success | failed (a failed attempt is queued again while attempts are left)
+SCHEMA = '''\
+CREATE TABLE IF NOT EXISTS jobs (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    vht_in TEXT NOT NULL,
+    priority INTEGER NOT NULL DEFAULT 0,
+    status TEXT NOT NULL DEFAULT 'queued',
+    attempts INTEGER NOT NULL DEFAULT 0,
+    max_attempts INTEGER NOT NULL DEFAULT 1,
+    worker TEXT,
+    submitted REAL NOT NULL,
+    started REAL,
+    heartbeat REAL,
+    finished REAL,
+    error TEXT,
+    result TEXT
+);
+CREATE INDEX IF NOT EXISTS jobs_queued ON jobs (status, priority DESC, id);
+'''
+
+
+class JobQueue():
+    """
+    Persistent job queue in a SQLite file.
+
+    Jobs are claimed by priority (highest first), then in submission order. Every
+    operation uses its own connection and claiming is done in an IMMEDIATE
+    transaction, so several worker threads or processes can share one queue file.
+    The scheduler of a running job updates its heartbeat, so other schedulers can
+    tell the jobs of a crashed scheduler from running ones (see requeue_stale).
+    """
+    def __init__(self, filename):
+        self.filename = filename
+        if os.path.dirname(filename):
+            os.makedirs(os.path.dirname(filename), exist_ok=True)
+        with self._connect() as connection:
+            connection.executescript(SCHEMA)
+            # queue files created before the heartbeat column
+            if 'heartbeat' not in [row['name'] for row in connection.execute('PRAGMA table_info(jobs)')]:
+                connection.execute('ALTER TABLE jobs ADD COLUMN heartbeat REAL')
+
+    def _connect(self):
+        connection = sqlite3.connect(self.filename, timeout=30, isolation_level=None)
+        connection.row_factory = sqlite3.Row
+        return contextlib.closing(connection)
+
+    @staticmethod
+    def _to_dict(row):
+        if row is None:
+            return None
+        job = dict(row)
+        job['result'] = json.loads(job['result']) if job['result'] else None
+        return job
+
+    def submit(self, vht_in, priority=0, max_attempts=1):
+        """
+        Add a job to the queue.
+
+        Parameters
+        ----------
+        String
+            vht_in (Local path of the input archive)
+        Integer
+            priority (Higher runs first - Default: 0)
+            max_attempts (Number of runs before the job fails - Default: 1)
+
+        Return
+        ----------
+        Integer
+            Job ID
+        """
+        with self._connect() as connection:
+            cursor = connection.execute(
+                'INSERT INTO jobs (vht_in, priority, max_attempts, submitted) VALUES (?, ?, ?, ?)',
+                (vht_in, priority, max_attempts, time.time()))
+            return cursor.lastrowid
+
+    def claim(self, worker):
+        """
+        Take the next queued job and mark it running.
+
+        Parameters
+        ----------
+        String
+            worker (Worker name, stored with the job)
+
+        Return
+        ----------
+        Dict
+            Job (see get) or None if no job is queued
+        """
+        with self._connect() as connection:
+            connection.execute('BEGIN IMMEDIATE')
+            try:
+                row = connection.execute(
+                    "SELECT id FROM jobs WHERE status = 'queued' ORDER BY priority DESC, id LIMIT 1").fetchone()
+                if row is not None:
+                    now = time.time()
+                    connection.execute(
+                        "UPDATE jobs SET status = 'running', attempts = attempts + 1, worker = ?, started = ?, "
+                        "heartbeat = ?, finished = NULL WHERE id = ?", (worker, now, now, row['id']))
+                connection.execute('COMMIT')
+            except BaseException:
+                connection.execute('ROLLBACK')
+                raise
+        return None if row is None else self.get(row['id'])
+
+    def finish(self, job_id, result):
+        """
+        Store the result of a job attempt (see AWSClient.run_job).
+        A failed attempt is queued again if the job has attempts left.
+
+        Return
+        ----------
+        String
+            New job status ('success', 'failed' or 'queued')
+        """
+        success = result.get('Status') == 'Success'
+        with self._connect() as connection:
+            row = connection.execute('SELECT attempts, max_attempts FROM jobs WHERE id = ?', (job_id,)).fetchone()
+            status = 'success' if success else ('queued' if row['attempts'] < row['max_attempts'] else 'failed')
+            connection.execute(
+                'UPDATE jobs SET status = ?, finished = ?, error = ?, result = ? WHERE id = ?',
+                (status, time.time(), result.get('Error') or None, json.dumps(result), job_id))
+        return status
+
+    def heartbeat(self, job_ids):
+        """
+            Mark running jobs as alive (called periodically by the scheduler that runs them).
+        """
+        if not job_ids:
+            return
+        with self._connect() as connection:
+            connection.execute(
+                f"UPDATE jobs SET heartbeat = ? WHERE status = 'running' AND id IN ({', '.join('?' * len(job_ids))})",
+                (time.time(), *job_ids))
+
+    def requeue_stale(self, timeout):
+        """
+        Queue again the running jobs without a heartbeat for more than `timeout` seconds
+        (left by a crashed scheduler). The attempt is not counted.
+
+        Return
+        ----------
+        Integer
+            Number of re-queued jobs
+        """
+        with self._connect() as connection:
+            cursor = connection.execute(
+                "UPDATE jobs SET status = 'queued', attempts = attempts - 1 "
+                "WHERE status = 'running' AND COALESCE(heartbeat, started) < ?",
+                (time.time() - timeout,))
+            return cursor.rowcount
+
+    def cancel(self, job_id):
+        """
+        Remove a queued job. Running and finished jobs are kept.
+
+        Return
+        ----------
+        Boolean
+            True if the job was removed
+        """
+        with self._connect() as connection:
+            return connection.execute("DELETE FROM jobs WHERE id = ? AND status = 'queued'", (job_id,)).rowcount == 1
+
+    def get(self, job_id):
+        """
+        Get a job.
+
+        Return
+        ----------
+        Dict
+            'id', 'vht_in', 'priority', 'status', 'attempts', 'max_attempts', 'worker',
+            'submitted', 'started', 'heartbeat', 'finished' (epoch seconds), 'error', 'result'
+        """
+        with self._connect() as connection:
+            return self._to_dict(connection.execute('SELECT * FROM jobs WHERE id = ?', (job_id,)).fetchone())
+
+    def list(self, status=None):
+        """
+            Get the jobs (with the given status), in claim order.
+        """
+        query = 'SELECT * FROM jobs'
+        parameters = ()
+        if status is not None:
+            query += ' WHERE status = ?'
+            parameters = (status,)
+        with self._connect() as connection:
+            return [self._to_dict(row)
+                    for row in connection.execute(query + ' ORDER BY priority DESC, id', parameters)]
+
+    def get_stats(self):
+        """
+            Get the number of jobs per status.
+        """
+        stats = {'queued': 0, 'running': 0, 'success': 0, 'failed': 0}
+        with self._connect() as connection:
+            for row in connection.execute('SELECT status, COUNT(*) AS n FROM jobs GROUP BY status'):
+                stats[row['status']] = row['n']
+        return stats
+
@@ -0,0 +1,382 @@
+import copy
+import logging
+import os
+import shutil
+import subprocess
+import sys
+import time
+import uuid
+
+
+class LocalClient():
+    """
+    VHT Local Backend
+
+    This backend runs on the local machine (the simulation has to be installed):
+     * A local directory is the object storage (a key is a path below it).
+     * An "instance" is a per-run work directory, commands run there through subprocess.
+     * run() copies the input archive into the work directory, runs the VHT process
+       command and copies the output archive back: no cloud round trip at all.
+
+    The backend is configured with envs. See _setup.
+    """
+    def __init__(self):
+        self._setup()
+
+    def __repr__(self):
+        return (
+            f"gh_workspace={self.gh_workspace},"
+            f"instance_id={self.instance_id},"
+            f"local_storage_dir={self.local_storage_dir},"
+            f"local_work_dir={self.local_work_dir},"
+            f"local_process_vht={self.local_process_vht},"
+            f"vht_in_filename={self.vht_in_filename},"
+            f"vht_out_filename={self.vht_out_filename}"
+        )
+
+    def _setup(self):
+        """
+            Setup local object by collecting env vars
+        """
+        logging.info("local:setting up local backend")
+        self.vht_in_filename = 'vht.tar'
+        self.vht_out_filename = 'out.tar'
+
+        # Optional: name of a work directory below local_work_dir to reuse (Default: a new one is created by run()).
+        # A work directory the backend did not create is kept at teardown.
+        self.instance_id = os.environ.get('local_instance_id') or None
+        self.work_dir_created = False
+        self.instance_torn_down = False
+
+        # Optional: object storage and work directories
+        self.local_storage_dir = os.environ.get('local_storage_dir') or \
+            os.path.join(os.path.expanduser('~'), '.cache', 'vht', 'storage')
+        self.local_work_dir = os.environ.get('local_work_dir') or \
+            os.path.join(os.path.expanduser('~'), '.cache', 'vht', 'runs')
+
+        # Optional: VHT process command, run in the work directory that contains vht.tar.
+        # It has to write out.tar into the work directory.
+        self.local_process_vht = os.environ.get('local_process_vht') or \
+            f"python3 {os.path.join(os.path.expanduser('~'), 'vhtagent', 'process_vht.py')}"
+
+        # Optional: keep the work directory at teardown (Default: false)
+        self.local_keep_work_dir = os.environ.get('local_keep_work_dir', 'false').lower() == 'true'
+
+        # check mandatory env vars
+        if os.environ.get('gh_workspace') in (None, ''):
+            logging.error("vht_github_action:environment variable `gh_workspace` needs to be present!")
+            sys.exit(-1)
+
+        self.gh_workspace = os.environ.get('gh_workspace')
+        self.vht_in = f"{self.gh_workspace}/{self.vht_in_filename}"
+        self.vht_out = f"{self.gh_workspace}/{self.vht_out_filename}"
+
+    def get_storage_path(self, key):
+        """
+        Get the path of a storage object.
+
+        Parameters
+        ----------
+        String
+            key (Object key, '/' separated)
+
+        Return
+        ----------
+        String
+            Path below local_storage_dir
+        """
+        path = os.path.normpath(os.path.join(self.local_storage_dir, *key.split('/')))
+        if os.path.commonpath([path, os.path.normpath(self.local_storage_dir)]) != \
+                os.path.normpath(self.local_storage_dir):
+            raise ValueError(f"Key {key} is outside of the storage directory")
+        return path
+
+    def get_work_dir(self):
+        """
+            Get the work directory of the current "instance".
+            The instance ID has to be a directory name (raises ValueError otherwise).
+        """
+        assert self.instance_id not in ('', None), "instance_id should be provided!"
+        path = os.path.normpath(os.path.join(self.local_work_dir, self.instance_id))
+        if os.path.dirname(path) != os.path.normpath(self.local_work_dir):
+            raise ValueError(f"Instance ID {self.instance_id} is not a directory of the work directory")
+        return path
+
+    def upload_file_to_cloud(self, filename, key):
+        """
+        Copy a file into the storage directory.
+
+        Parameters
+        ----------
+        String
+            filename (Local Filename Path)
+            key (Object key)
+
+        This is a mandatory VHT backend method.
+        """
+        path = self.get_storage_path(key)
+        logging.info(f"local:Storing {filename} as {key}...")
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        shutil.copyfile(filename, path)
+
+    def download_file_from_cloud(self, filename, key):
+        """
+        Copy a file out of the storage directory.
+
+        Parameters
+        ----------
+        String
+            filename (Local Filename Path)
+            key (Object key)
+
+        This is a mandatory VHT backend method.
+        """
+        logging.info(f"local:Copying {key} to {filename}...")
+        shutil.copyfile(self.get_storage_path(key), filename)
+
+    def delete_file_from_cloud(self, key):
+        """
+        Delete a file of the storage directory.
+
+        Parameters
+        ----------
+        String
+            key (Object key)
+
+        This is a mandatory VHT backend method.
+        """
+        logging.info(f"local:Deleting {key}...")
+        os.remove(self.get_storage_path(key))
+
+    def create_instance(self):
+        """
+            Create a new per-run work directory (the local "instance").
+
+            This is a mandatory VHT backend method.
+        """
+        self.instance_id = f"local-{uuid.uuid4().hex}"
+        os.makedirs(self.get_work_dir())
+        self.work_dir_created = True
+        self.instance_torn_down = False
+        logging.info(f"local:Created work directory {self.get_work_dir()}")
+        return self.instance_id
+
+    def start_instance(self):
+        """
+            Make sure the work directory of instance_id exists.
+
+            This is a mandatory VHT backend method.
+        """
+        if not os.path.isdir(self.get_work_dir()):
+            os.makedirs(self.get_work_dir())
+            self.work_dir_created = True
+        self.instance_torn_down = False
+        return self.instance_id
+
+    def stop_instance(self):
+        """
+            Nothing to stop: the work directory is kept.
+
+            This is a mandatory VHT backend method.
+        """
+        logging.info(f"local:Keeping work directory {self.get_work_dir()}")
+        return self.instance_id
+
+    def terminate_instance(self):
+        """
+            Delete the work directory.
+
+            This is a mandatory VHT backend method.
+        """
+        logging.info(f"local:Deleting work directory {self.get_work_dir()}")
+        shutil.rmtree(self.get_work_dir(), ignore_errors=True)
+        return self.instance_id
+
+    def teardown(self):
+        """
+            Teardown (once): delete the work directory unless local_keep_work_dir is set
+            or the directory was not created by this backend
+        """
+        if self.instance_torn_down:
+            return
+        self.instance_torn_down = True
+        if self.local_keep_work_dir or not self.work_dir_created:
+            self.stop_instance()
+        else:
+            self.terminate_instance()
+
+    def get_instance_state(self):
+        """
+        Get the "instance" state
+
+        Return
+        ----------
+        String
+            'running' if the work directory exists, 'terminated' otherwise
+        """
+        return 'running' if os.path.isdir(self.get_work_dir()) else 'terminated'
+
+    def get_image_id(self):
+        """
+            There is no image: the simulation installed on this machine is used.
+        """
+        return None
+
+    def invalidate_image_id_cache(self, ami_version=None):
+        """
+            There is no image cache: nothing to invalidate.
+        """
+        logging.info("local:No image ID cache to invalidate")
+
+    def get_process_vht_commands(self):
+        """
+            VHT commands to be executed in the work directory.
+
+            This is a mandatory VHT backend method.
+        """
+        return [self.local_process_vht]
+
+    def send_remote_command(self, command_list, working_dir, fail_if_unsuccess = True):
+        """
+        Run a shell command through subprocess.
+
+        Parameters
+        ----------
+        String
+            command_list (Shell command)
+            working_dir (Directory where the command will be executed)
+        Boolean
+            fail_if_unsuccess (Fail the method in case the command failed)
+
+        Return
+        ------
+        Dict
+            'CommandId', 'CommandIdStatus' ('Success' or 'Failed'), 'CommandList', 'StdOut', 'StdErr'
+            (same keys as the AWS backend)
+
+        This is a mandatory VHT backend method.
+        """
+        logging.info(f"vht: command_list = {command_list}")
+        process = subprocess.run(command_list, shell=True, cwd=working_dir,
+                                 stdout=subprocess.PIPE, stderr=subprocess.PIPE, universal_newlines=True)
+        response = {
+            'CommandId': uuid.uuid4().hex,
+            'CommandIdStatus': 'Success' if process.returncode == 0 else 'Failed',
+            'CommandList': command_list,
+            'StdOut': process.stdout,
+            'StdErr': process.stderr
+        }
+
+        for i in response.keys():
+            logging.info(f"vht:{i} = {response[i].strip()}")
+        if response['CommandIdStatus'] != 'Success' and fail_if_unsuccess:
+            logging.error(f"Command {command_list} failed")
+            logging.error("Tearing down the work directory!")
+            self.teardown()
+            sys.exit(-1)
+
+        return response
+
+    def send_remote_command_batch(self, command_list, working_dir, fail_if_unsuccess = True,
+                                  single_invocation = False):
+        """
+        Run a list of shell commands through subprocess, one after the other.
+
+        Parameters
+        ----------
+        List
+            command_list (List of commands)
+        String
+            working_dir (Directory where the commands will be executed)
+        Boolean
+            fail_if_unsuccess (Fail the method in case a command failed - Default: True)
+            single_invocation (Ignored: there is no invocation overhead locally)
+
+        Return
+        ------
+            List of send_remote_command responses.
+
+        This is a mandatory VHT backend method.
+        """
+        logging.info(f"vht: command_list = {command_list}")
+        return [
+            self.send_remote_command(command_list=command, working_dir=working_dir,
+                                     fail_if_unsuccess=fail_if_unsuccess)
+            for command in command_list
+        ]
+
+    def run(self, delete_output_file_from_cloud=True):
+        """
+        Run the VHT process command in a work directory and copy the output archive
+        to vht_out. The storage directory is not used (no upload/download needed).
+        """
+        if self.instance_id in ('', None):
+            self.create_instance()
+        else:
+            self.start_instance()
+
+        try:
+            work_dir = self.get_work_dir()
+            logging.info(f"local:Copying {self.vht_in} to {work_dir}...")
+            shutil.copyfile(self.vht_in, os.path.join(work_dir, self.vht_in_filename))
+            self.send_remote_command_batch(self.get_process_vht_commands(), working_dir=work_dir)
+
+            logging.info(f"local:Copying {self.vht_out_filename} to {self.vht_out}...")
+            shutil.copyfile(os.path.join(work_dir, self.vht_out_filename), self.vht_out)
+        finally:
+            self.teardown()
+
+    def get_job_client(self, vht_in):
+        """
+        Get a copy of this client that runs one job of run_jobs in its own work directory.
+        The output archive is written next to the input as `<name>.out.tar`.
+        """
+        job_client = copy.copy(self)
+        job_client.instance_id = None
+        job_client.work_dir_created = False
+        job_client.instance_torn_down = False
+        job_client.vht_in = vht_in
+        job_client.vht_out = f"{os.path.splitext(vht_in)[0]}.{self.vht_out_filename}"
+        return job_client
+
+    def run_jobs(self, vht_in_list, max_workers=None):
+        """
+        Run several input archives one after the other (the simulation runs on this machine).
+
+        Parameters
+        ----------
+        List
+            vht_in_list (Local paths of the input archives)
+        Integer
+            max_workers (Ignored: the jobs run sequentially)
+
+        Return
+        ----------
+        List
+            Per-job status, in the order of vht_in_list: 'Job', 'Output', 'InstanceId',
+            'Status' ('Success' or 'Failed'), 'Error', 'Duration' (seconds), 'Interruptions' (always 0)
+            (same keys as the AWS backend). A failed job does not stop the others.
+        """
+        logging.info(f"local:Running {len(vht_in_list)} jobs sequentially")
+        results = []
+        for vht_in in vht_in_list:
+            job_client = self.get_job_client(vht_in)
+            start = time.monotonic()
+            status = 'Success'
+            error = ''
+            try:
+                job_client.run()
+            except (Exception, SystemExit) as e:
+                status = 'Failed'
+                error = repr(e)
+                logging.error(f"local:Job {vht_in} failed: {error}")
+            results.append({
+                'Job': job_client.vht_in,
+                'Output': job_client.vht_out,
+                'InstanceId': job_client.instance_id,
+                'Status': status,
+                'Error': error,
+                'Duration': round(time.monotonic() - start, 1),
+                'Interruptions': 0
+            })
+        return results
@@ -1,6 +1,7 @@
 import logging
 import sys
 from vht import aws
+from vht import local
 
 class VHTClient():
     def __init__(self, backend):
@@ -11,10 +12,20 @@ class VHTClient():
     def _set_backend(self):
         if self.backend_desc == "aws":
             self.backend = aws.AWSClient()
+        elif self.backend_desc == "local":
+            self.backend = local.LocalClient()
         else:
             logging.error(f"{self.backend_desc} not supported!")
             sys.exit(-1)
 
+    def _get_backend_method(self, name):
+        # optional backend methods (warm pool, fleet, job queue, ...) are not provided by every backend
+        method = getattr(self.backend, name, None)
+        if method is None:
+            logging.error(f"{name} not supported by the {self.backend_desc} backend!")
+            sys.exit(-1)
+        return method
+
     def create_instance(self):
         return self.backend.create_instance()
 
@@ -33,26 +44,64 @@ class VHTClient():
     def get_process_vht_commands(self):
         return self.backend.get_process_vht_commands()
 
+    def invalidate_image_id_cache(self, ami_version=None):
+        return self._get_backend_method('invalidate_image_id_cache')(ami_version)
+
+    def list_jobs(self, status=None):
+        return self._get_backend_method('list_jobs')(status)
+
+    def lease_instance(self):
+        return self._get_backend_method('lease_instance')()
+
+    def release_instance(self):
+        return self._get_backend_method('release_instance')()
+
     def run(self):
         return self.backend.run()
 
+    def run_jobs(self, vht_in_list, max_workers=None):
+        return self._get_backend_method('run_jobs')(vht_in_list, max_workers)
+
+    def run_queue(self, max_workers=None, wait=False):
+        return self._get_backend_method('run_queue')(max_workers, wait)
+
     def send_remote_command(self, command_list, working_dir, fail_if_unsuccess = True):
         return self.backend.send_remote_command(command_list=command_list,
                                                 working_dir=working_dir,
                                                 fail_if_unsuccess=fail_if_unsuccess)
 
-    def send_remote_command_batch(self, command_list, working_dir, fail_if_unsuccess = True):
+    def send_remote_command_batch(self, command_list, working_dir, fail_if_unsuccess = True,
+                                  single_invocation = False):
         return self.backend.send_remote_command_batch(
                                                 command_list=command_list,
                                                 working_dir=working_dir,
-                                                fail_if_unsuccess=fail_if_unsuccess)
+                                                fail_if_unsuccess=fail_if_unsuccess,
+                                                single_invocation=single_invocation)
+
+    def shrink_pool(self):
+        return self._get_backend_method('shrink_pool')()
+
+    def submit_jobs(self, vht_in_list, priority=0, max_attempts=None):
+        return self._get_backend_method('submit_jobs')(vht_in_list, priority, max_attempts)
+
+    def sync_workspace(self, local_dir=None):
+        return self._get_backend_method('sync_workspace')(local_dir)
+
+    def start_fleet(self, instance_ids, wait=True, timeout=900):
+        return self._get_backend_method('start_fleet')(instance_ids, wait, timeout)
 
     def start_instance(self):
         return self.backend.start_instance()
 
+    def stop_fleet(self, instance_ids, wait=True, timeout=900):
+        return self._get_backend_method('stop_fleet')(instance_ids, wait, timeout)
+
     def stop_instance(self):
         return self.backend.stop_instance()
 
+    def terminate_fleet(self, instance_ids, wait=True, timeout=900):
+        return self._get_backend_method('terminate_fleet')(instance_ids, wait, timeout)
+
     def terminate_instance(self):
         return self.backend.terminate_instance()
 
@@ -3,6 +3,8 @@
 import argparse
 import json
 import logging
+import os
+import sys
 from vht import vht
 
 def main():
@@ -21,6 +23,9 @@ def main():
     parser.add_argument('--get_image_id',
                         action='store_true',
                         help='Get the image id')
+    parser.add_argument('--invalidate_ami_cache',
+                        action='store_true',
+                        help='Remove the cached AMI IDs of the region')
     parser.add_argument('--get_instance_state',
                         action='store_true',
                         help='Get instance state')
@@ -30,18 +35,65 @@ def main():
     parser.add_argument('--run',
                         action='store_true',
                         help='Run VHT commands to the instance with default values')
+    parser.add_argument('--result_cache',
+                        choices=['off', 's3', 'local'],
+                        help='Result cache of --run/--run_jobs/--run_queue (`off` bypasses it). '
+                             'Default: result_cache env or `off`')
+    parser.add_argument('--force',
+                        action='store_true',
+                        help='Run even if a cached result exists and refresh the cached result')
+    parser.add_argument('--run_jobs',
+                        nargs='+',
+                        help='Run several input archives concurrently, one instance per archive')
+    parser.add_argument('--max_workers',
+                        type=int,
+                        help='Max number of concurrent jobs for --run_jobs (Default: all) '
+                             'or --run_queue (Default: instance_pool_size or 1)')
+    parser.add_argument('--submit_jobs',
+                        nargs='+',
+                        help='Add input archives to the job queue')
+    parser.add_argument('--priority',
+                        type=int,
+                        default=0,
+                        help='Priority of --submit_jobs, higher runs first. Default: 0')
+    parser.add_argument('--max_attempts',
+                        type=int,
+                        help='Runs of a --submit_jobs job before it fails. Default: job_max_attempts env or 3')
+    parser.add_argument('--run_queue',
+                        action='store_true',
+                        help='Run the queued jobs until the queue is empty')
+    parser.add_argument('--wait',
+                        action='store_true',
+                        help='With --run_queue: keep waiting for new jobs until interrupted')
+    parser.add_argument('--list_jobs',
+                        nargs='?',
+                        const='all',
+                        choices=['all', 'queued', 'running', 'success', 'failed'],
+                        help='List the jobs of the job queue (with the given status)')
     parser.add_argument('--send_remote_command',
                         nargs='*',
                         help='Send/Execute remote commands to a instance')
     parser.add_argument('--send_remote_command_batch',
                         nargs='*',
                         help='Send/Execute multiple remote commands to a instance')
+    parser.add_argument('--shrink_pool',
+                        action='store_true',
+                        help='Terminate surplus and stop idle instances of the warm instance pool')
+    parser.add_argument('--start_fleet',
+                        nargs='+',
+                        help='Start several instances and wait for them (running and status OK)')
     parser.add_argument('--start_instance',
                         action='store_true',
                         help='Start instance (if instance_id info is provided)')
+    parser.add_argument('--stop_fleet',
+                        nargs='+',
+                        help='Stop several instances and wait for them')
     parser.add_argument('--stop_instance',
                         action='store_true',
                         help='Stop instance')
+    parser.add_argument('--terminate_fleet',
+                        nargs='+',
+                        help='Terminate several instances and wait for them')
     parser.add_argument('--terminate_instance',
                         action='store_true',
                         help='Terminate instance')
@@ -57,9 +109,9 @@ def main():
                         help='Set the output verbosity DEBUG, INFO, WARNING, ERROR. Default: `INFO`')
     parser.add_argument('-b', '--backend',
                         type=str,
-                        choices=['aws'],
+                        choices=['aws', 'local'],
                         default='aws',
-                        help='Select your aws. Default: `aws`')
+                        help='Select your backend (`local`: run on this machine). Default: `aws`')
     parser.parse_args()
     args = parser.parse_args()
     if args.verbosity:
@@ -68,9 +120,18 @@ def main():
         logging.basicConfig(format='[%(levelname)s]\t%(message)s', level = verbosity)
         logging.debug("Verbosity level is set to " + verbosity)
 
+    # result cache options are read from the environment by the backend
+    if args.result_cache:
+        os.environ['result_cache'] = args.result_cache
+    if args.force:
+        os.environ['result_cache_force'] = 'true'
+
     # vht_instance using args.backend
     vht_client = vht.VHTClient(args.backend)
 
+    # first: the following operations use the AMI ID resolved again
+    if args.invalidate_ami_cache:
+        vht_client.invalidate_image_id_cache()
     if args.create_instance:
         print(vht_client.create_instance())
     if args.delete_file_from_cloud:
@@ -88,12 +149,33 @@ def main():
         print(vht_client.get_process_vht_commands())
     if args.run:
         vht_client.run()
+    if args.run_jobs:
+        results = vht_client.run_jobs(args.run_jobs, args.max_workers)
+        print(json.dumps(results, indent=2))
+        if any(result['Status'] != 'Success' for result in results):
+            sys.exit(1)
+    if args.submit_jobs:
+        print(json.dumps(vht_client.submit_jobs(args.submit_jobs, args.priority, args.max_attempts)))
+    if args.run_queue:
+        print(json.dumps(vht_client.run_queue(args.max_workers, args.wait), indent=2))
+    if args.list_jobs:
+        print(json.dumps(vht_client.list_jobs(None if args.list_jobs == 'all' else args.list_jobs), indent=2))
     if args.send_remote_command:
         # TODO
         pass
     if args.send_remote_command_batch:
         # TODO
         pass
+    if args.shrink_pool:
+        print(vht_client.shrink_pool())
+    for operation, instance_ids in (('start_fleet', args.start_fleet),
+                                    ('stop_fleet', args.stop_fleet),
+                                    ('terminate_fleet', args.terminate_fleet)):
+        if instance_ids:
+            results = getattr(vht_client, operation)(instance_ids)
+            print(json.dumps(results, indent=2))
+            if any(result['Status'] != 'Success' for result in results.values()):
+                sys.exit(1)
     if args.start_instance:
         vht_client.start_instance()
     if args.stop_instance:
@@ -0,0 +1,101 @@
+import hashlib
+import os
+
+# Directories that are never synchronized
+EXCLUDED_DIRS = ('.git', '__pycache__')
+
+# Instance side of the workspace sync (python3 on the instance, run in the cache directory):
+#   plan:  print the hashes of added/changed files (objects to download into objects/)
+#   apply: update tree/ from objects/ and delete removed files, then keep the new manifest
+REMOTE_SYNC_SCRIPT = '''\
+import json, os, shutil, sys
+def load(path):
+    return json.load(open(path))['files'] if os.path.exists(path) else {}
+new, old = load('manifest.new.json'), load('manifest.json')
+changed = [p for p, f in new.items() if old.get(p, {}).get('sha256') != f['sha256'] or not os.path.exists(os.path.join('tree', p))]
+if sys.argv[1] == 'plan':
+    print('\\n'.join(sorted({new[p]['sha256'] for p in changed})))
+    sys.exit(0)
+for p in old:
+    if p not in new and os.path.exists(os.path.join('tree', p)):
+        os.remove(os.path.join('tree', p))
+for p in changed:
+    dst = os.path.join('tree', p)
+    os.makedirs(os.path.dirname(dst) or '.', exist_ok=True)
+    shutil.copyfile(os.path.join('objects', new[p]['sha256']), dst)
+    os.chmod(dst, 0o755 if new[p].get('x') else 0o644)
+shutil.rmtree('objects')
+os.makedirs('objects')
+os.replace('manifest.new.json', 'manifest.json')
+print(f"{len(changed)} changed, {len([p for p in old if p not in new])} deleted, {len(new)} files")
+'''
+
+
+def get_file_hash(filename):
+    """
+    Get the SHA-256 hash of a local file.
+
+    Return
+    ----------
+    String
+        Hex digest
+    """
+    sha256 = hashlib.sha256()
+    with open(filename, 'rb') as f:
+        for block in iter(lambda: f.read(1024 * 1024), b''):
+            sha256.update(block)
+    return sha256.hexdigest()
+
+
+def get_manifest(local_dir):
+    """
+    Get the manifest of a local workspace.
+
+    Parameters
+    ----------
+    String
+        local_dir (Workspace directory)
+
+    Return
+    ----------
+    Dict
+        {'files': {<relative path with '/'>: {'sha256': <hex>, 'size': <bytes>, 'x': <executable>}}}
+    """
+    files = {}
+    for root, dirs, filenames in os.walk(local_dir):
+        dirs[:] = sorted(d for d in dirs if d not in EXCLUDED_DIRS)
+        for filename in sorted(filenames):
+            path = os.path.join(root, filename)
+            if not os.path.isfile(path):
+                continue
+            relpath = os.path.relpath(path, local_dir).replace(os.sep, '/')
+            files[relpath] = {
+                'sha256': get_file_hash(path),
+                'size': os.path.getsize(path),
+                'x': os.access(path, os.X_OK)
+            }
+    return {'files': files}
+
+
+def get_missing_objects(manifest, remote_manifest):
+    """
+    Get the objects of a manifest that are not referenced by the remote manifest.
+    Objects are stored by hash, so renamed or duplicated files are not uploaded again.
+
+    Parameters
+    ----------
+    Dict
+        manifest (Local manifest, see get_manifest)
+        remote_manifest (Manifest of the last sync)
+
+    Return
+    ----------
+    Dict
+        {<sha256>: <relative path of one file with this content>}
+    """
+    remote_hashes = {f['sha256'] for f in remote_manifest.get('files', {}).values()}
+    missing = {}
+    for relpath, f in manifest['files'].items():
+        if f['sha256'] not in remote_hashes:
+            missing.setdefault(f['sha256'], relpath)
+    return missing
@@ -11,11 +11,16 @@
 #More details.
 
 import logging
+import arm_vsi_config
 
 
-## Set verbosity level
-#verbosity = logging.DEBUG
-verbosity = logging.ERROR
+## Instance configuration (see arm_vsi_config.py), roles: 'idle' or 'loopback'
+Config = arm_vsi_config.getConfig('VIO', default_role='idle')
+if Config.role not in ('idle', 'loopback'):
+    raise ValueError("VIO: role '{}' not supported".format(Config.role))
+
+## Set verbosity level (configuration file, default: logging.ERROR)
+verbosity = Config.verbosity
 
 # [debugging] Verbosity settings
 level = { 10: "DEBUG",  20: "INFO",  30: "WARNING",  40: "ERROR" }
@@ -30,6 +35,9 @@ SignalIn  = 0
 # VIO Values
 Values = [0] * 64
 
+# Loop back output signals to input signals (role 'loopback')
+Loopback = (Config.role == 'loopback')
+
 
 ## Initialize
 #  @return None
@@ -55,11 +63,13 @@ def rdSignal(mask):
 #  @param signal signal value to write
 #  @return None
 def wrSignal(mask, signal):
-    global SignalOut
+    global SignalOut, SignalIn
     logging.info("Python function wrSignal() called")
 
     SignalOut &= ~mask
     SignalOut |=  mask & signal
+    if Loopback:
+        SignalIn = SignalOut
     logging.debug("Write signal: {}, mask: {}".format(signal, mask))
 
     return
@@ -10,12 +10,16 @@
 #
 #More details.
 
+import atexit
 import logging
+import arm_vsi_config
 
 
-## Set verbosity level
-#verbosity = logging.DEBUG
-verbosity = logging.ERROR
+## Instance configuration (see arm_vsi_config.py)
+Config = arm_vsi_config.getConfig('VSI0')
+
+## Set verbosity level (configuration file, default: logging.ERROR)
+verbosity = Config.verbosity
 
 # [debugging] Verbosity settings
 level = { 10: "DEBUG",  20: "INFO",  30: "WARNING",  40: "ERROR" }
@@ -48,8 +52,11 @@ DMA_Control_Direction_M2P = 1<<1
 # User registers
 Regs = [0] * 64
 
-# Data buffer
-Data = bytearray()
+# Peripheral role (only the module of the configured role is imported)
+Role = arm_vsi_config.loadRole(Config)
+
+# Release the role resources (e.g. flush the sink file) at the end of the simulation
+atexit.register(Role.close)
 
 
 ## Initialize
@@ -116,6 +123,9 @@ def wrDMA(index, value):
     logging.info("Python function wrDMA() called")
 
     if   index == 0:
+        if (DMA_Control & DMA_Control_Enable_Msk) and not (value & DMA_Control_Enable_Msk):
+            # DMA disabled: release the role resources (reopened on the next transfer)
+            Role.close()
         DMA_Control = value
         logging.debug("Write DMA_Control: {}".format(value))
 
@@ -126,12 +136,9 @@ def wrDMA(index, value):
 #  @param size size of data to read (in bytes, multiple of 4)
 #  @return data data read (bytearray)
 def rdDataDMA(size):
-    global Data
     logging.info("Python function rdDataDMA() called")
 
-    n = min(len(Data), size)
-    data = bytearray(size)
-    data[0:n] = Data[0:n]
+    data = Role.read(size)
     logging.debug("Read data ({} bytes)".format(size))
 
     return data
@@ -142,10 +149,9 @@ def rdDataDMA(size):
 #  @param size size of data to write (in bytes, multiple of 4)
 #  @return None
 def wrDataDMA(data, size):
-    global Data
     logging.info("Python function wrDataDMA() called")
 
-    Data = data
+    Role.write(data, size)
     logging.debug("Write data ({} bytes)".format(size))
 
     return
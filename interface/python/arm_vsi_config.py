@@ -0,0 +1,118 @@
+# Copyright (c) 2021-2022 Arm Limited. All rights reserved.
+
+# Virtual Streaming Interface configuration Python script
+
+##@addtogroup arm_vsi_py
+#  @{
+#
+##@package arm_vsi_config
+#Documentation for VSI/VIO peripheral configuration module.
+#
+#Reads one configuration file (JSON) that binds each peripheral instance
+#(VSI0 .. VSI7, VIO) to a role and its parameters, for example:
+#
+#    {
+#      "verbosity": "ERROR",
+#      "VSI0": { "role": "source",    "file": "input.bin", "loop": true },
+#      "VSI1": { "role": "sink",      "file": "output.bin" },
+#      "VSI2": { "role": "generator", "waveform": "sine", "frequency": 1000 },
+#      "VSI3": { "role": "idle", "verbosity": "DEBUG" }
+#    }
+#
+#The file is searched in the path given by the environment variable
+#VSI_CONFIG, then as arm_vsi_config.json in the current working directory and
+#next to this script. VSI instances that are not listed keep the default role
+#'loopback', VIO keeps 'idle'. Role modules (package arm_vsi_roles) are
+#imported only when an instance uses them, so e.g. NumPy is never loaded for
+#idle instances.
+
+import importlib
+import json
+import logging
+import os
+
+
+# Configuration file name
+CONFIG_FILE = 'arm_vsi_config.json'
+
+# Available roles (module names in package arm_vsi_roles)
+ROLES = ('idle', 'loopback', 'source', 'sink', 'generator', 'tensor')
+
+# Default role of instances not listed in the configuration file
+DEFAULT_ROLE = 'loopback'
+
+# Verbosity names
+LEVELS = { "DEBUG": logging.DEBUG, "INFO": logging.INFO, "WARNING": logging.WARNING, "ERROR": logging.ERROR }
+
+# Loaded configuration file content (cached, one file read per simulation)
+Content = None
+
+
+## Peripheral instance configuration
+class Config:
+    def __init__(self, name, role, verbosity, params):
+        self.name      = name       # instance name (e.g. VSI0, VIO)
+        self.role      = role       # role name
+        self.verbosity = verbosity  # logging level
+        self.params    = params     # role parameters (dict)
+
+    def __repr__(self):
+        return "{}: role={}, params={}".format(self.name, self.role, self.params)
+
+
+## Find configuration file
+#  @return path path of configuration file or None
+def findConfigFile():
+    paths = [
+        os.environ.get('VSI_CONFIG'),
+        os.path.join(os.getcwd(), CONFIG_FILE),
+        os.path.join(os.path.dirname(os.path.abspath(__file__)), CONFIG_FILE)
+    ]
+    for path in paths:
+        if path and os.path.isfile(path):
+            return path
+    return None
+
+
+## Load configuration file (once)
+#  @return content configuration file content (dict)
+def loadConfigFile():
+    global Content
+    if Content is None:
+        path = findConfigFile()
+        if path is None:
+            Content = {}
+        else:
+            with open(path, 'r') as f:
+                Content = json.load(f)
+    return Content
+
+
+## Get configuration of a peripheral instance
+#  @param name instance name (VSI0 .. VSI7, VIO)
+#  @param default_role role used if the instance is not configured
+#  @return config instance configuration (Config)
+def getConfig(name, default_role=DEFAULT_ROLE):
+    content = loadConfigFile()
+    params = dict(content.get(name, {}))
+    role = params.pop('role', default_role)
+    verbosity = params.pop('verbosity', content.get('verbosity', 'ERROR'))
+
+    if role not in ROLES:
+        raise ValueError("{}: unknown role '{}', expected one of {}".format(name, role, ROLES))
+    if verbosity not in LEVELS:
+        raise ValueError("{}: unknown verbosity '{}'".format(name, verbosity))
+
+    return Config(name, role, LEVELS[verbosity], params)
+
+
+## Create role object of a peripheral instance (imports the role module on demand)
+#  @param config instance configuration (Config)
+#  @return role role object
+def loadRole(config):
+    module = importlib.import_module('arm_vsi_roles.' + config.role)
+    logging.info("{}: role {}".format(config.name, config.role))
+    return module.Role(config.params)
+
+
+## @}
@@ -0,0 +1,8 @@
+# Copyright (c) 2021-2022 Arm Limited. All rights reserved.
+
+# Virtual Streaming Interface peripheral roles
+#
+# Each module implements one role (see arm_vsi_config.py) as class Role:
+#   read(size)        - data read by DMA P2M transfer (bytearray of size bytes)
+#   write(data, size) - data written by DMA M2P transfer
+#   close()           - release resources
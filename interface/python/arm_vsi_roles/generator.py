@@ -0,0 +1,84 @@
+# Copyright (c) 2021-2022 Arm Limited. All rights reserved.
+
+# Virtual Streaming Interface role: signal generator
+
+##@addtogroup arm_vsi_py
+#  @{
+#
+##@package arm_vsi_roles.generator
+#Generator role: reads return a continuous synthetic signal.
+#
+#Parameters:
+# - waveform: 'sine', 'square', 'sawtooth' or 'counter' (default: 'sine')
+# - frequency: signal frequency in Hz (default: 1000)
+# - sample_rate: samples per second (default: 16000)
+# - sample_bits: 8, 16 or 32 bits signed samples (default: 16)
+# - channels: number of interleaved channels (default: 1)
+# - amplitude: amplitude relative to full scale, 0.0 .. 1.0 (default: 0.5)
+
+import numpy as np
+
+
+# Sample data type for sample bits
+DTYPES = { 8: np.int8, 16: np.int16, 32: np.int32 }
+
+
+## Signal generator role
+class Role:
+    def __init__(self, params):
+        self.waveform    = params.get('waveform', 'sine')
+        self.frequency   = params.get('frequency', 1000)
+        self.sample_rate = params.get('sample_rate', 16000)
+        self.channels    = params.get('channels', 1)
+        self.amplitude   = params.get('amplitude', 0.5)
+        sample_bits      = params.get('sample_bits', 16)
+        if sample_bits not in DTYPES:
+            raise ValueError("generator: unsupported sample_bits {} (8, 16 or 32)".format(sample_bits))
+        self.dtype       = np.dtype(DTYPES[sample_bits])
+        self.index       = 0    # index of the next sample (keeps the phase across reads)
+        if self.waveform not in ('sine', 'square', 'sawtooth', 'counter'):
+            raise ValueError("generator: unknown waveform '{}'".format(self.waveform))
+
+    ## Generate samples
+    #  @param n number of samples per channel
+    #  @return samples samples as float in range -1.0 .. 1.0 (or integer counter)
+    def generate(self, n):
+        t = np.arange(self.index, self.index + n)
+        self.index += n
+        if self.waveform == 'counter':
+            return t
+        phase = (t * self.frequency / self.sample_rate) % 1.0
+        if self.waveform == 'sine':
+            return np.sin(2 * np.pi * phase)
+        if self.waveform == 'square':
+            return np.where(phase < 0.5, 1.0, -1.0)
+        return 2.0 * phase - 1.0
+
+    ## Read data (DMA P2M)
+    #  @param size size of data to read (in bytes)
+    #  @return data generated samples (bytearray)
+    def read(self, size):
+        frame_size = self.channels * self.dtype.itemsize
+        samples = self.generate(size // frame_size)
+        if self.waveform == 'counter':
+            samples = samples.astype(self.dtype)
+        else:
+            scale = self.amplitude * np.iinfo(self.dtype).max
+            samples = np.round(samples * scale).astype(self.dtype)
+        frames = np.repeat(samples, self.channels)
+        data = bytearray(size)
+        data[0:frames.nbytes] = frames.tobytes()
+        return data
+
+    ## Write data (DMA M2P)
+    #  @param data data to write (bytearray)
+    #  @param size size of data to write (in bytes)
+    def write(self, data, size):
+        return
+
+    ## Release resources
+    def close(self):
+        return
+
+
+## @}
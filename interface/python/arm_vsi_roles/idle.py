@@ -0,0 +1,34 @@
+# Copyright (c) 2021-2022 Arm Limited. All rights reserved.
+
+# Virtual Streaming Interface role: idle
+
+##@addtogroup arm_vsi_py
+#  @{
+#
+##@package arm_vsi_roles.idle
+#Idle role: reads return zeros, writes are discarded.
+
+
+## Idle role
+class Role:
+    def __init__(self, params):
+        self.params = params
+
+    ## Read data (DMA P2M)
+    #  @param size size of data to read (in bytes)
+    #  @return data zero filled data (bytearray)
+    def read(self, size):
+        return bytearray(size)
+
+    ## Write data (DMA M2P)
+    #  @param data data to write (bytearray)
+    #  @param size size of data to write (in bytes)
+    def write(self, data, size):
+        return
+
+    ## Release resources
+    def close(self):
+        return
+
+
+## @}
@@ -0,0 +1,38 @@
+# Copyright (c) 2021-2022 Arm Limited. All rights reserved.
+
+# Virtual Streaming Interface role: loopback
+
+##@addtogroup arm_vsi_py
+#  @{
+#
+##@package arm_vsi_roles.loopback
+#Loopback role: reads return the data of the last write (zero padded).
+
+
+## Loopback role
+class Role:
+    def __init__(self, params):
+        self.params = params
+        self.data   = bytearray()
+
+    ## Read data (DMA P2M)
+    #  @param size size of data to read (in bytes)
+    #  @return data last written data (bytearray)
+    def read(self, size):
+        n = min(len(self.data), size)
+        data = bytearray(size)
+        data[0:n] = self.data[0:n]
+        return data
+
+    ## Write data (DMA M2P)
+    #  @param data data to write (bytearray)
+    #  @param size size of data to write (in bytes)
+    def write(self, data, size):
+        self.data = data
+
+    ## Release resources
+    def close(self):
+        return
+
+
+## @}
@@ -0,0 +1,50 @@
+# Copyright (c) 2021-2022 Arm Limited. All rights reserved.
+
+# Virtual Streaming Interface role: sink file
+
+##@addtogroup arm_vsi_py
+#  @{
+#
+##@package arm_vsi_roles.sink
+#Sink role: writes are appended to a binary file.
+#
+#The file is truncated on the first write; after close() (DMA disabled) the
+#next write appends to it.
+#
+#Parameters:
+# - file: name of the file to write (mandatory)
+
+import logging
+
+
+## Sink file role
+class Role:
+    def __init__(self, params):
+        self.name = params['file']
+        self.file = None
+        self.mode = 'wb'
+
+    ## Read data (DMA P2M)
+    #  @param size size of data to read (in bytes)
+    #  @return data zero filled data (bytearray)
+    def read(self, size):
+        return bytearray(size)
+
+    ## Write data (DMA M2P)
+    #  @param data data to write (bytearray)
+    #  @param size size of data to write (in bytes)
+    def write(self, data, size):
+        if self.file is None:
+            logging.info("Open sink file: {}".format(self.name))
+            self.file = open(self.name, self.mode)
+            self.mode = 'ab'
+        self.file.write(data[:size])
+
+    ## Release resources
+    def close(self):
+        if self.file is not None:
+            self.file.close()
+            self.file = None
+
+
+## @}
@@ -0,0 +1,60 @@
+# Copyright (c) 2021-2022 Arm Limited. All rights reserved.
+
+# Virtual Streaming Interface role: source file
+
+##@addtogroup arm_vsi_py
+#  @{
+#
+##@package arm_vsi_roles.source
+#Source role: reads return consecutive blocks of a binary file.
+#
+#After close() (DMA disabled) the next read continues at the same file position.
+#
+#Parameters:
+# - file: name of the file to read (mandatory)
+# - loop: restart at the beginning of the file when the end is reached (default: false)
+
+import logging
+
+
+## Source file role
+class Role:
+    def __init__(self, params):
+        self.name = params['file']
+        self.loop = params.get('loop', False)
+        self.file = None
+        self.position = 0
+
+    ## Read data (DMA P2M)
+    #  @param size size of data to read (in bytes)
+    #  @return data next block of the file, zero padded at the end of the file (bytearray)
+    def read(self, size):
+        if self.file is None:
+            logging.info("Open source file: {}".format(self.name))
+            self.file = open(self.name, 'rb')
+            self.file.seek(self.position)
+        data = bytearray(size)
+        n = self.file.readinto(data)
+        while n < size and self.loop:
+            self.file.seek(0)
+            m = self.file.readinto(memoryview(data)[n:])
+            if m == 0:
+                break
+            n += m
+        return data
+
+    ## Write data (DMA M2P)
+    #  @param data data to write (bytearray)
+    #  @param size size of data to write (in bytes)
+    def write(self, data, size):
+        return
+
+    ## Release resources
+    def close(self):
+        if self.file is not None:
+            self.position = self.file.tell()
+            self.file.close()
+            self.file = None
+
+
+## @}
@@ -0,0 +1,131 @@
+# Copyright (c) 2021-2022 Arm Limited. All rights reserved.
+
+# Virtual Streaming Interface role: tensor source
+
+##@addtogroup arm_vsi_py
+#  @{
+#
+##@package arm_vsi_roles.tensor
+#Tensor role: reads return consecutive records of a memory-mapped .npy or raw tensor file.
+#
+#The file is mapped once, records are sliced from the mapping, so datasets larger
+#than RAM are streamed without per-sample file opens. Conversion to the target
+#data type, layout and int8 quantization are vectorized with NumPy.
+#
+#Parameters:
+# - file: name of the .npy or raw file (mandatory)
+# - dtype: element data type of a raw file (e.g. 'float32', mandatory for raw files)
+# - shape: record shape of a raw file (e.g. [96, 96, 3], mandatory for raw files)
+# - offset: header size of a raw file in bytes (default: 0)
+# - transpose: axes order applied to each record, e.g. [2, 0, 1] for HWC to CHW (default: none)
+# - output_dtype: data type of the returned elements (default: element data type)
+# - quantize: { "scale": s, "zero_point": z } quantize to int8 as round(x / s) + z (default: none)
+# - loop: restart at the first record after the last one (default: false)
+#
+#A record larger than the DMA block is returned over consecutive reads,
+#a new record always starts at the beginning of a block (zero padded).
+
+import logging
+import numpy as np
+
+
+## Tensor source role
+class Role:
+    def __init__(self, params):
+        self.name         = params['file']
+        self.dtype        = params.get('dtype')
+        self.shape        = params.get('shape')
+        self.offset       = params.get('offset', 0)
+        self.transpose    = params.get('transpose')
+        self.output_dtype = params.get('output_dtype')
+        self.quantize     = params.get('quantize')
+        self.loop         = params.get('loop', False)
+        self.tensor       = None    # memory-mapped records (first axis = record index)
+        self.index        = 0       # index of the next record
+        self.pending      = None    # remaining bytes of the current record (memoryview)
+        if not self.name.endswith('.npy'):
+            if self.dtype is None or self.shape is None:
+                raise ValueError("tensor: 'dtype' and 'shape' are mandatory for raw file '{}'".format(self.name))
+            try:
+                self.dtype = np.dtype(self.dtype)
+            except TypeError:
+                raise ValueError("tensor: unknown dtype '{}'".format(self.dtype))
+        if self.quantize is not None:
+            self.scale      = np.float32(self.quantize['scale'])
+            self.zero_point = np.int32(self.quantize.get('zero_point', 0))
+
+    ## Memory-map the tensor file
+    def open(self):
+        logging.info("Map tensor file: {}".format(self.name))
+        if self.name.endswith('.npy'):
+            self.tensor = np.load(self.name, mmap_mode='r')
+            if self.shape is not None and self.tensor.shape[1:] != tuple(self.shape):
+                logging.error("Tensor file {}: record shape {} does not match shape {}".format(
+                              self.name, self.tensor.shape[1:], tuple(self.shape)))
+        else:
+            record_shape = tuple(self.shape)
+            record_size  = int(np.prod(record_shape))
+            self.tensor = np.memmap(self.name, dtype=self.dtype, mode='r', offset=self.offset)
+            records = self.tensor.size // record_size
+            if records == 0 or self.tensor.size % record_size != 0:
+                logging.error("Tensor file {}: {} elements of {} are not a multiple of the record shape {}"
+                              " ({} elements), {} trailing elements ignored".format(
+                              self.name, self.tensor.size, self.dtype, record_shape, record_size,
+                              self.tensor.size - records * record_size))
+            self.tensor = self.tensor[:records * record_size].reshape((records,) + record_shape)
+        logging.info("  Records: {}, record shape: {}, dtype: {}".format(
+            self.tensor.shape[0], self.tensor.shape[1:], self.tensor.dtype))
+
+    ## Convert a record to the target data type and layout
+    #  @param record record (numpy array view into the mapping)
+    #  @return data converted record (bytes-like)
+    def convert(self, record):
+        if self.transpose is not None:
+            record = record.transpose(self.transpose)
+        if self.quantize is not None:
+            q = np.rint(record / self.scale).astype(np.int32) + self.zero_point
+            record = np.clip(q, -128, 127).astype(np.int8)
+        elif self.output_dtype is not None:
+            record = record.astype(self.output_dtype)
+        return memoryview(np.ascontiguousarray(record)).cast('B')
+
+    ## Get the next record
+    #  @return data next converted record (memoryview) or None at the end of the tensor
+    def next(self):
+        if self.tensor is None:
+            self.open()
+        if self.index >= self.tensor.shape[0]:
+            if not self.loop or self.tensor.shape[0] == 0:
+                return None
+            self.index = 0
+        record = self.tensor[self.index]
+        self.index += 1
+        return self.convert(record)
+
+    ## Read data (DMA P2M)
+    #  @param size size of data to read (in bytes)
+    #  @return data next record or the next part of the current record, zero padded (bytearray)
+    def read(self, size):
+        data = bytearray(size)
+        if not self.pending:
+            self.pending = self.next()
+            if self.pending is None:
+                return data
+        n = min(size, len(self.pending))
+        data[0:n] = self.pending[0:n]
+        self.pending = self.pending[n:]
+        return data
+
+    ## Write data (DMA M2P)
+    #  @param data data to write (bytearray)
+    #  @param size size of data to write (in bytes)
+    def write(self, data, size):
+        return
+
+    ## Release resources
+    def close(self):
+        self.pending = None
+        self.tensor  = None
+
+
+## @}
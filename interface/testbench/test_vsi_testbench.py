@@ -0,0 +1,250 @@
+import json
+import os
+import shutil
+import tempfile
+import unittest
+import wave
+
+import numpy as np
+import vsi_benchmark
+import vsi_testbench as tb
+
+INTERFACE_DIR = os.path.normpath(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+VSI_SCRIPT = os.path.join(INTERFACE_DIR, 'python', 'arm_vsi{}.py')
+VIO_SCRIPT = os.path.join(INTERFACE_DIR, 'python', 'arm_vio.py')
+AUDIO_SCRIPT = os.path.join(INTERFACE_DIR, 'audio', 'python', 'arm_vsi{}.py')
+
+
+class TestVsiTestbench(unittest.TestCase):
+    """
+        VSI/VIO peripheral scripts driven by the offline test bench
+    """
+    def setUp(self):
+        self.cwd = os.getcwd()
+        self.tmp = tempfile.mkdtemp()
+        os.chdir(self.tmp)
+        tb.configure(None)
+
+    def tearDown(self):
+        os.chdir(self.cwd)
+        shutil.rmtree(self.tmp)
+        tb.configure(None)
+
+    def write_config(self, content):
+        path = os.path.join(self.tmp, 'arm_vsi_config.json')
+        with open(path, 'w') as f:
+            json.dump(content, f)
+        tb.configure(path)
+
+    def test_registers(self):
+        bench = tb.Testbench()
+        vsi = bench.loadVSI(VSI_SCRIPT.format(2))
+
+        vsi.write(tb.REGS + 5 * 4, 0x12345678)
+        assert vsi.read(tb.REGS + 5 * 4) == 0x12345678
+        vsi.write(tb.IRQ_SET, 1)
+        assert vsi.read(tb.IRQ_STATUS) == 1
+        vsi.write(tb.IRQ_CLEAR, 1)
+        assert vsi.read(tb.IRQ_STATUS) == 0
+
+    def test_loopback_dma(self):
+        bench = tb.Testbench()
+        irqs = []
+        vsi = bench.loadVSI(VSI_SCRIPT.format(0), irq_handler=lambda: irqs.append(bench.time))
+        src = bench.alloc(64)
+        dst = bench.alloc(64)
+        bench.memory(src, 64)[:] = bytes(range(64))
+
+        vsi.write(tb.IRQ_ENABLE, 1)
+        vsi.write(tb.DMA_ADDRESS, src)
+        vsi.write(tb.DMA_BLOCK_NUM, 1)
+        vsi.write(tb.DMA_BLOCK_SIZE, 64)
+        vsi.write(tb.DMA_CONTROL, tb.DMA_DIRECTION_M2P | tb.DMA_ENABLE_MSK)
+        vsi.write(tb.TIMER_INTERVAL, 100)
+        vsi.write(tb.TIMER_CONTROL, tb.TIMER_TRIG_DMA_MSK | tb.TIMER_TRIG_IRQ_MSK | tb.TIMER_RUN_MSK)
+        bench.run(1000)
+        assert irqs == [100], f"Found {irqs}. Expected [100]"
+
+        vsi.write(tb.TIMER_CONTROL, 0)
+        vsi.write(tb.DMA_CONTROL, 0)
+        vsi.write(tb.DMA_ADDRESS, dst)
+        vsi.write(tb.DMA_CONTROL, tb.DMA_DIRECTION_P2M | tb.DMA_ENABLE_MSK)
+        vsi.write(tb.TIMER_CONTROL, tb.TIMER_TRIG_DMA_MSK | tb.TIMER_RUN_MSK)
+        bench.run(100)
+        assert bytes(bench.memory(dst, 64)) == bytes(range(64))
+
+    def test_config_roles(self):
+        self.write_config({
+            'VSI3': {'role': 'generator', 'waveform': 'counter', 'sample_bits': 8},
+            'VSI4': {'role': 'idle'},
+            'VIO': {'role': 'loopback'}
+        })
+        bench = tb.Testbench()
+        vsi = bench.loadVSI(VSI_SCRIPT.format(3))
+        buf = bench.alloc(32)
+        vsi.write(tb.DMA_ADDRESS, buf)
+        vsi.write(tb.DMA_BLOCK_NUM, 2)
+        vsi.write(tb.DMA_BLOCK_SIZE, 16)
+        vsi.write(tb.DMA_CONTROL, tb.DMA_DIRECTION_P2M | tb.DMA_ENABLE_MSK)
+        vsi.write(tb.TIMER_INTERVAL, 10)
+        vsi.write(tb.TIMER_CONTROL, tb.TIMER_TRIG_DMA_MSK | tb.TIMER_PERIODIC_MSK | tb.TIMER_RUN_MSK)
+        bench.run(20)
+        assert bytes(bench.memory(buf, 32)) == bytes(range(32))
+        assert vsi.read(tb.TIMER_COUNT) == 2
+
+        idle = bench.loadVSI(VSI_SCRIPT.format(4))
+        assert idle.script.rdDataDMA(8) == bytearray(8)
+
+        vio = bench.loadVIO(VIO_SCRIPT)
+        vio.wrSignal(0x3, 0x1)
+        assert vio.rdSignal(0xFF) == 0x1
+
+        # invalid generator parameters
+        for params in ({'sample_bits': 24}, {'waveform': 'noise'}):
+            self.write_config({'VSI3': dict(params, role='generator')})
+            with self.assertRaises(ValueError):
+                tb.Testbench().loadVSI(VSI_SCRIPT.format(3))
+
+    def test_source_role(self):
+        with open('input.bin', 'wb') as f:
+            f.write(bytes(range(48)))
+        self.write_config({'VSI5': {'role': 'source', 'file': 'input.bin', 'loop': True}})
+        bench = tb.Testbench()
+        vsi = bench.loadVSI(VSI_SCRIPT.format(5))
+        buf = bench.alloc(32)
+        vsi.write(tb.DMA_ADDRESS, buf)
+        vsi.write(tb.DMA_BLOCK_NUM, 2)
+        vsi.write(tb.DMA_BLOCK_SIZE, 16)
+        vsi.write(tb.DMA_CONTROL, tb.DMA_DIRECTION_P2M | tb.DMA_ENABLE_MSK)
+        vsi.write(tb.TIMER_INTERVAL, 10)
+        vsi.write(tb.TIMER_CONTROL, tb.TIMER_TRIG_DMA_MSK | tb.TIMER_PERIODIC_MSK | tb.TIMER_RUN_MSK)
+        bench.run(20)
+        assert bytes(bench.memory(buf, 32)) == bytes(range(32))
+
+        # DMA disabled: the file is closed, the next transfer continues and loops
+        vsi.write(tb.DMA_CONTROL, 0)
+        assert vsi.script.Role.file is None
+        vsi.write(tb.DMA_CONTROL, tb.DMA_DIRECTION_P2M | tb.DMA_ENABLE_MSK)
+        bench.run(20)
+        assert bytes(bench.memory(buf, 32)) == bytes(range(32, 48)) + bytes(range(16))
+        vsi.write(tb.TIMER_CONTROL, 0)
+        vsi.write(tb.DMA_CONTROL, 0)
+
+    def test_sink_role(self):
+        self.write_config({'VSI6': {'role': 'sink', 'file': 'output.bin'}})
+        bench = tb.Testbench()
+        vsi = bench.loadVSI(VSI_SCRIPT.format(6))
+        buf = bench.alloc(32)
+        bench.memory(buf, 32)[:] = bytes(range(32))
+        vsi.write(tb.DMA_ADDRESS, buf)
+        vsi.write(tb.DMA_BLOCK_NUM, 2)
+        vsi.write(tb.DMA_BLOCK_SIZE, 16)
+        vsi.write(tb.DMA_CONTROL, tb.DMA_DIRECTION_M2P | tb.DMA_ENABLE_MSK)
+        vsi.write(tb.TIMER_INTERVAL, 10)
+        vsi.write(tb.TIMER_CONTROL, tb.TIMER_TRIG_DMA_MSK | tb.TIMER_PERIODIC_MSK | tb.TIMER_RUN_MSK)
+        bench.run(20)
+
+        # DMA disabled: the file is closed (complete on disk)
+        vsi.write(tb.DMA_CONTROL, 0)
+        with open('output.bin', 'rb') as f:
+            assert f.read() == bytes(range(32))
+
+        # enabled again: appended to the file
+        vsi.write(tb.DMA_CONTROL, tb.DMA_DIRECTION_M2P | tb.DMA_ENABLE_MSK)
+        bench.run(10)
+        vsi.write(tb.TIMER_CONTROL, 0)
+        vsi.write(tb.DMA_CONTROL, 0)
+        with open('output.bin', 'rb') as f:
+            assert f.read() == bytes(range(32)) + bytes(range(16))
+
+    def test_tensor_role(self):
+        # 3 records HWC 2x2x3, streamed as quantized CHW int8 records (12 bytes)
+        tensor = np.arange(36, dtype=np.float32).reshape(3, 2, 2, 3) - 10.0
+        tensor.tofile('tensor.bin')
+        self.write_config({'VSI7': {
+            'role': 'tensor', 'file': 'tensor.bin', 'dtype': 'float32', 'shape': [2, 2, 3],
+            'transpose': [2, 0, 1], 'quantize': {'scale': 0.5, 'zero_point': 1}, 'loop': True
+        }})
+        bench = tb.Testbench()
+        vsi = bench.loadVSI(VSI_SCRIPT.format(7))
+        buf = bench.alloc(16)
+        vsi.write(tb.DMA_ADDRESS, buf)
+        vsi.write(tb.DMA_BLOCK_NUM, 1)
+        vsi.write(tb.DMA_BLOCK_SIZE, 16)
+        vsi.write(tb.DMA_CONTROL, tb.DMA_DIRECTION_P2M | tb.DMA_ENABLE_MSK)
+        vsi.write(tb.TIMER_INTERVAL, 10)
+        vsi.write(tb.TIMER_CONTROL, tb.TIMER_TRIG_DMA_MSK | tb.TIMER_PERIODIC_MSK | tb.TIMER_RUN_MSK)
+
+        # one record per block (zero padded), the 4th block loops to the first record
+        for index in (0, 1, 2, 0):
+            bench.run(10)
+            expected = np.clip(np.rint(tensor[index].transpose(2, 0, 1) / 0.5) + 1, -128, 127).astype(np.int8)
+            assert bytes(bench.memory(buf, 16)) == expected.tobytes() + bytes(4), f"Record {index}"
+        vsi.write(tb.TIMER_CONTROL, 0)
+        vsi.write(tb.DMA_CONTROL, 0)
+
+        # raw file: dtype and shape are mandatory
+        self.write_config({'VSI7': {'role': 'tensor', 'file': 'tensor.bin', 'shape': [2, 2, 3]}})
+        with self.assertRaises(ValueError):
+            tb.Testbench().loadVSI(VSI_SCRIPT.format(7))
+
+        # shape that does not match the file size: error logged, trailing elements ignored
+        self.write_config({'VSI7': {'role': 'tensor', 'file': 'tensor.bin', 'dtype': 'float32', 'shape': [5, 5]}})
+        vsi = tb.Testbench().loadVSI(VSI_SCRIPT.format(7))
+        with self.assertLogs(level='ERROR'):
+            assert bytes(vsi.script.rdDataDMA(100)) == tensor.reshape(-1)[:25].tobytes()
+
+    def test_audio_input(self):
+        frames = bytes(range(256)) * 8
+        with wave.open('test.wav', 'wb') as f:
+            f.setnchannels(1)
+            f.setsampwidth(2)
+            f.setframerate(16000)
+            f.writeframes(frames)
+
+        bench = tb.Testbench()
+        events = []
+        drv = tb.AudioDriver(bench.loadVSI(AUDIO_SCRIPT.format(0)), bench.loadVSI(AUDIO_SCRIPT.format(1)))
+        buf = bench.alloc(4 * 256)
+        assert drv.initialize(events.append) == tb.AUDIO_DRV_OK
+        assert drv.configure(tb.AUDIO_DRV_INTERFACE_RX, 1, 16, 16000) == tb.AUDIO_DRV_OK
+        assert drv.setBuf(tb.AUDIO_DRV_INTERFACE_RX, buf, 4, 256) == tb.AUDIO_DRV_OK
+        assert drv.control(tb.AUDIO_DRV_CONTROL_RX_ENABLE) == tb.AUDIO_DRV_OK
+
+        # 128 samples per block at 16 kHz: 8 ms per block
+        bench.run(4 * 8000)
+        assert drv.getRxCount() == 4
+        assert events == [tb.AUDIO_DRV_EVENT_RX_DATA] * 4
+        assert bytes(bench.memory(buf, 4 * 256)) == frames[:4 * 256]
+        drv.control(tb.AUDIO_DRV_CONTROL_RX_DISABLE)
+        drv.uninitialize()
+
+    def test_audio_output(self):
+        bench = tb.Testbench()
+        drv = tb.AudioDriver(bench.loadVSI(AUDIO_SCRIPT.format(0)), bench.loadVSI(AUDIO_SCRIPT.format(1)))
+        buf = bench.alloc(2 * 128)
+        bench.memory(buf, 2 * 128)[:] = bytes(range(128)) * 2
+        drv.initialize(None)
+        drv.configure(tb.AUDIO_DRV_INTERFACE_TX, 2, 16, 8000)
+        drv.setBuf(tb.AUDIO_DRV_INTERFACE_TX, buf, 2, 128)
+        drv.control(tb.AUDIO_DRV_CONTROL_TX_ENABLE)
+
+        # 32 frames per block at 8 kHz: 4 ms per block
+        bench.run(4 * 4000)
+        drv.control(tb.AUDIO_DRV_CONTROL_TX_DISABLE)
+        assert drv.getTxCount() == 4
+        with wave.open('test.wav', 'rb') as f:
+            assert f.getnchannels() == 2
+            assert f.readframes(1000) == (bytes(range(128)) * 2) * 2
+
+    def test_benchmark_compare(self):
+        baseline = vsi_benchmark.runBenchmarks('vio.')
+        assert sorted(baseline['results']) == ['vio.rdSignal', 'vio.rdValue', 'vio.wrSignal', 'vio.wrValue']
+        assert vsi_benchmark.compare(baseline, baseline, 0.25) == []
+
+        slower = {'results': {k: dict(v, ns_per_call=v['ns_per_call'] * 2) for k, v in baseline['results'].items()}}
+        assert vsi_benchmark.compare(slower, baseline, 0.25) == list(baseline['results'])
+
+
+if __name__ == '__main__':
+    unittest.main()
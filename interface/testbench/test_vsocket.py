@@ -0,0 +1,195 @@
+import os
+import sys
+import unittest
+
+INTERFACE_DIR = os.path.normpath(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+sys.path.insert(0, os.path.join(INTERFACE_DIR, 'vsocket', 'python'))
+
+import arm_vsocket as vsocket
+
+IP = bytes([127, 0, 0, 1])
+
+
+class TestVsocket(unittest.TestCase):
+    """
+        VSocket emulated network (arm_vsocket.py)
+    """
+    def setUp(self):
+        vsocket.configure(latency=0, bandwidth=0, loss=0.0, seed=0, rto=200000, retries=8,
+                          buffer_size=262144, poll_interval=0)
+        vsocket.reset()
+
+    def tearDown(self):
+        self.setUp()
+
+    def create(self, type=vsocket.IOT_SOCKET_SOCK_STREAM):
+        protocol = vsocket.IOT_SOCKET_IPPROTO_TCP if type == vsocket.IOT_SOCKET_SOCK_STREAM else \
+            vsocket.IOT_SOCKET_IPPROTO_UDP
+        return vsocket.socketCreate(vsocket.IOT_SOCKET_AF_INET, type, protocol)
+
+    def listen(self, port=5000):
+        listener = self.create()
+        assert vsocket.socketBind(listener, IP, port) == 0
+        assert vsocket.socketListen(listener, 1) == 0
+        return listener
+
+    def open_pair(self):
+        listener = self.listen()
+        client = self.create()
+        assert vsocket.socketConnect(client, IP, 5000) == 0
+        server, ip, port = vsocket.socketAccept(listener)
+        assert server >= 0 and ip == IP and port == vsocket.EPHEMERAL_PORT
+        return (client, server)
+
+    def test_stream(self):
+        client, server = self.open_pair()
+        assert vsocket.socketSend(client, b'hello') == 5
+        assert vsocket.socketRecv(server, 16) == (5, b'hello')
+        assert vsocket.socketRecv(server, 16) == (vsocket.IOT_SOCKET_EAGAIN, b'')
+
+        buf = bytearray(4)
+        assert vsocket.socketSend(server, b'world!') == 6
+        assert vsocket.socketRecvInto(client, buf) == 4 and buf == b'worl'
+        assert vsocket.socketRecvFrom(client, 16) == (2, b'd!', IP, 5000)
+
+        assert vsocket.socketGetSockName(client) == (0, IP, vsocket.EPHEMERAL_PORT)
+        assert vsocket.socketGetPeerName(client) == (0, IP, 5000)
+
+        # the peer sees the close after the data in flight
+        vsocket.socketSend(client, b'bye')
+        assert vsocket.socketClose(client) == 0
+        assert vsocket.socketRecv(server, 16) == (3, b'bye')
+        assert vsocket.socketRecv(server, 16) == (vsocket.IOT_SOCKET_ECONNRESET, b'')
+        assert vsocket.socketSend(client, b'x') == vsocket.IOT_SOCKET_ESOCK
+
+    def test_connect_errors(self):
+        client = self.create()
+        assert vsocket.socketConnect(client, IP, 5000) == vsocket.IOT_SOCKET_ECONNREFUSED
+        self.listen()
+        other = self.create()
+        assert vsocket.socketBind(other, IP, 5000) == vsocket.IOT_SOCKET_EADDRINUSE
+        assert vsocket.socketRecv(client, 4) == (vsocket.IOT_SOCKET_ENOTCONN, b'')
+        assert vsocket.socketCreate(vsocket.IOT_SOCKET_AF_INET, 5, 0) == vsocket.IOT_SOCKET_EINVAL
+
+        assert vsocket.socketGetHostByName('localhost', vsocket.IOT_SOCKET_AF_INET) == (0, IP)
+        assert vsocket.socketGetHostByName('example.com', vsocket.IOT_SOCKET_AF_INET) == \
+            (vsocket.IOT_SOCKET_EHOSTNOTFOUND, None)
+
+    def test_latency_and_bandwidth(self):
+        vsocket.configure(latency=1000, bandwidth=1000000)
+        listener = self.listen()
+        client = self.create()
+
+        # the handshake takes one round trip
+        assert vsocket.socketConnect(client, IP, 5000) == vsocket.IOT_SOCKET_EINPROGRESS
+        assert vsocket.socketConnect(client, IP, 5000) == vsocket.IOT_SOCKET_EALREADY
+        vsocket.advanceTime(1000)
+        server, _, _ = vsocket.socketAccept(listener)
+        vsocket.advanceTime(1000)
+        assert vsocket.socketConnect(client, IP, 5000) == vsocket.IOT_SOCKET_EISCONN
+
+        # 1000 bytes at 1 MB/s: 1000 us on the link + 1000 us latency
+        assert vsocket.socketSend(client, bytes(1000)) == 1000
+        vsocket.advanceTime(1999)
+        assert vsocket.socketRecv(server, 1000)[0] == vsocket.IOT_SOCKET_EAGAIN
+        vsocket.advanceTime(1)
+        assert vsocket.socketRecv(server, 1000)[0] == 1000
+
+    def test_poll_interval(self):
+        vsocket.configure(latency=25000, poll_interval=10000)
+        listener = self.listen()
+        client = self.create()
+        vsocket.socketConnect(client, IP, 5000)
+
+        # each EAGAIN advances simulated time, as the osDelay polling of iot_socket.c
+        polls = 0
+        while True:
+            server, _, _ = vsocket.socketAccept(listener)
+            if server >= 0:
+                break
+            polls += 1
+        assert polls == 3 and vsocket.getTime() == 30000
+
+    def test_blocking_connect(self):
+        vsocket.configure(latency=25000, poll_interval=10000)
+        self.listen()
+        client = self.create()
+
+        # poll as the blocking iotSocketConnect() does, without advancing time manually
+        status = vsocket.socketConnect(client, IP, 5000)
+        assert status == vsocket.IOT_SOCKET_EINPROGRESS
+        polls = 0
+        while status in (vsocket.IOT_SOCKET_EINPROGRESS, vsocket.IOT_SOCKET_EALREADY):
+            status = vsocket.socketConnect(client, IP, 5000)
+            polls += 1
+            assert polls < 100
+        assert status == 0 and polls == 5 and vsocket.getTime() == 50000
+        assert vsocket.socketConnect(client, IP, 5000) == vsocket.IOT_SOCKET_EISCONN
+
+    def test_receive_window(self):
+        vsocket.configure(buffer_size=1024)
+        client, server = self.open_pair()
+        assert vsocket.socketSend(client, bytes(1500)) == 1024
+        assert vsocket.socketSend(client, bytes(476)) == vsocket.IOT_SOCKET_EAGAIN
+        assert vsocket.socketRecv(server, 2000)[0] == 1024
+        assert vsocket.socketSend(client, bytes(476)) == 476
+
+    def test_loss(self):
+        def received():
+            receiver = self.create(vsocket.IOT_SOCKET_SOCK_DGRAM)
+            vsocket.socketBind(receiver, IP, 6000)
+            sender = self.create(vsocket.IOT_SOCKET_SOCK_DGRAM)
+            for n in range(64):
+                vsocket.socketSendTo(sender, bytes([n]), IP, 6000)
+            data = bytearray()
+            while True:
+                status, datagram, _, _ = vsocket.socketRecvFrom(receiver, 1)
+                if status <= 0:
+                    break
+                data += datagram
+            vsocket.socketClose(receiver)
+            vsocket.socketClose(sender)
+            return data
+
+        # the configuration seeds the loss generator: same settings, same drops (without reset)
+        vsocket.configure(loss=0.5, seed=7)
+        first = received()
+        assert 0 < len(first) < 64
+        vsocket.configure(seed=7)
+        assert received() == first
+        vsocket.configure(seed=8)
+        assert received() != first
+
+        # lost stream segments are retransmitted after RTO, in order
+        vsocket.configure(loss=0.5, seed=1, rto=1000)
+        vsocket.reset()
+        client, server = self.open_pair()
+        for n in range(8):
+            assert vsocket.socketSend(client, bytes([n])) == 1
+        vsocket.advanceTime(8 * 8 * 1000)
+        assert vsocket.socketRecv(server, 16) == (8, bytes(range(8)))
+
+        # no retransmission left: the send times out
+        vsocket.configure(loss=1.0, retries=2)
+        assert vsocket.socketSend(client, b'x') == vsocket.IOT_SOCKET_ETIMEDOUT
+
+    def test_datagram(self):
+        receiver = self.create(vsocket.IOT_SOCKET_SOCK_DGRAM)
+        assert vsocket.socketBind(receiver, IP, 6000) == 0
+        sender = self.create(vsocket.IOT_SOCKET_SOCK_DGRAM)
+        assert vsocket.socketSendTo(sender, b'ping', IP, 6000) == 4
+        assert vsocket.socketRecvFrom(receiver, 16) == (4, b'ping', IP, vsocket.EPHEMERAL_PORT)
+
+        # connected datagram socket, datagrams are truncated to the receive size
+        assert vsocket.socketConnect(receiver, IP, vsocket.EPHEMERAL_PORT) == 0
+        assert vsocket.socketSend(receiver, b'pong!') == 5
+        buf = bytearray(4)
+        assert vsocket.socketRecvInto(sender, buf) == 4 and buf == b'pong'
+
+        # no receiver: dropped
+        assert vsocket.socketSendTo(sender, b'lost', IP, 6001) == 4
+        assert vsocket.socketRecvFrom(receiver, 16)[0] == vsocket.IOT_SOCKET_EAGAIN
+
+
+if __name__ == '__main__':
+    unittest.main()
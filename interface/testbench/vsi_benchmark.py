@@ -0,0 +1,249 @@
+# Copyright (c) 2021-2022 Arm Limited. All rights reserved.
+
+# Virtual Streaming Interface peripheral script micro-benchmarks
+
+##@addtogroup arm_vsi_testbench
+#  @{
+#
+##@package vsi_benchmark
+#Measures per-call latency and allocations of the peripheral script callbacks.
+#
+#Covers the VSI register callbacks, rdDataDMA/wrDataDMA for payloads from
+#64 B to 1 MB, the audio load/store paths and the VIO accessors.
+#Results are written as JSON; with --baseline the results are compared with a
+#stored result file and the exit code is 1 if a benchmark got slower than the
+#threshold.
+#
+#Usage: python vsi_benchmark.py [--output result.json] [--baseline baseline.json] [--threshold 0.25]
+
+import argparse
+import json
+import os
+import platform
+import shutil
+import sys
+import tempfile
+import time
+import tracemalloc
+import wave
+
+import vsi_testbench as tb
+
+INTERFACE_DIR = os.path.normpath(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+# Payload sizes of DMA benchmarks (in bytes)
+PAYLOAD_SIZES = (64, 256, 1024, 4096, 16384, 65536, 262144, 1048576)
+
+# Minimum measurement time of one repeat (in seconds)
+MIN_TIME = 0.02
+
+# Number of repeats (the median is reported)
+REPEATS = 5
+
+# Number of calls traced for allocation measurement
+TRACED_CALLS = 8
+
+
+## Measure latency of a callable
+#  @param fn callable without arguments
+#  @return (ns_per_call, iterations) median latency (in nanoseconds) and calls per repeat
+def measureLatency(fn):
+    iterations = 1
+    while True:
+        start = time.perf_counter()
+        for _ in range(iterations):
+            fn()
+        elapsed = time.perf_counter() - start
+        if elapsed >= MIN_TIME:
+            break
+        iterations *= 2 if elapsed == 0 else max(2, min(100, int(MIN_TIME / elapsed) + 1))
+
+    samples = []
+    for _ in range(REPEATS):
+        start = time.perf_counter_ns()
+        for _ in range(iterations):
+            fn()
+        samples.append((time.perf_counter_ns() - start) / iterations)
+    samples.sort()
+    return (samples[len(samples) // 2], iterations)
+
+
+## Measure memory allocated by a callable (peak of traced memory per call)
+#  @param fn callable without arguments
+#  @return bytes_per_call average peak allocation (in bytes)
+def measureAllocations(fn):
+    total = 0
+    tracemalloc.start()
+    try:
+        for _ in range(TRACED_CALLS):
+            tracemalloc.clear_traces()
+            if hasattr(tracemalloc, 'reset_peak'):
+                tracemalloc.reset_peak()
+            before, _ = tracemalloc.get_traced_memory()
+            fn()
+            _, peak = tracemalloc.get_traced_memory()
+            total += peak - before
+    finally:
+        tracemalloc.stop()
+    return total // TRACED_CALLS
+
+
+## Create the benchmark list
+#  @param workdir working directory for audio files
+#  @return benchmarks list of (name, callable)
+def createBenchmarks(workdir):
+    tb.configure(None)
+    benchmarks = []
+
+    # Generic VSI script (default role: loopback)
+    vsi = tb.loadScript(os.path.join(INTERFACE_DIR, 'python', 'arm_vsi0.py'))
+    vsi.init()
+    benchmarks += [
+        ('vsi.rdIRQ',      vsi.rdIRQ),
+        ('vsi.wrIRQ',      lambda: vsi.wrIRQ(1)),
+        ('vsi.wrTimer',    lambda: vsi.wrTimer(1, 1000)),
+        ('vsi.timerEvent', vsi.timerEvent),
+        ('vsi.wrDMA',      lambda: vsi.wrDMA(0, 1)),
+        ('vsi.rdRegs',     lambda: vsi.rdRegs(5)),
+        ('vsi.wrRegs',     lambda: vsi.wrRegs(5, 0x12345678)),
+    ]
+    for size in PAYLOAD_SIZES:
+        data = bytearray(size)
+        benchmarks.append(('vsi.wrDataDMA[{}]'.format(size), lambda d=data, s=size: vsi.wrDataDMA(d, s)))
+        benchmarks.append(('vsi.rdDataDMA[{}]'.format(size), lambda s=size: vsi.rdDataDMA(s)))
+
+    # Audio input (load path) and output (store path), 16-bit stereo at 48 kHz
+    os.chdir(workdir)
+    with wave.open('test.wav', 'wb') as f:
+        f.setnchannels(2)
+        f.setsampwidth(2)
+        f.setframerate(48000)
+        f.writeframes(bytes(max(PAYLOAD_SIZES)))
+    audio_in = tb.loadScript(os.path.join(INTERFACE_DIR, 'audio', 'python', 'arm_vsi0.py'))
+    audio_in.init()
+    for index, value in ((1, 2), (2, 16), (3, 48000), (0, 1)):
+        audio_in.wrRegs(index, value)
+
+    def load(size):
+        if audio_in.WAVE.tell() * 4 + size > max(PAYLOAD_SIZES):
+            audio_in.WAVE.rewind()
+        return audio_in.rdDataDMA(size)
+
+    # Output file is written to a separate directory (re-opened when it gets too large)
+    os.chdir(os.path.join(workdir, 'out'))
+    audio_out = tb.loadScript(os.path.join(INTERFACE_DIR, 'audio', 'python', 'arm_vsi1.py'))
+    audio_out.init()
+    for index, value in ((1, 2), (2, 16), (3, 48000), (0, 1)):
+        audio_out.wrRegs(index, value)
+
+    def store(data, size):
+        if audio_out.WAVE.tell() * 4 > 64 * max(PAYLOAD_SIZES):
+            audio_out.wrRegs(0, 0)
+            audio_out.wrRegs(0, 1)
+        audio_out.wrDataDMA(data, size)
+
+    for size in PAYLOAD_SIZES:
+        data = bytearray(size)
+        benchmarks.append(('audio.rdDataDMA[{}]'.format(size), lambda s=size: load(s)))
+        benchmarks.append(('audio.wrDataDMA[{}]'.format(size), lambda d=data, s=size: store(d, s)))
+
+    # VIO accessors
+    vio = tb.loadScript(os.path.join(INTERFACE_DIR, 'python', 'arm_vio.py'))
+    vio.init()
+    benchmarks += [
+        ('vio.rdSignal', lambda: vio.rdSignal(0xFF)),
+        ('vio.wrSignal', lambda: vio.wrSignal(0xFF, 0x55)),
+        ('vio.rdValue',  lambda: vio.rdValue(3)),
+        ('vio.wrValue',  lambda: vio.wrValue(3, 0x1234)),
+    ]
+
+    return benchmarks
+
+
+## Run benchmarks
+#  @param filter_ only run benchmarks containing this string (None = all)
+#  @return result result dictionary (JSON serializable)
+def runBenchmarks(filter_=None):
+    cwd = os.getcwd()
+    workdir = tempfile.mkdtemp()
+    os.mkdir(os.path.join(workdir, 'out'))
+    results = {}
+    try:
+        for name, fn in createBenchmarks(workdir):
+            if filter_ and filter_ not in name:
+                continue
+            ns_per_call, iterations = measureLatency(fn)
+            results[name] = {
+                'ns_per_call': round(ns_per_call, 1),
+                'bytes_per_call': measureAllocations(fn),
+                'iterations': iterations
+            }
+            print("{:<28} {:>14.1f} ns {:>12} B".format(name, ns_per_call, results[name]['bytes_per_call']),
+                  file=sys.stderr)
+    finally:
+        os.chdir(cwd)
+        shutil.rmtree(workdir, ignore_errors=True)
+
+    return {
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'results': results
+    }
+
+
+## Compare results with a baseline (the table goes to stderr, stdout only carries the JSON result)
+#  @param result result dictionary
+#  @param baseline baseline result dictionary
+#  @param threshold allowed relative slowdown (e.g. 0.25 = 25%)
+#  @return regressions list of benchmark names slower than the threshold
+def compare(result, baseline, threshold):
+    regressions = []
+    print("{:<28} {:>14} {:>14} {:>8}".format("benchmark", "baseline ns", "current ns", "ratio"), file=sys.stderr)
+    for name, current in result['results'].items():
+        previous = baseline['results'].get(name)
+        if previous is None or previous['ns_per_call'] == 0:
+            continue
+        ratio = current['ns_per_call'] / previous['ns_per_call']
+        flag = ''
+        if ratio > 1.0 + threshold:
+            regressions.append(name)
+            flag = ' REGRESSION'
+        if current['bytes_per_call'] > previous['bytes_per_call'] * (1.0 + threshold) + 64:
+            if name not in regressions:
+                regressions.append(name)
+            flag += ' ALLOCATIONS'
+        print("{:<28} {:>14.1f} {:>14.1f} {:>8.2f}{}".format(
+            name, previous['ns_per_call'], current['ns_per_call'], ratio, flag), file=sys.stderr)
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Peripheral script micro-benchmarks')
+    parser.add_argument('-o', '--output', type=str, help='Write results to JSON file')
+    parser.add_argument('-b', '--baseline', type=str, help='Compare results with baseline JSON file')
+    parser.add_argument('-t', '--threshold', type=float, default=0.25,
+                        help='Allowed relative slowdown against baseline. Default: 0.25')
+    parser.add_argument('-f', '--filter', type=str, help='Only run benchmarks containing this string')
+    args = parser.parse_args()
+
+    result = runBenchmarks(args.filter)
+
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(result, f, indent=2)
+    else:
+        print(json.dumps(result, indent=2))
+
+    if args.baseline:
+        with open(args.baseline, 'r') as f:
+            baseline = json.load(f)
+        regressions = compare(result, baseline, args.threshold)
+        if regressions:
+            print("Regressions: {}".format(', '.join(regressions)), file=sys.stderr)
+            sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
+
+## @}
@@ -0,0 +1,435 @@
+# Copyright (c) 2021-2022 Arm Limited. All rights reserved.
+
+# Virtual Streaming Interface offline test bench
+
+##@addtogroup arm_vsi_testbench
+#  @{
+#
+##@package vsi_testbench
+#Drives VSI/VIO Python peripheral scripts without the FVP.
+#
+#The test bench imports a peripheral script and calls its functions the way
+#the model does: register accesses follow the register layout of arm_vsi.h,
+#timer overflows run on simulated time (1MHz timer clock) and trigger
+#timerEvent(), the DMA block transfer (rdDataDMA/wrDataDMA on a rotating
+#memory buffer) and the interrupt, in this order.
+#AudioDriver replays the register sequences of audio_drv.c.
+
+import importlib.util
+import os
+import sys
+
+
+# VSI register offsets (arm_vsi.h, ARM_VSI_Type)
+IRQ_ENABLE       = 0x000
+IRQ_SET          = 0x004
+IRQ_CLEAR        = 0x008
+IRQ_STATUS       = 0x00C
+TIMER_CONTROL    = 0x100
+TIMER_INTERVAL   = 0x104
+TIMER_COUNT      = 0x108
+DMA_CONTROL      = 0x200
+DMA_ADDRESS      = 0x204
+DMA_BLOCK_SIZE   = 0x208
+DMA_BLOCK_NUM    = 0x20C
+DMA_BLOCK_INDEX  = 0x210
+REGS             = 0x300
+
+# VSI Timer Control definitions
+TIMER_RUN_MSK      = 1 << 0
+TIMER_PERIODIC_MSK = 1 << 1
+TIMER_TRIG_IRQ_MSK = 1 << 2
+TIMER_TRIG_DMA_MSK = 1 << 3
+
+# VSI DMA Control definitions
+DMA_ENABLE_MSK    = 1 << 0
+DMA_DIRECTION_MSK = 1 << 1
+DMA_DIRECTION_P2M = 0 << 1
+DMA_DIRECTION_M2P = 1 << 1
+
+# Simulated memory base address and default size
+MEMORY_BASE = 0x20000000
+MEMORY_SIZE = 0x00400000
+
+# Number of loaded scripts (unique module names)
+Loaded = 0
+
+
+## Import a peripheral script as a new module instance
+#  @param path path of the Python script
+#  @return module loaded module
+def loadScript(path):
+    global Loaded
+    path = os.path.abspath(path)
+    directory = os.path.dirname(path)
+    if directory not in sys.path:
+        sys.path.insert(0, directory)
+    Loaded += 1
+    name = "vsi_testbench_{}_{}".format(Loaded, os.path.splitext(os.path.basename(path))[0])
+    spec = importlib.util.spec_from_file_location(name, path)
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+
+## Select the peripheral configuration file used by scripts loaded afterwards
+#  @param path path of the configuration file (arm_vsi_config.json) or None for no file
+def configure(path):
+    if path is None:
+        os.environ.pop('VSI_CONFIG', None)
+    else:
+        os.environ['VSI_CONFIG'] = os.path.abspath(path)
+    config = sys.modules.get('arm_vsi_config')
+    if config is not None:
+        config.Content = None
+
+
+## Virtual Streaming Interface peripheral (model side of one VSI instance)
+class VSI:
+    def __init__(self, bench, script, irq_handler=None):
+        self.bench       = bench
+        self.script      = loadScript(script)
+        self.irq_handler = irq_handler      # called when an enabled interrupt is set
+        self.irq_enable  = 0
+        self.timer_ctrl  = 0
+        self.interval    = 0
+        self.count       = 0
+        self.next_event  = None             # time of the next timer overflow (in microseconds)
+        self.dma_ctrl    = 0
+        self.address     = 0
+        self.block_size  = 0
+        self.block_num   = 0
+        self.block_index = 0
+        self.script.init()
+
+    ## Read peripheral register
+    #  @param offset register offset (see arm_vsi.h)
+    #  @return value register value (32-bit)
+    def read(self, offset):
+        if offset == IRQ_ENABLE:
+            return self.irq_enable
+        if offset == IRQ_STATUS:
+            return self.script.rdIRQ()
+        if offset == TIMER_CONTROL:
+            return self.timer_ctrl
+        if offset == TIMER_INTERVAL:
+            return self.interval
+        if offset == TIMER_COUNT:
+            return self.count
+        if offset == DMA_CONTROL:
+            return self.dma_ctrl
+        if offset == DMA_ADDRESS:
+            return self.address
+        if offset == DMA_BLOCK_SIZE:
+            return self.block_size
+        if offset == DMA_BLOCK_NUM:
+            return self.block_num
+        if offset == DMA_BLOCK_INDEX:
+            return self.block_index
+        if REGS <= offset < REGS + 64 * 4:
+            return self.script.rdRegs((offset - REGS) // 4)
+        return 0
+
+    ## Write peripheral register
+    #  @param offset register offset (see arm_vsi.h)
+    #  @param value value to write (32-bit)
+    def write(self, offset, value):
+        value &= 0xFFFFFFFF
+        if offset == IRQ_ENABLE:
+            self.irq_enable = value
+            self.checkIRQ()
+        elif offset == IRQ_SET:
+            self.script.wrIRQ(self.script.rdIRQ() | value)
+            self.checkIRQ()
+        elif offset == IRQ_CLEAR:
+            self.script.wrIRQ(self.script.rdIRQ() & ~value)
+        elif offset == TIMER_CONTROL:
+            self.script.wrTimer(0, value)
+            if (value & TIMER_RUN_MSK) == 0:
+                self.next_event = None
+            elif (self.timer_ctrl & TIMER_RUN_MSK) == 0:
+                self.count = 0
+                self.next_event = self.bench.time + self.interval
+            self.timer_ctrl = value
+        elif offset == TIMER_INTERVAL:
+            self.script.wrTimer(1, value)
+            self.interval = value
+        elif offset == DMA_CONTROL:
+            self.script.wrDMA(0, value)
+            if (value & DMA_ENABLE_MSK) != 0:
+                self.block_index = 0
+            self.dma_ctrl = value
+        elif offset == DMA_ADDRESS:
+            self.script.wrDMA(1, value)
+            self.address = value
+        elif offset == DMA_BLOCK_SIZE:
+            self.script.wrDMA(2, value)
+            self.block_size = value
+        elif offset == DMA_BLOCK_NUM:
+            self.script.wrDMA(3, value)
+            self.block_num = value
+        elif REGS <= offset < REGS + 64 * 4:
+            self.script.wrRegs((offset - REGS) // 4, value)
+
+    ## Call interrupt handler if the interrupt is enabled and pending
+    def checkIRQ(self):
+        if (self.irq_enable & self.script.rdIRQ()) != 0 and self.irq_handler is not None:
+            self.irq_handler()
+
+    ## Transfer one DMA block
+    def transferDMA(self):
+        if (self.dma_ctrl & DMA_ENABLE_MSK) == 0 or self.block_num == 0:
+            return
+        address = self.address + self.block_index * self.block_size
+        block = self.bench.memory(address, self.block_size)
+        if (self.dma_ctrl & DMA_DIRECTION_MSK) == DMA_DIRECTION_M2P:
+            self.script.wrDataDMA(bytearray(block), self.block_size)
+        else:
+            data = self.script.rdDataDMA(self.block_size)
+            block[:] = data[:self.block_size]
+        self.block_index = (self.block_index + 1) % self.block_num
+
+    ## Timer overflow: timer event, DMA transfer and interrupt
+    def timerOverflow(self):
+        self.count += 1
+        self.script.timerEvent()
+        if (self.timer_ctrl & TIMER_TRIG_DMA_MSK) != 0:
+            self.transferDMA()
+        if (self.timer_ctrl & TIMER_TRIG_IRQ_MSK) != 0:
+            self.script.wrIRQ(self.script.rdIRQ() | 1)
+            self.checkIRQ()
+        if (self.timer_ctrl & TIMER_PERIODIC_MSK) != 0 and self.interval != 0:
+            self.next_event += self.interval
+        else:
+            self.next_event = None
+
+
+## Virtual Input/Output peripheral (model side of VIO)
+class VIO:
+    def __init__(self, bench, script):
+        self.bench  = bench
+        self.script = loadScript(script)
+        self.script.init()
+
+    ## Read signals
+    def rdSignal(self, mask):
+        return self.script.rdSignal(mask)
+
+    ## Write signals
+    def wrSignal(self, mask, signal):
+        self.script.wrSignal(mask, signal)
+
+    ## Read value
+    def rdValue(self, index):
+        return self.script.rdValue(index)
+
+    ## Write value
+    def wrValue(self, index, value):
+        self.script.wrValue(index, value)
+
+
+## Test bench: simulated time, memory and loaded peripherals
+class Testbench:
+    def __init__(self, memory_size=MEMORY_SIZE):
+        self.time        = 0                # simulated time (in microseconds)
+        self.peripherals = []
+        self.ram         = bytearray(memory_size)
+        self.ram_view    = memoryview(self.ram)
+        self.heap        = 0                # next free memory offset
+
+    ## Load a VSI peripheral script
+    #  @param script path of the script (arm_vsiN.py)
+    #  @param irq_handler interrupt handler (callable) or None
+    #  @return vsi peripheral (VSI)
+    def loadVSI(self, script, irq_handler=None):
+        vsi = VSI(self, script, irq_handler)
+        self.peripherals.append(vsi)
+        return vsi
+
+    ## Load a VIO peripheral script
+    #  @param script path of the script (arm_vio.py)
+    #  @return vio peripheral (VIO)
+    def loadVIO(self, script):
+        return VIO(self, script)
+
+    ## Allocate simulated memory (4-byte aligned)
+    #  @param size size in bytes
+    #  @return address start address
+    def alloc(self, size):
+        address = MEMORY_BASE + self.heap
+        self.heap += (size + 3) & ~3
+        if self.heap > len(self.ram):
+            raise MemoryError("test bench memory exhausted")
+        return address
+
+    ## Access simulated memory
+    #  @param address start address
+    #  @param size size in bytes
+    #  @return view writable view of the memory (memoryview)
+    def memory(self, address, size):
+        offset = address - MEMORY_BASE
+        if offset < 0 or offset + size > len(self.ram):
+            raise IndexError("address 0x{:08X} outside of test bench memory".format(address))
+        return self.ram_view[offset:offset + size]
+
+    ## Run simulated time, handle timer overflows in time order
+    #  @param duration time to run (in microseconds)
+    def run(self, duration):
+        end = self.time + duration
+        while True:
+            pending = [p for p in self.peripherals if p.next_event is not None and p.next_event <= end]
+            if not pending:
+                break
+            vsi = min(pending, key=lambda p: p.next_event)
+            self.time = vsi.next_event
+            vsi.timerOverflow()
+        self.time = end
+
+
+# Audio driver definitions (audio_drv.h)
+AUDIO_DRV_INTERFACE_TX       = 1
+AUDIO_DRV_INTERFACE_RX       = 2
+AUDIO_DRV_CONTROL_TX_ENABLE  = 1 << 0
+AUDIO_DRV_CONTROL_RX_ENABLE  = 1 << 1
+AUDIO_DRV_CONTROL_TX_DISABLE = 1 << 2
+AUDIO_DRV_CONTROL_RX_DISABLE = 1 << 3
+AUDIO_DRV_EVENT_TX_DATA      = 1 << 0
+AUDIO_DRV_EVENT_RX_DATA      = 1 << 1
+AUDIO_DRV_OK                 = 0
+AUDIO_DRV_ERROR              = -1
+AUDIO_DRV_ERROR_PARAMETER    = -5
+
+# Audio peripheral user registers (audio_drv.c)
+AUDIO_CONTROL     = REGS + 0 * 4
+AUDIO_CHANNELS    = REGS + 1 * 4
+AUDIO_SAMPLE_BITS = REGS + 2 * 4
+AUDIO_SAMPLE_RATE = REGS + 3 * 4
+AUDIO_CONTROL_ENABLE_MSK = 1 << 0
+
+
+## Audio driver (register sequences of audio_drv.c on VSI0 input and VSI1 output)
+class AudioDriver:
+    def __init__(self, audio_in, audio_out):
+        self.audio_i     = audio_in
+        self.audio_o     = audio_out
+        self.initialized = False
+        self.cb_event    = None
+        self.audio_i.irq_handler = self.handlerI
+        self.audio_o.irq_handler = self.handlerO
+
+    ## Audio Output Interrupt Handler
+    def handlerO(self):
+        self.audio_o.write(IRQ_CLEAR, 1)
+        if self.cb_event is not None:
+            self.cb_event(AUDIO_DRV_EVENT_TX_DATA)
+
+    ## Audio Input Interrupt Handler
+    def handlerI(self):
+        self.audio_i.write(IRQ_CLEAR, 1)
+        if self.cb_event is not None:
+            self.cb_event(AUDIO_DRV_EVENT_RX_DATA)
+
+    ## Initialize Audio Interface
+    def initialize(self, cb_event):
+        self.cb_event = cb_event
+        for vsi in (self.audio_o, self.audio_i):
+            vsi.write(TIMER_CONTROL, 0)
+            vsi.write(DMA_CONTROL, 0)
+            vsi.write(IRQ_CLEAR, 1)
+            vsi.write(IRQ_ENABLE, 1)
+            vsi.write(AUDIO_CONTROL, 0)
+        self.initialized = True
+        return AUDIO_DRV_OK
+
+    ## De-initialize Audio Interface
+    def uninitialize(self):
+        for vsi in (self.audio_o, self.audio_i):
+            vsi.write(TIMER_CONTROL, 0)
+            vsi.write(DMA_CONTROL, 0)
+            vsi.write(IRQ_CLEAR, 1)
+            vsi.write(IRQ_ENABLE, 0)
+            vsi.write(AUDIO_CONTROL, 0)
+        self.initialized = False
+        return AUDIO_DRV_OK
+
+    ## Get peripheral of an interface
+    def peripheral(self, interface):
+        if interface == AUDIO_DRV_INTERFACE_TX:
+            return self.audio_o
+        if interface == AUDIO_DRV_INTERFACE_RX:
+            return self.audio_i
+        return None
+
+    ## Configure Audio Interface
+    def configure(self, interface, channels, sample_bits, sample_rate):
+        if not self.initialized:
+            return AUDIO_DRV_ERROR
+        if not (1 <= channels <= 32) or not (8 <= sample_bits <= 32) or sample_rate == 0:
+            return AUDIO_DRV_ERROR_PARAMETER
+        vsi = self.peripheral(interface)
+        if vsi is None:
+            return AUDIO_DRV_ERROR_PARAMETER
+        if (vsi.read(AUDIO_CONTROL) & AUDIO_CONTROL_ENABLE_MSK) != 0:
+            return AUDIO_DRV_ERROR
+        vsi.write(AUDIO_CHANNELS, channels)
+        vsi.write(AUDIO_SAMPLE_BITS, sample_bits)
+        vsi.write(AUDIO_SAMPLE_RATE, sample_rate)
+        return AUDIO_DRV_OK
+
+    ## Set Audio Interface buffer
+    def setBuf(self, interface, address, block_num, block_size):
+        if not self.initialized:
+            return AUDIO_DRV_ERROR
+        vsi = self.peripheral(interface)
+        if vsi is None:
+            return AUDIO_DRV_ERROR_PARAMETER
+        if (vsi.read(DMA_CONTROL) & DMA_ENABLE_MSK) != 0:
+            return AUDIO_DRV_ERROR
+        vsi.write(DMA_ADDRESS, address)
+        vsi.write(DMA_BLOCK_NUM, block_num)
+        vsi.write(DMA_BLOCK_SIZE, block_size)
+        return AUDIO_DRV_OK
+
+    ## Enable interface: CONTROL, DMA and periodic timer as in AudioDrv_Control
+    def enable(self, vsi, direction):
+        vsi.write(AUDIO_CONTROL, AUDIO_CONTROL_ENABLE_MSK)
+        vsi.write(DMA_CONTROL, direction | DMA_ENABLE_MSK)
+        sample_size = vsi.read(AUDIO_CHANNELS) * ((vsi.read(AUDIO_SAMPLE_BITS) + 7) // 8)
+        sample_rate = vsi.read(AUDIO_SAMPLE_RATE)
+        if sample_size == 0 or sample_rate == 0:
+            vsi.write(TIMER_INTERVAL, 0xFFFFFFFF)
+        else:
+            block_size = vsi.read(DMA_BLOCK_SIZE)
+            vsi.write(TIMER_INTERVAL, (1000000 * (block_size // sample_size)) // sample_rate)
+        vsi.write(TIMER_CONTROL, TIMER_TRIG_DMA_MSK | TIMER_TRIG_IRQ_MSK | TIMER_PERIODIC_MSK | TIMER_RUN_MSK)
+
+    ## Disable interface
+    def disable(self, vsi):
+        vsi.write(TIMER_CONTROL, 0)
+        vsi.write(DMA_CONTROL, 0)
+        vsi.write(AUDIO_CONTROL, 0)
+
+    ## Control Audio Interface
+    def control(self, control):
+        if not self.initialized:
+            return AUDIO_DRV_ERROR
+        if (control & AUDIO_DRV_CONTROL_TX_DISABLE) != 0:
+            self.disable(self.audio_o)
+        elif (control & AUDIO_DRV_CONTROL_TX_ENABLE) != 0:
+            self.enable(self.audio_o, DMA_DIRECTION_M2P)
+        if (control & AUDIO_DRV_CONTROL_RX_DISABLE) != 0:
+            self.disable(self.audio_i)
+        elif (control & AUDIO_DRV_CONTROL_RX_ENABLE) != 0:
+            self.enable(self.audio_i, DMA_DIRECTION_P2M)
+        return AUDIO_DRV_OK
+
+    ## Get transmitted block count
+    def getTxCount(self):
+        return self.audio_o.read(TIMER_COUNT)
+
+    ## Get received block count
+    def getRxCount(self):
+        return self.audio_i.read(TIMER_COUNT)
+
+
+## @}
@@ -0,0 +1,743 @@
+# Copyright (c) 2021-2022 Arm Limited. All rights reserved.
+
+# Virtual Socket Interface Python script: Emulated Network
+
+##@addtogroup arm_vsocket_py
+#  @{
+#
+##@package arm_vsocket
+#Documentation for VSocket emulated network module.
+#
+#Implements the VSocket function calls (see arm_vsocket.h) on top of
+#in-process loopback endpoints. Payloads travel over emulated links with
+#configurable latency, bandwidth and loss and are delivered on simulated
+#time, so socket throughput does not depend on the host network.
+
+import heapq
+import logging
+import random
+
+
+## Set verbosity level
+#verbosity = logging.DEBUG
+verbosity = logging.ERROR
+
+# [debugging] Verbosity settings
+level = { 10: "DEBUG",  20: "INFO",  30: "WARNING",  40: "ERROR" }
+logging.basicConfig(format='Py: VSOCKET: [%(levelname)s]\t%(message)s', level = verbosity)
+logging.info("Verbosity level is set to " + level[verbosity])
+
+
+## Emulated link settings (applied to every connection and datagram, see configure)
+Latency    = 0        # one-way latency (in microseconds)
+Bandwidth  = 0        # link bandwidth (in bytes per second, 0 = unlimited)
+Loss       = 0.0      # packet loss probability (0.0 .. 1.0)
+Seed       = 0        # seed of the loss generator (deterministic runs)
+RTO        = 200000   # retransmission timeout for lost stream segments (in microseconds)
+Retries    = 8        # retransmissions of a stream segment before the send times out
+
+## Stream receive buffer size (in bytes), preallocated per connection
+#  Limits the bytes in flight: socketSend accepts only what fits (receive window)
+BufferSize = 262144
+
+## Simulated time advanced on each call returning EAGAIN (in microseconds)
+#  Matches the osDelay(10U) polling of blocking calls in iot_socket.c, 0 = disabled
+PollInterval = 10000
+
+## Host name table used by socketGetHostByName
+Hosts = { "localhost": bytes([127, 0, 0, 1]) }
+
+# Number of sockets (NUM_SOCKS in iot_socket.c)
+NUM_SOCKS = 64
+
+# First port used for implicit (ephemeral) binding
+EPHEMERAL_PORT = 49152
+
+# IoT Socket address family, type and protocol definitions
+IOT_SOCKET_AF_INET      = 1
+IOT_SOCKET_AF_INET6     = 2
+IOT_SOCKET_SOCK_STREAM  = 1
+IOT_SOCKET_SOCK_DGRAM   = 2
+IOT_SOCKET_IPPROTO_TCP  = 1
+IOT_SOCKET_IPPROTO_UDP  = 2
+
+# IoT Socket return codes
+IOT_SOCKET_ERROR         = -1
+IOT_SOCKET_ESOCK         = -2
+IOT_SOCKET_EINVAL        = -3
+IOT_SOCKET_ENOTSUP       = -4
+IOT_SOCKET_ENOMEM        = -5
+IOT_SOCKET_EAGAIN        = -6
+IOT_SOCKET_EINPROGRESS   = -7
+IOT_SOCKET_ETIMEDOUT     = -8
+IOT_SOCKET_EISCONN       = -9
+IOT_SOCKET_ENOTCONN      = -10
+IOT_SOCKET_ECONNREFUSED  = -11
+IOT_SOCKET_ECONNRESET    = -12
+IOT_SOCKET_ECONNABORTED  = -13
+IOT_SOCKET_EALREADY      = -14
+IOT_SOCKET_EADDRINUSE    = -15
+IOT_SOCKET_EHOSTNOTFOUND = -16
+
+# Simulated time (in microseconds)
+Time = 0
+
+# Socket table
+Sockets = {}
+
+# Pending events (heap of (time, sequence, action, args))
+Events = []
+EventSeq = 0
+
+# Loss generator
+Rng = random.Random(Seed)
+
+# Next ephemeral port
+NextPort = EPHEMERAL_PORT
+
+
+## Stream receive ring buffer
+#  Payloads are copied once into the preallocated buffer when sent and become
+#  visible to the receiver when they arrive. Copies use memoryview slices only.
+class RingBuffer:
+    def __init__(self, size):
+        self.buf     = bytearray(size)
+        self.view    = memoryview(self.buf)
+        self.size    = size
+        self.head    = 0    # read position
+        self.tail    = 0    # write position (bytes in flight included)
+        self.visible = 0    # end of arrived data
+
+    ## Copy data into the buffer (in flight until committed)
+    #  @param data data to write (bytes-like)
+    #  @return n number of bytes written
+    def write(self, data):
+        src = memoryview(data).cast('B')
+        n = min(len(src), self.free())
+        pos = self.tail % self.size
+        first = min(n, self.size - pos)
+        self.view[pos:pos + first] = src[:first]
+        self.view[:n - first] = src[first:n]
+        self.tail += n
+        return n
+
+    ## Make written data visible to the reader
+    #  @param n number of bytes arrived
+    def commit(self, n):
+        self.visible += n
+
+    ## Number of bytes that can be written
+    def free(self):
+        return self.size - (self.tail - self.head)
+
+    ## Number of bytes available to read
+    def available(self):
+        return self.visible - self.head
+
+    ## Copy arrived data into a destination buffer
+    #  @param dst destination buffer (writable bytes-like)
+    #  @return n number of bytes read
+    def readinto(self, dst):
+        dst = memoryview(dst).cast('B')
+        n = min(len(dst), self.visible - self.head)
+        pos = self.head % self.size
+        first = min(n, self.size - pos)
+        dst[:first] = self.view[pos:pos + first]
+        dst[first:n] = self.view[:n - first]
+        self.head += n
+        return n
+
+
+## Emulated socket
+class Socket:
+    def __init__(self, af, type, protocol):
+        self.af         = af
+        self.type       = type
+        self.protocol   = protocol
+        self.ip         = None      # local address
+        self.port       = 0         # local port
+        self.peer       = None      # connected peer socket (stream) or (ip, port) (datagram)
+        self.backlog    = 0         # listen backlog, 0 = not listening
+        self.accept_q   = []        # connected sockets ready for accept
+        self.rx_buf     = None      # stream receive buffer (RingBuffer)
+        self.rx_dgrams  = []        # received datagrams as (data, ip, port)
+        self.rx_closed  = False     # peer closed the connection
+        self.connected  = False
+        self.connect_at = None      # time when the connection is established
+        self.link_busy  = 0         # time when the outgoing link becomes idle
+        self.last_arr   = 0         # arrival time of the last stream segment sent
+        self.closed     = False
+
+
+## Any (wildcard) address check
+#  @param ip IP address (bytes)
+#  @return True if address is the wildcard address
+def isAnyAddress(ip):
+    return ip is None or not any(ip)
+
+
+## Schedule an event on simulated time
+#  @param t time of the event (in microseconds)
+#  @param action function to call at time t
+#  @param args arguments passed to action
+def scheduleEvent(t, action, *args):
+    global EventSeq
+    heapq.heappush(Events, (t, EventSeq, action, args))
+    EventSeq += 1
+
+
+## Execute all events due at the current simulated time
+def runEvents():
+    while Events and Events[0][0] <= Time:
+        _, _, action, args = heapq.heappop(Events)
+        action(*args)
+
+
+## Advance simulated time and deliver due events
+#  @param delta time to advance (in microseconds)
+#  @return time current simulated time (in microseconds)
+def advanceTime(delta):
+    global Time
+    Time += delta
+    runEvents()
+    return Time
+
+
+## Get simulated time
+#  @return time current simulated time (in microseconds)
+def getTime():
+    return Time
+
+
+## Reset emulated network (close all sockets, clear events and time)
+def reset():
+    global Time, EventSeq, Rng, NextPort
+    logging.info("Reset emulated network")
+    Sockets.clear()
+    Events.clear()
+    Time     = 0
+    EventSeq = 0
+    Rng      = random.Random(Seed)
+    NextPort = EPHEMERAL_PORT
+
+
+## Apply emulated network settings (arguments left at None keep their value)
+#  The loss generator is seeded again, so runs with the same settings drop the same packets.
+#  @param latency one-way latency (in microseconds)
+#  @param bandwidth link bandwidth (in bytes per second, 0 = unlimited)
+#  @param loss packet loss probability (0.0 .. 1.0)
+#  @param seed seed of the loss generator
+#  @param rto retransmission timeout for lost stream segments (in microseconds)
+#  @param retries retransmissions of a stream segment before the send times out
+#  @param buffer_size stream receive buffer size (in bytes, used by new connections)
+#  @param poll_interval simulated time advanced on each call returning EAGAIN (in microseconds)
+def configure(latency=None, bandwidth=None, loss=None, seed=None, rto=None, retries=None,
+              buffer_size=None, poll_interval=None):
+    global Latency, Bandwidth, Loss, Seed, RTO, Retries, BufferSize, PollInterval, Rng
+    if latency is not None:
+        Latency = latency
+    if bandwidth is not None:
+        Bandwidth = bandwidth
+    if loss is not None:
+        Loss = loss
+    if seed is not None:
+        Seed = seed
+    if rto is not None:
+        RTO = rto
+    if retries is not None:
+        Retries = retries
+    if buffer_size is not None:
+        BufferSize = buffer_size
+    if poll_interval is not None:
+        PollInterval = poll_interval
+    Rng = random.Random(Seed)
+    logging.info("Emulated network: latency {} us, bandwidth {} B/s, loss {}, seed {}".format(
+                 Latency, Bandwidth, Loss, Seed))
+
+
+## Return EAGAIN and let simulated time progress (blocking calls poll)
+#  @return IOT_SOCKET_EAGAIN
+def again():
+    if PollInterval != 0:
+        advanceTime(PollInterval)
+    return IOT_SOCKET_EAGAIN
+
+
+## Compute arrival time of a packet sent over the emulated link
+#  @param sock sending socket
+#  @param size packet size (in bytes)
+#  @return arrival arrival time (in microseconds) or None if the packet is lost
+def transmit(sock, size):
+    start = max(Time, sock.link_busy)
+    if Bandwidth != 0:
+        start += (size * 1000000) // Bandwidth
+    sock.link_busy = start
+    arrival = start + Latency
+    if Loss != 0.0 and Rng.random() < Loss:
+        return None
+    return arrival
+
+
+## Find socket bound to address
+#  @param type socket type
+#  @param ip IP address (bytes)
+#  @param port port number
+#  @param listening only match listening sockets
+#  @return sock socket or None
+def findSocket(type, ip, port, listening=False):
+    for sock in Sockets.values():
+        if sock.type != type or sock.port != port or sock.closed:
+            continue
+        if listening and sock.backlog == 0:
+            continue
+        if isAnyAddress(sock.ip) or isAnyAddress(ip) or sock.ip == ip:
+            return sock
+    return None
+
+
+## Bind socket to an ephemeral port if not bound
+#  @param sock socket
+#  @param ip local IP address (bytes), loopback endpoints share the remote address
+def bindEphemeral(sock, ip):
+    global NextPort
+    if sock.port != 0:
+        return
+    while findSocket(sock.type, None, NextPort) is not None:
+        NextPort += 1
+    sock.ip   = bytes(ip)
+    sock.port = NextPort
+    NextPort += 1
+
+
+## Get socket by identification number
+#  @param socket socket identification number
+#  @return sock socket or None
+def getSocket(socket):
+    sock = Sockets.get(socket)
+    if sock is None or sock.closed:
+        return None
+    return sock
+
+
+## Deliver connection request to listening socket (event)
+def deliverConnect(listener, child):
+    if listener.closed or len(listener.accept_q) >= listener.backlog:
+        child.peer.rx_closed = True
+        return
+    listener.accept_q.append(child)
+
+
+## Deliver stream segment to socket (event)
+def deliverSegment(sock, size):
+    if not sock.closed:
+        sock.rx_buf.commit(size)
+
+
+## Deliver stream close to socket (event)
+def deliverClose(sock):
+    sock.rx_closed = True
+
+
+## Deliver datagram to socket (event)
+def deliverDatagram(sock, data, ip, port):
+    if not sock.closed:
+        sock.rx_dgrams.append((data, ip, port))
+
+
+## Create a communication socket
+#  @param af address family
+#  @param type socket type
+#  @param protocol socket protocol
+#  @return socket socket identification number or error code
+def socketCreate(af, type, protocol):
+    logging.info("Python function socketCreate() called")
+
+    if af not in (IOT_SOCKET_AF_INET, IOT_SOCKET_AF_INET6):
+        return IOT_SOCKET_EINVAL
+    if type not in (IOT_SOCKET_SOCK_STREAM, IOT_SOCKET_SOCK_DGRAM):
+        return IOT_SOCKET_EINVAL
+
+    for socket in range(NUM_SOCKS):
+        if getSocket(socket) is None:
+            Sockets[socket] = Socket(af, type, protocol)
+            logging.debug("Create socket: {}".format(socket))
+            return socket
+
+    return IOT_SOCKET_ENOMEM
+
+
+## Assign a local address to a socket
+#  @param socket socket identification number
+#  @param ip local IP address (bytes)
+#  @param port local port number
+#  @return status 0 or error code
+def socketBind(socket, ip, port):
+    logging.info("Python function socketBind() called")
+
+    sock = getSocket(socket)
+    if sock is None:
+        return IOT_SOCKET_ESOCK
+    if sock.port != 0:
+        return IOT_SOCKET_EINVAL
+    if findSocket(sock.type, ip, port) is not None:
+        return IOT_SOCKET_EADDRINUSE
+
+    sock.ip   = bytes(ip)
+    sock.port = port
+    logging.debug("Bind socket {} to port {}".format(socket, port))
+
+    return 0
+
+
+## Listen for socket connections
+#  @param socket socket identification number
+#  @param backlog number of connection requests that can be queued
+#  @return status 0 or error code
+def socketListen(socket, backlog):
+    logging.info("Python function socketListen() called")
+
+    sock = getSocket(socket)
+    if sock is None:
+        return IOT_SOCKET_ESOCK
+    if sock.type != IOT_SOCKET_SOCK_STREAM:
+        return IOT_SOCKET_ENOTSUP
+    if sock.port == 0 or sock.connected:
+        return IOT_SOCKET_EINVAL
+
+    sock.backlog = max(backlog, 1)
+
+    return 0
+
+
+## Accept a new connection on a socket
+#  @param socket socket identification number
+#  @return (status, ip, port) new socket identification number or error code, remote address
+def socketAccept(socket):
+    logging.info("Python function socketAccept() called")
+
+    sock = getSocket(socket)
+    if sock is None:
+        return (IOT_SOCKET_ESOCK, None, 0)
+    if sock.backlog == 0:
+        return (IOT_SOCKET_EINVAL, None, 0)
+
+    runEvents()
+    if not sock.accept_q:
+        return (again(), None, 0)
+
+    child = sock.accept_q.pop(0)
+    for new in range(NUM_SOCKS):
+        if getSocket(new) is None:
+            Sockets[new] = child
+            logging.debug("Accept connection on socket {}: {}".format(socket, new))
+            return (new, child.peer.ip, child.peer.port)
+
+    child.peer.rx_closed = True
+    return (IOT_SOCKET_ENOMEM, None, 0)
+
+
+## Connect a socket to a remote host
+#  @param socket socket identification number
+#  @param ip remote IP address (bytes)
+#  @param port remote port number
+#  @return status 0 or error code
+def socketConnect(socket, ip, port):
+    logging.info("Python function socketConnect() called")
+
+    sock = getSocket(socket)
+    if sock is None:
+        return IOT_SOCKET_ESOCK
+
+    if sock.type == IOT_SOCKET_SOCK_DGRAM:
+        bindEphemeral(sock, ip)
+        sock.peer = (bytes(ip), port)
+        return 0
+
+    if sock.backlog != 0:
+        return IOT_SOCKET_EINVAL
+
+    if sock.connect_at is not None:
+        if sock.rx_closed and not sock.connected:
+            return IOT_SOCKET_ECONNREFUSED
+        if Time >= sock.connect_at:
+            sock.connected = True
+            return IOT_SOCKET_EISCONN
+        # Pending connect: let simulated time progress (iot_socket.c polls with osDelay)
+        runEvents()
+        if PollInterval != 0:
+            advanceTime(PollInterval)
+        if sock.rx_closed:
+            return IOT_SOCKET_ECONNREFUSED
+        if Time < sock.connect_at:
+            return IOT_SOCKET_EALREADY
+        sock.connected = True
+        return 0
+
+    listener = findSocket(IOT_SOCKET_SOCK_STREAM, ip, port, listening=True)
+    if listener is None:
+        return IOT_SOCKET_ECONNREFUSED
+
+    bindEphemeral(sock, ip)
+    child = Socket(listener.af, listener.type, listener.protocol)
+    child.ip        = bytes(ip)
+    child.port      = port
+    child.peer      = sock
+    child.connected = True
+    child.rx_buf    = RingBuffer(BufferSize)
+    sock.peer       = child
+    sock.rx_buf     = RingBuffer(BufferSize)
+
+    # Handshake takes one round trip
+    scheduleEvent(Time + Latency, deliverConnect, listener, child)
+    sock.connect_at = Time + 2 * Latency
+    if Latency == 0:
+        runEvents()
+        if sock.rx_closed:
+            return IOT_SOCKET_ECONNREFUSED
+        sock.connected = True
+        return 0
+
+    return IOT_SOCKET_EINPROGRESS
+
+
+## Receive stream data into a buffer
+#  @param sock socket
+#  @param buf destination buffer (writable bytes-like)
+#  @return status number of bytes received or error code
+def recvStream(sock, buf):
+    if not sock.connected:
+        if sock.connect_at is None or Time < sock.connect_at:
+            return IOT_SOCKET_ENOTCONN
+        sock.connected = True
+
+    runEvents()
+    if sock.rx_buf.available() == 0:
+        if sock.rx_closed:
+            return IOT_SOCKET_ECONNRESET
+        return again()
+
+    return sock.rx_buf.readinto(buf)
+
+
+## Receive data on a connected socket into a preallocated buffer
+#  @param socket socket identification number
+#  @param buf destination buffer (writable bytes-like, e.g. bytearray or memoryview slice)
+#  @return status number of bytes received or error code
+def socketRecvInto(socket, buf):
+    logging.info("Python function socketRecvInto() called")
+
+    sock = getSocket(socket)
+    if sock is None:
+        return IOT_SOCKET_ESOCK
+
+    if sock.type == IOT_SOCKET_SOCK_DGRAM:
+        status, data, _, _ = socketRecvFrom(socket, len(buf))
+        if status > 0:
+            memoryview(buf).cast('B')[:status] = data
+        return status
+
+    status = recvStream(sock, buf)
+    logging.debug("Receive data on socket {} ({})".format(socket, status))
+
+    return status
+
+
+## Receive data on a connected socket
+#  @param socket socket identification number
+#  @param size maximum number of bytes to receive
+#  @return (status, data) number of bytes received or error code, data received (bytes)
+def socketRecv(socket, size):
+    logging.info("Python function socketRecv() called")
+
+    sock = getSocket(socket)
+    if sock is None:
+        return (IOT_SOCKET_ESOCK, b'')
+
+    if sock.type == IOT_SOCKET_SOCK_DGRAM:
+        status, data, _, _ = socketRecvFrom(socket, size)
+        return (status, data)
+
+    data = bytearray(size)
+    status = recvStream(sock, data)
+    if status <= 0:
+        return (status, b'')
+    logging.debug("Receive data on socket {} ({} bytes)".format(socket, status))
+
+    return (status, bytes(data[:status]))
+
+
+## Receive data on a socket
+#  @param socket socket identification number
+#  @param size maximum number of bytes to receive
+#  @return (status, data, ip, port) number of bytes received or error code, data received (bytes), remote address
+def socketRecvFrom(socket, size):
+    logging.info("Python function socketRecvFrom() called")
+
+    sock = getSocket(socket)
+    if sock is None:
+        return (IOT_SOCKET_ESOCK, b'', None, 0)
+
+    if sock.type == IOT_SOCKET_SOCK_STREAM:
+        status, data = socketRecv(socket, size)
+        if sock.peer is None:
+            return (status, data, None, 0)
+        return (status, data, sock.peer.ip, sock.peer.port)
+
+    if sock.port == 0:
+        return (IOT_SOCKET_EINVAL, b'', None, 0)
+
+    runEvents()
+    if not sock.rx_dgrams:
+        return (again(), b'', None, 0)
+
+    data, ip, port = sock.rx_dgrams.pop(0)
+    data = data[:size]
+    logging.debug("Receive datagram on socket {} ({} bytes)".format(socket, len(data)))
+
+    return (len(data), data, ip, port)
+
+
+## Send data on a connected socket
+#  @param socket socket identification number
+#  @param data data to send (bytes-like, copied once into the peer receive buffer)
+#  @return status number of bytes sent or error code
+def socketSend(socket, data):
+    logging.info("Python function socketSend() called")
+
+    sock = getSocket(socket)
+    if sock is None:
+        return IOT_SOCKET_ESOCK
+
+    if sock.type == IOT_SOCKET_SOCK_DGRAM:
+        if sock.peer is None:
+            return IOT_SOCKET_ENOTCONN
+        return socketSendTo(socket, data, sock.peer[0], sock.peer[1])
+
+    if not sock.connected:
+        if sock.connect_at is None or Time < sock.connect_at:
+            return IOT_SOCKET_ENOTCONN
+        sock.connected = True
+    if sock.rx_closed and sock.peer.closed:
+        return IOT_SOCKET_ECONNRESET
+
+    # Lost segments are retransmitted after RTO, delivery stays in order
+    data = memoryview(data).cast('B')
+    size = min(len(data), sock.peer.rx_buf.free())
+    if size == 0 and len(data) != 0:
+        return again()
+    arrival = transmit(sock, size)
+    for _ in range(Retries):
+        if arrival is not None:
+            break
+        sock.link_busy += RTO
+        arrival = transmit(sock, size)
+    if arrival is None:
+        return IOT_SOCKET_ETIMEDOUT
+    arrival = max(arrival, sock.last_arr)
+    sock.last_arr = arrival
+    sock.peer.rx_buf.write(data[:size])
+    scheduleEvent(arrival, deliverSegment, sock.peer, size)
+    logging.debug("Send data on socket {} ({} bytes, arrival {} us)".format(socket, size, arrival))
+
+    return size
+
+
+## Send data on a socket
+#  @param socket socket identification number
+#  @param data data to send (bytes)
+#  @param ip remote IP address (bytes)
+#  @param port remote port number
+#  @return status number of bytes sent or error code
+def socketSendTo(socket, data, ip, port):
+    logging.info("Python function socketSendTo() called")
+
+    sock = getSocket(socket)
+    if sock is None:
+        return IOT_SOCKET_ESOCK
+
+    if sock.type == IOT_SOCKET_SOCK_STREAM:
+        return socketSend(socket, data)
+
+    bindEphemeral(sock, ip)
+    arrival = transmit(sock, len(data))
+    dest = findSocket(IOT_SOCKET_SOCK_DGRAM, ip, port)
+    if arrival is None or dest is None:
+        logging.debug("Drop datagram on socket {} ({} bytes)".format(socket, len(data)))
+    else:
+        scheduleEvent(arrival, deliverDatagram, dest, bytes(data), sock.ip, sock.port)
+
+    return len(data)
+
+
+## Retrieve local IP address and port of a socket
+#  @param socket socket identification number
+#  @return (status, ip, port) 0 or error code, local address
+def socketGetSockName(socket):
+    logging.info("Python function socketGetSockName() called")
+
+    sock = getSocket(socket)
+    if sock is None:
+        return (IOT_SOCKET_ESOCK, None, 0)
+    if sock.port == 0:
+        return (IOT_SOCKET_EINVAL, None, 0)
+
+    return (0, sock.ip, sock.port)
+
+
+## Retrieve remote IP address and port of a socket
+#  @param socket socket identification number
+#  @return (status, ip, port) 0 or error code, remote address
+def socketGetPeerName(socket):
+    logging.info("Python function socketGetPeerName() called")
+
+    sock = getSocket(socket)
+    if sock is None:
+        return (IOT_SOCKET_ESOCK, None, 0)
+    if sock.peer is None:
+        return (IOT_SOCKET_ENOTCONN, None, 0)
+    if sock.type == IOT_SOCKET_SOCK_DGRAM:
+        return (0, sock.peer[0], sock.peer[1])
+
+    return (0, sock.peer.ip, sock.peer.port)
+
+
+## Close and release a socket
+#  @param socket socket identification number
+#  @return status 0 or error code
+def socketClose(socket):
+    logging.info("Python function socketClose() called")
+
+    sock = getSocket(socket)
+    if sock is None:
+        return IOT_SOCKET_ESOCK
+
+    # Peer sees the close after all data in flight
+    if sock.type == IOT_SOCKET_SOCK_STREAM and isinstance(sock.peer, Socket):
+        scheduleEvent(max(Time + Latency, sock.last_arr), deliverClose, sock.peer)
+    for child in sock.accept_q:
+        child.peer.rx_closed = True
+    sock.closed = True
+    del Sockets[socket]
+    logging.debug("Close socket: {}".format(socket))
+
+    return 0
+
+
+## Retrieve host IP address from host name
+#  @param name host name
+#  @param af address family
+#  @return (status, ip) 0 or error code, host IP address (bytes)
+def socketGetHostByName(name, af):
+    logging.info("Python function socketGetHostByName() called")
+
+    ip = Hosts.get(name)
+    if ip is None:
+        return (IOT_SOCKET_EHOSTNOTFOUND, None)
+    if (af == IOT_SOCKET_AF_INET) != (len(ip) == 4):
+        return (IOT_SOCKET_EHOSTNOTFOUND, None)
+
+    return (0, ip)
+
+
+## @}
+
@@ -0,0 +1,73 @@
+# Copyright (c) 2021-2022 Arm Limited. All rights reserved.
+
+# Virtual Socket Interface Python script: payload throughput benchmark
+
+##@addtogroup arm_vsocket_py
+#  @{
+#
+##@package benchmark_vsocket
+#Measures host-side throughput of the VSocket emulated network payload path.
+#
+#Compares socketRecvInto() (preallocated buffer, memoryview copies) with
+#socketRecv() (new bytes object per call) for 1 KB and 64 KB payloads.
+#Usage: python benchmark_vsocket.py [total_megabytes]
+#test_vsocket_payload.py checks that both paths deliver the same byte stream.
+
+import sys
+import time
+
+import arm_vsocket as vsocket
+
+
+## Open a connected stream socket pair on the emulated network
+#  @return (client, server) socket identification numbers
+def openPair():
+    vsocket.configure(latency=0, bandwidth=0, loss=0.0, poll_interval=0)
+    vsocket.reset()
+    ip = bytes([127, 0, 0, 1])
+    listener = vsocket.socketCreate(vsocket.IOT_SOCKET_AF_INET, vsocket.IOT_SOCKET_SOCK_STREAM, vsocket.IOT_SOCKET_IPPROTO_TCP)
+    vsocket.socketBind(listener, ip, 5000)
+    vsocket.socketListen(listener, 1)
+    client = vsocket.socketCreate(vsocket.IOT_SOCKET_AF_INET, vsocket.IOT_SOCKET_SOCK_STREAM, vsocket.IOT_SOCKET_IPPROTO_TCP)
+    vsocket.socketConnect(client, ip, 5000)
+    server, _, _ = vsocket.socketAccept(listener)
+    return (client, server)
+
+
+## Transfer data through the emulated network
+#  @param payload_size size of each send/recv call (in bytes)
+#  @param total total number of bytes to transfer
+#  @param zero_copy use socketRecvInto instead of socketRecv
+#  @return throughput throughput (in MB/s)
+def run(payload_size, total, zero_copy):
+    client, server = openPair()
+    payload = memoryview(bytearray(payload_size))
+    buf = bytearray(payload_size)
+    count = total // payload_size
+
+    start = time.perf_counter()
+    for _ in range(count):
+        vsocket.socketSend(client, payload)
+        if zero_copy:
+            vsocket.socketRecvInto(server, buf)
+        else:
+            vsocket.socketRecv(server, payload_size)
+    elapsed = time.perf_counter() - start
+
+    return (count * payload_size) / elapsed / 1e6
+
+
+## Run benchmark and print results
+def main():
+    total = int(sys.argv[1] if len(sys.argv) > 1 else 64) * 1024 * 1024
+    print("{:>8} {:>16} {:>16}".format("payload", "recv MB/s", "recv_into MB/s"))
+    for payload_size in (1024, 65536):
+        copy = run(payload_size, total, zero_copy=False)
+        zero = run(payload_size, total, zero_copy=True)
+        print("{:>8} {:>16.1f} {:>16.1f}".format(payload_size, copy, zero))
+
+
+if __name__ == '__main__':
+    main()
+
+## @}
@@ -0,0 +1,88 @@
+import random
+import unittest
+
+import arm_vsocket as vsocket
+
+IP = bytes([127, 0, 0, 1])
+
+
+class TestVsocketPayload(unittest.TestCase):
+    """
+        Payload path of the emulated network: socketSend/socketRecvInto (memoryview
+        copies into a preallocated buffer) against socketRecv (bytes copy)
+    """
+    def setUp(self):
+        vsocket.configure(latency=0, bandwidth=0, loss=0.0, buffer_size=1000, poll_interval=0)
+        vsocket.reset()
+
+    def tearDown(self):
+        vsocket.configure(buffer_size=262144, poll_interval=10000)
+        vsocket.reset()
+
+    def open_pair(self, port):
+        listener = vsocket.socketCreate(vsocket.IOT_SOCKET_AF_INET, vsocket.IOT_SOCKET_SOCK_STREAM, vsocket.IOT_SOCKET_IPPROTO_TCP)
+        vsocket.socketBind(listener, IP, port)
+        vsocket.socketListen(listener, 1)
+        client = vsocket.socketCreate(vsocket.IOT_SOCKET_AF_INET, vsocket.IOT_SOCKET_SOCK_STREAM, vsocket.IOT_SOCKET_IPPROTO_TCP)
+        vsocket.socketConnect(client, IP, port)
+        server, _, _ = vsocket.socketAccept(listener)
+        return (client, server)
+
+    def test_recv_into_matches_recv(self):
+        rng = random.Random(1)
+        stream = bytes(rng.getrandbits(8) for _ in range(20000))
+        copy_pair = self.open_pair(5000)
+        zero_pair = self.open_pair(5001)
+        ring = vsocket.Sockets[zero_pair[1]].rx_buf
+
+        copy_out = bytearray()
+        zero_out = bytearray(len(stream))
+        zero_len = 0
+        sent = 0
+        wrapped = 0
+        while sent < len(stream):
+            # same sends on both pairs: bytes on the copy path, a memoryview slice on the zero-copy path
+            size = rng.randint(1, 700)
+            n = vsocket.socketSend(copy_pair[0], stream[sent:sent + size])
+            assert vsocket.socketSend(zero_pair[0], memoryview(stream)[sent:sent + size]) == n
+            sent += max(n, 0)
+
+            # partial reads of the same size, the zero-copy read goes into a slice of the output
+            size = rng.randint(1, 700)
+            pos = ring.head % ring.size
+            status, data = vsocket.socketRecv(copy_pair[1], size)
+            zero_status = vsocket.socketRecvInto(zero_pair[1], memoryview(zero_out)[zero_len:zero_len + size])
+            assert zero_status == status
+            if status > 0:
+                copy_out += data
+                zero_len += status
+                wrapped += pos + status > ring.size
+
+        while zero_len < len(stream):
+            status, data = vsocket.socketRecv(copy_pair[1], 700)
+            assert vsocket.socketRecvInto(zero_pair[1], memoryview(zero_out)[zero_len:zero_len + 700]) == status
+            copy_out += data
+            zero_len += status
+
+        # reads across the end of the ring buffer are split in two copies
+        assert wrapped > 0
+        assert bytes(copy_out) == stream
+        assert bytes(zero_out) == stream
+
+    def test_wrapped_write(self):
+        client, server = self.open_pair(5000)
+        ring = vsocket.Sockets[server].rx_buf
+        assert vsocket.socketSend(client, bytes(900)) == 900
+        assert vsocket.socketRecv(server, 900)[0] == 900
+
+        # 300 bytes from position 900: 100 at the end of the ring, 200 at the beginning
+        payload = bytes(range(200, 256)) + bytes(range(244))
+        assert vsocket.socketSend(client, memoryview(payload)) == 300
+        assert bytes(ring.buf[900:]) == payload[:100] and bytes(ring.buf[:200]) == payload[100:]
+        buf = bytearray(300)
+        assert vsocket.socketRecvInto(server, buf) == 300
+        assert bytes(buf) == payload
+
+
+if __name__ == '__main__':
+    unittest.main()